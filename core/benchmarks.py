@@ -0,0 +1,426 @@
+# core/benchmarks.py
+"""
+Latency and SQL query budgets for every route in core.urls.
+
+ENDPOINTS has one request per route, keyed by its route pattern, and a
+budget: the most queries the request may make, with cold caches. measure()
+sends the request through the test client, so middleware, authentication
+and rendering are included, and counts the queries on every database
+connection. bench_endpoints reports latency percentiles on a seeded
+database (see core.seed) and fails when an endpoint goes over budget;
+EndpointBudgetTests checks the same budgets in the test suite.
+
+Each endpoint's requests run in a transaction that is rolled back
+afterwards, so writes don't change the data being measured (and their
+on_commit callbacks don't run).
+"""
+
+import json
+import math
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from itertools import count
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+from drf_spectacular.drainage import GENERATOR_STATS
+from rest_framework_simplejwt.tokens import AccessToken
+
+from interactions.models import Comment
+from messages.conversations import direct_conversation
+from messages.models import Participant
+from notifications.models import Notification
+from notifications.notify import notify
+from posts import cache as post_cache
+from posts.models import Hashtag, Post
+from users.authentication import user_cache
+from users.models import CustomUser, Follow
+from .seed import SEED_PASSWORD
+
+PATH_PARAMETER_RE = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+class Endpoint:
+    """
+    A request to ``route``. ``kwargs``, ``query`` and ``data`` are functions
+    of the BenchData, called before each request and outside the timing.
+    A ``conditional`` request revalidates the ETag of a plain GET sent
+    just before it, also outside the timing.
+    """
+
+    def __init__(
+        self,
+        route,
+        budget,
+        method="GET",
+        auth="user",
+        kwargs=None,
+        query=None,
+        data=None,
+        status=200,
+        label=None,
+        conditional=False,
+    ):
+        self.route = route
+        self.budget = budget
+        self.method = method
+        self.auth = auth  # "user", "admin" or None
+        self.kwargs = kwargs
+        self.query = query
+        self.data = data
+        self.status = status
+        self.label = label  # Tells variants of a route apart in reports
+        self.conditional = conditional
+
+    def __str__(self):
+        if self.label:
+            return f"{self.method} /{self.route} {self.label}"
+        return f"{self.method} /{self.route}"
+
+    def path(self, bench):
+        kwargs = self.kwargs(bench) if self.kwargs else {}
+        path = "/" + PATH_PARAMETER_RE.sub(
+            lambda match: str(kwargs[match.group(1)]), self.route
+        )
+        return f"{path}?{self.query(bench)}" if self.query else path
+
+
+ENDPOINTS = [
+    Endpoint("", 0, auth=None, status=301),
+    Endpoint("posts/", 2, query=lambda b: "page_size=20"),
+    Endpoint(
+        "posts/",
+        0,
+        query=lambda b: "page_size=20",
+        status=304,
+        label="(If-None-Match)",
+        conditional=True,
+    ),
+    Endpoint(
+        "posts/",
+        2,
+        query=lambda b: "page_size=20&fields=id,created_at",
+        label="(id,created_at)",
+    ),
+    Endpoint("posts/feed/", 3),
+    Endpoint(
+        "posts/feed/",
+        3,
+        query=lambda b: "fields=id,created_at",
+        label="(id,created_at)",
+    ),
+    Endpoint("posts/search/", 3, query=lambda b: f"q={b.word}"),
+    Endpoint("posts/tags/trending/", 2, query=lambda b: "window=day"),
+    Endpoint("posts/tags/<str:name>/", 2, kwargs=lambda b: {"name": b.tag}),
+    Endpoint(
+        "posts/create/",
+        13,
+        method="POST",
+        data=lambda b: {"content": f"Benchmark post #{b.tag}"},
+        status=201,
+    ),
+    Endpoint("posts/<int:pk>/", 2, kwargs=lambda b: {"pk": b.post.pk}),
+    Endpoint(
+        "posts/<int:pk>/",
+        0,
+        kwargs=lambda b: {"pk": b.post.pk},
+        status=304,
+        label="(If-None-Match)",
+        conditional=True,
+    ),
+    Endpoint(
+        "posts/<int:pk>/update/",
+        4,
+        method="PATCH",
+        kwargs=lambda b: {"pk": b.new_post().pk},
+        data=lambda b: {"content": "Edited benchmark post"},
+    ),
+    Endpoint(
+        "posts/<int:pk>/delete/",
+        10,
+        method="DELETE",
+        kwargs=lambda b: {"pk": b.new_post().pk},
+        status=204,
+    ),
+    Endpoint("posts/cache-stats/", 1, auth="admin"),
+    Endpoint(
+        "interactions/like/<int:post_id>/",
+        14,
+        method="POST",
+        kwargs=lambda b: {"post_id": b.post.pk},
+    ),
+    Endpoint(
+        "interactions/comment/<int:post_id>/",
+        21,
+        method="POST",
+        kwargs=lambda b: {"post_id": b.post.pk},
+        data=lambda b: {"content": "Benchmark reply", "parent": b.comment.pk},
+        status=201,
+    ),
+    Endpoint(
+        "interactions/comments/<int:post_id>/",
+        6,  # One query per reply level, up to COMMENT_THREAD_MAX_DEPTH
+        kwargs=lambda b: {"post_id": b.post.pk},
+    ),
+    Endpoint(
+        "interactions/share/<int:post_id>/",
+        6,
+        method="POST",
+        kwargs=lambda b: {"post_id": b.post.pk},
+        status=201,
+    ),
+    Endpoint(
+        "interactions/state/",
+        4,
+        query=lambda b: "ids=" + ",".join(map(str, b.post_ids)),
+    ),
+    Endpoint(
+        "users/register/",
+        2,
+        method="POST",
+        auth=None,
+        data=lambda b: b.new_account(),
+        status=201,
+    ),
+    Endpoint("users/profile/", 1),
+    Endpoint(
+        "users/profile/",
+        0,
+        status=304,
+        label="(If-None-Match)",
+        conditional=True,
+    ),
+    Endpoint("users/users/", 2, auth="admin"),
+    Endpoint(
+        "users/users/",
+        2,
+        auth="admin",
+        query=lambda b: "fields=id,username",
+        label="(id,username)",
+    ),
+    Endpoint("users/users/export/", 2, auth="admin", query=lambda b: "output=csv"),
+    Endpoint(
+        "users/users/<int:pk>/",
+        4,
+        method="PUT",
+        auth="admin",
+        kwargs=lambda b: {"pk": b.other.pk},
+        data=lambda b: {"username": b.other.username, "bio": "Benchmarked"},
+    ),
+    Endpoint(
+        "users/login/",
+        1,
+        method="POST",
+        auth=None,
+        data=lambda b: {"username": b.user.username, "password": b.password},
+    ),
+    Endpoint(
+        "users/follow/<int:user_id>/",
+        11,
+        method="POST",
+        kwargs=lambda b: {"user_id": b.other.pk},
+    ),
+    Endpoint("messages/", 2),
+    Endpoint(
+        "messages/<int:conversation_id>/",
+        3,
+        kwargs=lambda b: {"conversation_id": b.conversation_id},
+    ),
+    Endpoint(
+        "messages/<int:conversation_id>/send/",
+        7,
+        method="POST",
+        kwargs=lambda b: {"conversation_id": b.conversation_id},
+        data=lambda b: {"content": "Benchmark message"},
+        status=201,
+    ),
+    Endpoint(
+        "messages/<int:conversation_id>/read/",
+        2,
+        method="POST",
+        kwargs=lambda b: {"conversation_id": b.conversation_id},
+    ),
+    Endpoint(
+        "messages/direct/<int:user_id>/",
+        12,
+        method="POST",
+        kwargs=lambda b: {"user_id": b.other.pk},
+        data=lambda b: {"content": "Benchmark message"},
+        status=201,
+    ),
+    Endpoint("notifications/", 2),
+    Endpoint("notifications/unread/", 2),
+    Endpoint("notifications/read/", 5, method="POST"),
+    Endpoint(
+        "notifications/<int:pk>/read/",
+        6,
+        method="POST",
+        kwargs=lambda b: {"pk": b.new_notification().pk},
+    ),
+    Endpoint("api/schema/", 0, auth=None),
+    Endpoint("api/docs/swagger-ui/", 0, auth=None),
+    Endpoint("api/docs/redoc/", 0, auth=None),
+]
+
+# Routes deliberately left out, with the reason
+SKIPPED = {}
+
+
+def routes(patterns=None, prefix=""):
+    """
+    Route patterns (``"posts/<int:pk>/"``) of every path() in the URLconf.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern.pattern, RoutePattern):
+            yield prefix + str(pattern.pattern)
+
+
+class BenchData:
+    """
+    The accounts and rows benchmark requests point at, picked from the
+    database: the busiest post, its busiest thread, the most used hashtag and
+    a user who follows someone (which must log in with ``password``) and
+    their most recent conversation.
+    """
+
+    def __init__(self, password=SEED_PASSWORD):
+        self.password = password
+        follow = Follow.objects.order_by("pk").first()
+        if follow is None:
+            raise ValueError("No follows to benchmark with; run seed_chattera first.")
+        self.user = follow.follower
+        self.other = (
+            CustomUser.objects.exclude(pk=self.user.pk)
+            .order_by("-followers_count", "pk")
+            .first()
+        )
+        self.admin, _ = CustomUser.objects.get_or_create(
+            username="bench_admin", defaults={"is_staff": True}
+        )
+        public = Post.objects.filter(is_active=True, visibility="public")
+        self.post = public.order_by("-comments_count", "pk").first()
+        self.post_ids = list(
+            public.order_by("-created_at", "-id").values_list("pk", flat=True)[:20]
+        )
+        self.comment = (
+            Comment.objects.filter(post=self.post, parent__isnull=True)
+            .order_by("-replies_count", "pk")
+            .first()
+        )
+        self.tag = (
+            Hashtag.objects.annotate(uses=Count("post_links"))
+            .order_by("-uses", "pk")
+            .values_list("name", flat=True)
+            .first()
+        )
+        self.word = self.post.content.split()[0]
+        self.conversation_id = (
+            Participant.objects.filter(user=self.user)
+            .order_by("-last_message_at", "-id")
+            .values_list("conversation_id", flat=True)
+            .first()
+        ) or direct_conversation(self.user.pk, self.other.pk).pk
+        self.tokens = {
+            "user": str(AccessToken.for_user(self.user)),
+            "admin": str(AccessToken.for_user(self.admin)),
+        }
+        self.serial = count()
+
+    def headers(self, auth):
+        if auth is None:
+            return {}
+        return {"Authorization": f"Bearer {self.tokens[auth]}"}
+
+    def new_post(self):
+        return Post.objects.create(user=self.user, content="Benchmark post")
+
+    def new_notification(self):
+        notify(self.user.pk, self.post.pk, "like", [self.other])
+        return Notification.objects.get(
+            recipient=self.user, post=self.post, verb="like"
+        )
+
+    def new_account(self):
+        username = f"bench-{time.time_ns()}-{next(self.serial)}"
+        return {
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "Bench-password-9",
+            "password2": "Bench-password-9",
+        }
+
+
+@contextmanager
+def bench_settings():
+    """
+    Turn off the rate limits, which would otherwise reject repeated writes,
+    and the schema generator's warnings.
+    """
+    with override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}},
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+    ), GENERATOR_STATS.silence():
+        yield
+
+
+def measure(endpoint, bench, repeat):
+    """
+    Send ``endpoint``'s request ``repeat`` times, starting with cold caches;
+    return the lists of timings (ms), query counts, response statuses and
+    body sizes (bytes).
+    """
+    post_cache.get_cache().clear()
+    user_cache.clear()
+    client = Client(raise_request_exception=False)
+    headers = bench.headers(endpoint.auth)
+    timings, queries, statuses, sizes = [], [], [], []
+    with transaction.atomic():
+        for _ in range(repeat):
+            path = endpoint.path(bench)
+            body = json.dumps(endpoint.data(bench)) if endpoint.data else ""
+            request_headers = headers
+            if endpoint.conditional:
+                etag = client.get(path, headers=headers)["ETag"]
+                request_headers = {**headers, "If-None-Match": etag}
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connection))
+                    for connection in connections.all()
+                ]
+                start = time.perf_counter()
+                response = client.generic(
+                    endpoint.method,
+                    path,
+                    body,
+                    content_type="application/json",
+                    headers=request_headers,
+                )
+                if response.streaming:
+                    # The body is generated, and queried for, as it is read
+                    body = b"".join(response.streaming_content)
+                else:
+                    body = response.content
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(sum(len(context) for context in captured))
+            statuses.append(response.status_code)
+            sizes.append(len(body))
+        transaction.set_rollback(True)
+    return timings, queries, statuses, sizes
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of ``values``.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
@@ -0,0 +1,75 @@
+# core/conditional.py
+"""
+HTTP conditional GETs.
+
+A read view works out cheap validators for the response it would render,
+an ETag (from a version token or timestamp) and optionally a Last-Modified
+time, and calls conditional_response() before querying or serializing
+anything: when the request's If-None-Match or If-Modified-Since still
+matches, that returns the 304 Not Modified to send instead. Otherwise the
+view renders as usual and add_validators() sets both headers, with
+``Cache-Control: no-cache`` so clients revalidate rather than guess at
+freshness.
+
+As RFC 9110 says, If-Modified-Since is ignored when If-None-Match is sent;
+views only look their last-modified time up when checks_modified_since().
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+
+def make_etag(*parts):
+    """
+    A quoted ETag digesting ``parts``.
+    """
+    return '"%s"' % hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _timestamp(value):
+    return None if value is None else int(value.timestamp())
+
+
+def checks_modified_since(request):
+    """
+    Whether conditional_response() compares a last-modified time for
+    ``request``.
+    """
+    return (
+        request.method in CONDITIONAL_METHODS
+        and "HTTP_IF_MODIFIED_SINCE" in request.META
+        and "HTTP_IF_NONE_MATCH" not in request.META
+    )
+
+
+def conditional_response(request, etag=None, last_modified=None):
+    """
+    Return the response to send when ``request``'s conditional headers
+    match the validators (a 304, or a 412 for a failed If-Match), else None.
+    """
+    if request.method not in CONDITIONAL_METHODS:
+        return None
+    if not checks_modified_since(request):
+        last_modified = None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=_timestamp(last_modified)
+    )
+    if response is not None and etag is not None:
+        response["ETag"] = etag
+    return response
+
+
+def add_validators(response, etag=None, last_modified=None):
+    """
+    Set the ETag and Last-Modified headers of a rendered ``response``.
+    """
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(_timestamp(last_modified))
+    patch_cache_control(response, no_cache=True)
+    return response
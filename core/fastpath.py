@@ -0,0 +1,200 @@
+# core/fastpath.py
+"""
+Compiled read-only serialization from ``.values()`` rows.
+
+A ModelSerializer renders every field of every instance through DRF's field
+machinery, which costs more than the query on a page of posts. For read
+responses a serializer can instead be compiled once per request into
+``(name, converter)`` pairs, each converter taking a row from
+``.values(*columns)``, and produce the same dicts, keys in the same order.
+
+- Plain columns (integers, strings, booleans, choices) and primary key
+  relations pass through.
+- Files become URLs as DRF's FileField renders them, and datetimes ISO 8601
+  strings in the current timezone as DRF's DateTimeField renders them,
+  looking the timezone up once instead of per value.
+- Other model fields go through their serializer field's
+  to_representation().
+- Computed fields come from the serializer's ``fast_converters(context)``,
+  a dict of ``name: (columns, converter)``.
+
+Anything else (nested or other related fields, sources that aren't model
+fields) raises NotCompilable, and FastListMixin falls back to the
+serializer. FAST_SERIALIZERS turns the compiled path off.
+"""
+
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .fieldsets import serializer_fields
+
+PASS_THROUGH = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _converted(source, to_representation):
+    def convert(row):
+        value = row[source]
+        return None if value is None else to_representation(value)
+
+    return convert
+
+
+def _file_url(source, storage, request):
+    def convert(row):
+        name = row[source]
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+def _datetime(source, field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if hasattr(field, "timezone"):
+        field_timezone = field.timezone
+    else:
+        field_timezone = field.default_timezone()
+    if field_timezone is None or (output_format or "").lower() != ISO_8601:
+        return _converted(source, field.to_representation)
+
+    def convert(row):
+        value = row[source]
+        if value is None:
+            return None
+        if value.utcoffset() is None:
+            return field.to_representation(value)  # Naive; made aware by DRF
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def compile_field(model, field, context):
+    """
+    Return a converter from a ``.values()`` row to ``field``'s output.
+    """
+    source = field.source
+    try:
+        model_field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        raise NotCompilable(f"{field.field_name} isn't a model field")
+    if model_field.is_relation:
+        if (
+            isinstance(field, serializers.PrimaryKeyRelatedField)
+            and model_field.many_to_one
+            and field.pk_field is None
+        ):
+            return itemgetter(source)  # .values() gives the related pk
+        raise NotCompilable(f"{field.field_name} is a related field")
+    if isinstance(field, serializers.FileField):
+        if not getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+            return itemgetter(source)
+        return _file_url(source, model_field.storage, context.get("request"))
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime(source, field)
+    if isinstance(field, PASS_THROUGH) or (
+        type(field) is serializers.ChoiceField
+        and all(isinstance(key, str) for key in field.choices)
+    ):
+        # to_representation() returns these column values unchanged
+        return itemgetter(source)
+    return _converted(source, field.to_representation)
+
+
+class CompiledSerializer:
+    """
+    ``serializer_class`` compiled for rendering the ``fields`` named (all
+    by default) with ``context``. ``columns`` are the ones to read with
+    ``.values()``.
+    """
+
+    def __init__(self, serializer_class, fields=None, context=None):
+        context = context or {}
+        model = serializer_class.Meta.model
+        custom = {}
+        if hasattr(serializer_class, "fast_converters"):
+            custom = serializer_class.fast_converters(context)
+        available = serializer_fields(serializer_class)
+        columns = [model._meta.pk.name]
+        self.converters = []
+        for name, field in available.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue  # Not rendered, as by the serializer
+            if name in custom:
+                field_columns, convert = custom[name]
+            else:
+                field_columns = [field.source]
+                convert = compile_field(model, field, context)
+            columns.extend(field_columns)
+            self.converters.append((name, convert))
+        self.columns = list(dict.fromkeys(columns))
+
+    def to_representation(self, row):
+        return {name: convert(row) for name, convert in self.converters}
+
+    def many(self, rows):
+        converters = self.converters
+        return [{name: convert(row) for name, convert in converters} for row in rows]
+
+
+def compile_serializer(serializer_class, fields=None, context=None):
+    """
+    Return a CompiledSerializer, or None when FAST_SERIALIZERS is off or
+    the serializer can't be compiled.
+    """
+    if not getattr(settings, "FAST_SERIALIZERS", True):
+        return None
+    try:
+        return CompiledSerializer(serializer_class, fields, context)
+    except NotCompilable:
+        return None
+
+
+def values_for(queryset, compiled, paginator=None):
+    """
+    ``queryset`` as ``.values()`` rows with the compiled serializer's
+    columns and those the paginator orders by.
+    """
+    ordering = getattr(paginator, "ordering", ())
+    return queryset.values(
+        *dict.fromkeys([*compiled.columns, *(term.lstrip("-") for term in ordering)])
+    )
+
+
+class FastListMixin:
+    """
+    ListAPIView mixin rendering pages with the view's serializer compiled
+    (see above), or with the serializer when it can't be.
+    """
+
+    def list(self, request, *args, **kwargs):
+        context = self.get_serializer_context()
+        compiled = compile_serializer(
+            self.get_serializer_class(), context.get("fields"), context
+        )
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        queryset = values_for(
+            self.filter_queryset(self.get_queryset()), compiled, self.paginator
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(compiled.many(queryset))
+        return self.get_paginated_response(compiled.many(page))
@@ -0,0 +1,151 @@
+# core/fieldsets.py
+"""
+Sparse fieldsets: ``?fields=id,created_at`` renders only the listed fields
+of a serializer, ``?exclude=content`` all but the listed ones.
+
+The chosen fields also decide what is read from the database: project()
+turns them into the model columns the serializer needs (``.only()``), the
+forward relations it renders (``select_related``) and the reverse or
+many-to-many ones (``prefetch_related``), so unused columns and relations
+are never loaded. ``id`` is always rendered, since clients and the post
+caches key results by it. Serializers name the columns their computed
+fields read in ``Meta.field_columns``.
+"""
+
+from functools import cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _names(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+@cache
+def serializer_fields(serializer_class):
+    """
+    ``serializer_class``'s fields, built once per class.
+    """
+    return serializer_class().fields
+
+
+def requested_fields(request, serializer_class):
+    """
+    Return the names of ``serializer_class``'s fields selected by the
+    request's ``?fields=`` and ``?exclude=``, in declaration order, or None
+    when it asks for every field.
+    """
+    fields = request.query_params.get("fields")
+    exclude = request.query_params.get("exclude")
+    if fields is None and exclude is None:
+        return None
+    available = list(serializer_fields(serializer_class))
+    selected = available
+    for param, value in (("fields", fields), ("exclude", exclude)):
+        if value is None:
+            continue
+        names = _names(value)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({param: f"Unknown fields: {', '.join(unknown)}."})
+        if param == "fields":
+            selected = [name for name in selected if name in names or name == "id"]
+        else:
+            selected = [name for name in selected if name not in names or name == "id"]
+    return selected
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin rendering only the fields named in the ``fields``
+    context entry (all of them when it's missing or None).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = self.context.get("fields")
+        if names is not None:
+            for name in set(self.fields) - set(names):
+                self.fields.pop(name)
+
+
+def plan(serializer_class, names):
+    """
+    Return ``(columns, select_related, prefetch_related)`` needed to render
+    ``names`` with ``serializer_class``.
+    """
+    model = serializer_class.Meta.model
+    field_columns = getattr(serializer_class.Meta, "field_columns", {})
+    fields = serializer_fields(serializer_class)
+    columns, select, prefetch = [model._meta.pk.name], [], []
+    for name in names:
+        if name in field_columns:
+            columns.extend(field_columns[name])
+            continue
+        source = fields[name].source.split(".")[0]
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue  # A method or property, without columns of its own
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(source)
+            continue
+        columns.append(source)
+        if model_field.is_relation and not isinstance(
+            fields[name], serializers.PrimaryKeyRelatedField
+        ):
+            select.append(source)
+    return list(dict.fromkeys(columns)), select, prefetch
+
+
+def project(queryset, serializer_class, names, required=(), prefix=""):
+    """
+    Restrict ``queryset`` to what rendering ``names`` needs, plus the
+    ``required`` columns (ordering fields, say). ``prefix`` is the path of
+    the serialized model from the queryset's (``"post__"``). Returns the
+    queryset unchanged when ``names`` is None.
+    """
+    if names is None:
+        return queryset
+    columns, select, prefetch = plan(serializer_class, names)
+    columns = [prefix + column for column in columns] + list(required)
+    if select:
+        queryset = queryset.select_related(*(prefix + name for name in select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*(prefix + name for name in prefetch))
+    return queryset.only(*dict.fromkeys(columns))
+
+
+class SparseFieldsetViewMixin:
+    """
+    Generic view mixin applying ``?fields=``/``?exclude=`` to the serializer
+    and queryset of reads. ``fieldset_required`` lists columns
+    the view needs whatever the fields, like its pagination ordering, and
+    ``fieldset_prefix`` the path of the serialized model from the queryset's.
+    """
+
+    fieldset_required = ()
+    fieldset_prefix = ""
+
+    def get_fieldset(self):
+        if self.request.method not in SAFE_METHODS:
+            return None  # Writes take and return every field
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = requested_fields(self.request, self.get_serializer_class())
+        return self._fieldset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "fields": self.get_fieldset()}
+
+    def filter_queryset(self, queryset):
+        return project(
+            super().filter_queryset(queryset),
+            self.get_serializer_class(),
+            self.get_fieldset(),
+            self.fieldset_required,
+            self.fieldset_prefix,
+        )
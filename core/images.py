@@ -0,0 +1,218 @@
+# core/images.py
+"""
+Resized derivatives of uploaded images (Post.image, profile pictures).
+
+Each derivative has a deterministic name next to the original, which keeps
+the original's extension so ``cat.png`` and ``cat.jpg`` get their own
+(``post_images/cat.jpg`` -> ``post_images/derivatives/cat.jpg.thumb.jpg``).
+Serializers can therefore build URLs without touching the filesystem. Rendering
+runs in a process pool after the upload's transaction commits, at most
+IMAGE_DERIVATIVE_QUEUE_SIZE jobs at a time; further jobs wait in memory for
+a slot, so a request never waits on Pillow. Jobs lost with their process,
+or refused by a pool broken by one (which is then replaced), are left for
+the build_image_derivatives command.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width, max height); each size is rendered as JPEG and WebP
+DERIVATIVE_SIZES = getattr(
+    settings, "IMAGE_DERIVATIVE_SIZES", {"thumb": (150, 150), "medium": (800, 800)}
+)
+FORMATS = {"jpg": "JPEG", "webp": "WEBP"}
+QUALITY = getattr(settings, "IMAGE_DERIVATIVE_QUALITY", 82)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(
+    getattr(settings, "IMAGE_DERIVATIVE_QUEUE_SIZE", 64)
+)
+# Names of images waiting for a slot
+_backlog = deque()
+_backlog_lock = threading.Lock()
+
+
+def _derivatives(name):
+    path = PurePosixPath(name)
+    for size_name, size in DERIVATIVE_SIZES.items():
+        for extension, image_format in FORMATS.items():
+            key = size_name if extension == "jpg" else f"{size_name}_{extension}"
+            target = (
+                path.parent / "derivatives" / f"{path.name}.{size_name}.{extension}"
+            )
+            yield key, str(target), size, image_format
+
+
+def derivative_names(name):
+    """
+    Return ``{key: storage name}`` for every derivative of the image stored
+    as ``name``; keys are ``thumb``, ``thumb_webp``, ``medium``, ...
+    """
+    return {key: target for key, target, _, _ in _derivatives(name)}
+
+
+def derivative_urls(field_file, request=None):
+    """
+    URLs of the derivatives of an ImageField value, or None without an image.
+    """
+    return stored_derivative_urls(field_file.name if field_file else None, request)
+
+
+def stored_derivative_urls(stored_name, request=None):
+    """
+    derivative_urls() of the image stored as ``stored_name``, the column
+    value as read with ``.values()``.
+    """
+    if not stored_name:
+        return None
+    urls = {}
+    for key, name in derivative_names(stored_name).items():
+        url = default_storage.url(name)
+        urls[key] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def render_derivatives(source, targets):
+    """
+    Write each ``(path, (width, height), format)`` target from the image at
+    ``source``. Runs in a worker process, so it only takes plain paths.
+    """
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    for path, size, image_format in targets:
+        resized = image.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        if image_format == "JPEG" and resized.mode not in ("RGB", "L"):
+            resized = _flatten(resized)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a half-written file is never served
+        partial = f"{path}.partial"
+        resized.save(partial, image_format, quality=QUALITY, optimize=True)
+        os.replace(partial, path)
+    return len(targets)
+
+
+def _flatten(image):
+    image = image.convert("RGBA")
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def derivative_job(name):
+    """
+    Return the ``(source, targets)`` arguments of render_derivatives for the
+    image stored as ``name``.
+    """
+    targets = [
+        (default_storage.path(target), size, image_format)
+        for _, target, size, image_format in _derivatives(name)
+    ]
+    return default_storage.path(name), targets
+
+
+def has_derivatives(name):
+    return all(
+        default_storage.exists(target) for target in derivative_names(name).values()
+    )
+
+
+def is_new_upload(field_file):
+    """
+    True for a file assigned but not yet written to storage; check it from a
+    pre_save receiver, before the model save commits the file.
+    """
+    return bool(field_file) and not field_file._committed
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2)
+            )
+        return _executor
+
+
+def schedule_derivatives(field_file):
+    """
+    Render the derivatives of an ImageField value in the background once the
+    current transaction commits. With IMAGE_DERIVATIVE_WORKERS = 0 they are
+    rendered inline instead (tests, management commands).
+    """
+    if not field_file:
+        return
+    name = field_file.name
+    transaction.on_commit(lambda: _submit(name))
+
+
+def _submit(name):
+    if getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2) == 0:
+        render_derivatives(*derivative_job(name))
+        return
+    with _backlog_lock:
+        if not _slots.acquire(blocking=False):
+            _backlog.append(name)  # Started when a running job finishes
+            return
+    _start(name)
+
+
+def _start(name):
+    # Holds a slot until _finished() releases it or passes it on. A job the
+    # pool refuses is logged and left for build_image_derivatives, and its
+    # slot passed on at once, so uploads never see the pool's errors.
+    while name is not None:
+        executor = get_executor()
+        try:
+            future = executor.submit(render_derivatives, *derivative_job(name))
+        except Exception as error:
+            logger.exception("Could not queue derivatives of %s", name)
+            if isinstance(error, BrokenProcessPool):
+                _discard_executor(executor)
+            name = _next_job()
+        else:
+            future.add_done_callback(lambda done: _finished(name, executor, done))
+            return
+
+
+def _discard_executor(executor):
+    # A pool whose worker died refuses all further jobs; start a new one
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _next_job():
+    # Name of the next image waiting for the caller's slot, or None after
+    # releasing the slot
+    with _backlog_lock:
+        if _backlog:
+            return _backlog.popleft()
+        _slots.release()
+        return None
+
+
+def _finished(name, executor, future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Rendering derivatives of %s failed", name, exc_info=error)
+        if isinstance(error, BrokenProcessPool):
+            _discard_executor(executor)
+    _start(_next_job())
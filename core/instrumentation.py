@@ -0,0 +1,197 @@
+# core/instrumentation.py
+"""
+Per-request profiling: SQL queries and time, serializer time and view time.
+
+RequestProfilingMiddleware profiles a REQUEST_PROFILING_SAMPLE_RATE fraction
+of requests. A profiled response carries a Server-Timing header
+(``db;dur=12.1;desc="7 queries", serialize;dur=3.4, view;dur=25.0``, in
+milliseconds), and a structured log record (logger ``core.instrumentation``)
+is written when the request took REQUEST_PROFILING_SLOW_MS or longer, or ran
+one query shape REQUEST_PROFILING_REPEATED_QUERIES times or more, the usual
+sign of an N+1 loop.
+
+Queries are timed by an execute wrapper that every database connection gets
+when it opens, and serialization by timing DRF's ``Serializer.data``. Both
+only do work while the current context is being profiled, so requests that
+aren't sampled pay one context variable lookup per query.
+"""
+
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+_profile = ContextVar("core.instrumentation.profile", default=None)
+
+# "IN (%s, %s, %s)" and "VALUES (%s, %s), (%s, %s)" have one shape per size
+PLACEHOLDER_LIST_RE = re.compile(r"%s(?:\s*,\s*%s)+")
+VALUES_LIST_RE = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+
+
+def query_shape(sql):
+    return VALUES_LIST_RE.sub(r"\1", PLACEHOLDER_LIST_RE.sub("%s", sql))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = Counter()  # SQL -> executions
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def repeated_queries(self, threshold):
+        """
+        ``[(shape, executions)]`` of query shapes run ``threshold`` times or
+        more, most repeated first.
+        """
+        shapes = Counter()
+        for sql, executions in self.queries.items():
+            shapes[query_shape(sql)] += executions
+        return [
+            (shape, executions)
+            for shape, executions in shapes.most_common()
+            if executions >= threshold
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - start
+        profile.queries[sql] += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_serializer_data(data):
+    def timed(serializer):
+        profile = _profile.get()
+        # Nested serializers render inside the outer one's time
+        if profile is None or profile.serializing:
+            return data.fget(serializer)
+        profile.serializing = True
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            profile.serialize_time += time.perf_counter() - start
+            profile.serializing = False
+
+    timed.profiled = True
+    return property(timed)
+
+
+def install():
+    """
+    Hook query and serializer timing in; safe to call more than once.
+    """
+    connection_created.connect(
+        install_query_recorder, dispatch_uid="core.instrumentation.queries"
+    )
+    # Connections opened before this module was loaded
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+    if not getattr(BaseSerializer.data.fget, "profiled", False):
+        BaseSerializer.data = timed_serializer_data(BaseSerializer.data)
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.report(request, response, profile, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.report(request, response, profile, time.perf_counter() - start)
+
+    def sampled(self):
+        rate = getattr(settings, "REQUEST_PROFILING_SAMPLE_RATE", 0.01)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def report(self, request, response, profile, elapsed):
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={profile.db_time * 1000:.1f};desc="{profile.query_count} queries"',
+                f"serialize;dur={profile.serialize_time * 1000:.1f}",
+                f"view;dur={elapsed * 1000:.1f}",
+            ]
+        )
+
+        slow_ms = getattr(settings, "REQUEST_PROFILING_SLOW_MS", 500)
+        repeated = profile.repeated_queries(
+            getattr(settings, "REQUEST_PROFILING_REPEATED_QUERIES", 5)
+        )
+        slow = elapsed * 1000 >= slow_ms
+        if slow or repeated:
+            match = request.resolver_match
+            record = {
+                "method": request.method,
+                "path": request.path,
+                "view": match.view_name if match else None,
+                "status": response.status_code,
+                "view_ms": round(elapsed * 1000, 1),
+                "db_ms": round(profile.db_time * 1000, 1),
+                "serialize_ms": round(profile.serialize_time * 1000, 1),
+                "queries": profile.query_count,
+                "repeated_queries": [
+                    {"sql": shape, "count": executions}
+                    for shape, executions in repeated
+                ],
+            }
+            logger.warning(
+                "%s: %s",
+                "Slow request" if slow else "Repeated queries",
+                json.dumps(record),
+                extra={"request_profile": record},
+            )
+        return response
@@ -0,0 +1,136 @@
+import asyncio
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import clear_url_caches
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Post
+from users.models import CustomUser as User
+
+ASYNC_ROUTES = ["post_list", "post_detail", "profile"]
+URLCONFS = ["posts.urls", "users.urls", "core.urls"]
+
+
+@contextmanager
+def routes(async_views):
+    """
+    Rebuild the URLconf with ASYNC_VIEWS set to ``async_views``.
+    """
+
+    def reload():
+        for module in URLCONFS:
+            importlib.reload(importlib.import_module(module))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=async_views):
+            reload()
+            yield
+    finally:
+        reload()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the post list, post detail and profile endpoints in-process "
+        "under WSGI (a thread per request) and ASGI (one event loop), with the "
+        "sync and the async views."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Requests in flight; WSGI runs this many threads.",
+        )
+        parser.add_argument(
+            "--no-cache", action="store_true", help="Bypass the post cache."
+        )
+
+    def handle(self, *args, **options):
+        user, post_ids = self.seed()
+        headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(user)}",
+        }
+        paths = ["/posts/?page_size=20", "/users/profile/"] + [
+            f"/posts/{post_id}/" for post_id in post_ids
+        ]
+        urls = [paths[i % len(paths)] for i in range(options["requests"])]
+
+        # The test clients send "Host: testserver"
+        overrides = {"ALLOWED_HOSTS": ["testserver"]}
+        if options["no_cache"]:
+            overrides["CACHES"] = {
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            }
+        self.stdout.write(
+            f"{len(urls)} requests, {options['concurrency']} in flight"
+            + (", post cache bypassed" if options["no_cache"] else "")
+        )
+        with override_settings(**overrides):
+            with routes([]):
+                self.report(
+                    "WSGI, sync views",
+                    self.run_wsgi(urls, headers, options["concurrency"]),
+                    urls,
+                )
+                self.report(
+                    "ASGI, sync views",
+                    asyncio.run(self.run_asgi(urls, headers, options["concurrency"])),
+                    urls,
+                )
+            with routes(ASYNC_ROUTES):
+                self.report(
+                    "ASGI, async views",
+                    asyncio.run(self.run_asgi(urls, headers, options["concurrency"])),
+                    urls,
+                )
+
+    def seed(self):
+        user, _ = User.objects.get_or_create(username="bench_asgi")
+        if Post.objects.count() < 100:
+            Post.objects.bulk_create(
+                Post(user=user, content=f"asgi bench {i}") for i in range(100)
+            )
+        post_ids = list(Post.objects.order_by("-id").values_list("id", flat=True)[:20])
+        return user, post_ids
+
+    def run_wsgi(self, urls, headers, concurrency):
+        def fetch(url):
+            try:
+                return Client(headers=headers).get(url).status_code
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            statuses = list(pool.map(fetch, urls))
+        return time.perf_counter() - start, statuses
+
+    async def run_asgi(self, urls, headers, concurrency):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with slots:
+                return (await client.get(url, headers=headers)).status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(fetch(url) for url in urls))
+        return time.perf_counter() - start, statuses
+
+    def report(self, label, result, urls):
+        elapsed, statuses = result
+        errors = sum(status != 200 for status in statuses)
+        self.stdout.write(
+            f"{label:<20} {len(urls) / elapsed:8.0f} req/s"
+            f"   {elapsed * 1000:8.0f} ms total   {errors} errors"
+        )
@@ -0,0 +1,86 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import (
+    ENDPOINTS,
+    SKIPPED,
+    BenchData,
+    bench_settings,
+    measure,
+    percentile,
+)
+from core.seed import SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every route in core.urls against the configured database "
+        "(seed it with seed_chattera first) and report latency percentiles, "
+        "SQL queries and response size per request. Fails if a response has an unexpected status "
+        "or an endpoint makes more queries than its budget. Writes are rolled "
+        "back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--route",
+            action="append",
+            help="Only routes containing this text; may be repeated.",
+        )
+        parser.add_argument(
+            "--password",
+            default=SEED_PASSWORD,
+            help="Password of the benchmark user, for the login endpoint.",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint
+            for endpoint in ENDPOINTS
+            if not options["route"]
+            or any(text in endpoint.route for text in options["route"])
+        ]
+        # Keep 4xx/5xx tracebacks out of the report
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+        failures = []
+        with bench_settings():
+            try:
+                bench = BenchData(options["password"])
+            except ValueError as exc:
+                raise CommandError(exc)
+            self.stdout.write(
+                f"{'endpoint':<60} {'p50':>8} {'p95':>8} {'p99':>8}"
+                f" {'queries':>9} {'budget':>7} {'bytes':>8}"
+            )
+            for endpoint in endpoints:
+                timings, queries, statuses, sizes = measure(
+                    endpoint, bench, options["repeat"]
+                )
+                problems = []
+                if any(status != endpoint.status for status in statuses):
+                    problems.append(f"status {sorted(set(statuses))}")
+                if max(queries) > endpoint.budget:
+                    problems.append("over budget")
+                line = (
+                    f"{str(endpoint):<60}"
+                    + "".join(
+                        f" {percentile(timings, p):6.1f}ms" for p in (0.5, 0.95, 0.99)
+                    )
+                    + f" {min(queries):>4}-{max(queries):<4} {endpoint.budget:>7}"
+                    + f" {percentile(sizes, 0.5):>8}"
+                )
+                if problems:
+                    failures.append(f"{endpoint}: {', '.join(problems)}")
+                    line = self.style.ERROR(f"{line}   {', '.join(problems)}")
+                self.stdout.write(line)
+
+        for route, reason in SKIPPED.items():
+            self.stdout.write(f"skipped /{route}: {reason}")
+        if failures:
+            raise CommandError(
+                f"{len(failures)} endpoint(s) failed:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(endpoints)} endpoints in budget."))
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.fastpath import CompiledSerializer
+from posts.models import Post
+from posts.serializers import PostSerializer
+from users.models import CustomUser
+from users.serializers import UserSerializer
+
+SERIALIZERS = [
+    (PostSerializer, Post),
+    (UserSerializer, CustomUser),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize rows of the configured database (seed it with seed_chattera "
+        "first) with PostSerializer and UserSerializer and with their compiled "
+        "versions (core.fastpath), and report rows per second: for the "
+        "serialization alone, and including the query that loads the rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        request = Request(APIRequestFactory().get("/"))
+        context = {"request": request}
+        self.stdout.write(
+            f"{'serializer':<18} {'path':<10} {'rows':>6}"
+            f" {'serialize rows/s':>17} {'query+serialize rows/s':>23}"
+        )
+        for serializer_class, model in SERIALIZERS:
+            queryset = model.objects.order_by("pk")[:rows]
+            count = queryset.count()
+            if not count:
+                raise CommandError(
+                    f"No {model.__name__} rows; run seed_chattera first."
+                )
+
+            def drf(loaded=None):
+                instances = loaded if loaded is not None else list(queryset.all())
+                return serializer_class(instances, many=True, context=context).data
+
+            def compiled(loaded=None):
+                serializer = CompiledSerializer(serializer_class, context=context)
+                values = loaded
+                if values is None:
+                    values = list(queryset.values(*serializer.columns))
+                return serializer.many(values)
+
+            columns = CompiledSerializer(serializer_class, context=context).columns
+            loaded = {
+                "drf": list(queryset),
+                "compiled": list(queryset.values(*columns)),
+            }
+            for path, render in (("drf", drf), ("compiled", compiled)):
+                serialize = self.best(lambda: render(loaded[path]), repeat)
+                total = self.best(render, repeat)
+                self.stdout.write(
+                    f"{serializer_class.__name__:<18} {path:<10} {count:>6}"
+                    f" {count / serialize:>17,.0f} {count / total:>23,.0f}"
+                )
+
+    def best(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,118 @@
+import asyncio
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.realtime import reset_broker
+from core.websocket import WebSocketApplication
+from users.authentication import CachedJWTAuthentication
+from users.models import CustomUser
+
+
+def peak_rss():
+    """
+    Peak resident memory of this process, in KiB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = (
+        "Open idle WebSocket connections to core.websocket in this process and "
+        "report the memory each one holds and how long pushing one event to "
+        "all of them takes. Connections are driven in memory, without a "
+        "server or sockets, so the ASGI server's own per-connection buffers "
+        "come on top."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=10_000)
+        parser.add_argument("--events", type=int, default=10)
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("No users to connect as; run seed_chattera first.")
+        token = str(AccessToken.for_user(user))
+        # Warm the authentication cache, so connections don't query the user
+        authentication = CachedJWTAuthentication()
+        authentication.get_user(authentication.get_validated_token(token))
+        with override_settings(REALTIME_MAX_CONNECTIONS=options["connections"]):
+            broker = reset_broker()
+            try:
+                asyncio.run(self.run(broker, user, token, options))
+            finally:
+                reset_broker(None)
+
+    async def run(self, broker, user, token, options):
+        total = options["connections"]
+        application = WebSocketApplication()
+        scope = {
+            "type": "websocket",
+            "path": "/ws/",
+            "query_string": f"token={token}".encode(),
+            "headers": [],
+        }
+        received = [0]
+        refused = [0]
+        disconnects = []
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                received[0] += 1
+            elif message["type"] == "websocket.close":
+                refused[0] += 1
+
+        def client():
+            disconnected = asyncio.get_running_loop().create_future()
+            disconnects.append(disconnected)
+            messages = iter([{"type": "websocket.connect"}])
+
+            async def receive():
+                return next(messages, None) or await disconnected
+
+            return receive
+
+        rss_before = peak_rss()
+        start = time.perf_counter()
+        connections = [
+            asyncio.ensure_future(application(scope, client(), send))
+            for _ in range(total)
+        ]
+        while broker.connections + refused[0] < total:
+            await asyncio.sleep(0.01)
+        if refused[0]:
+            raise CommandError(f"{refused[0]} connections were refused.")
+        opened = time.perf_counter() - start
+        self.stdout.write(
+            f"{total} idle connections opened in {opened:.2f}s, "
+            f"{(peak_rss() - rss_before) / total:.1f} KiB of memory each"
+        )
+
+        timings = []
+        for _ in range(options["events"]):
+            expected = received[0] + total
+            start = time.perf_counter()
+            broker.deliver([user.pk], '{"type":"bench"}')
+            while received[0] < expected:
+                await asyncio.sleep(0)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f"one event to all {total}: "
+            f"p50 {timings[len(timings) // 2] * 1000:.1f}ms, "
+            f"max {timings[-1] * 1000:.1f}ms"
+        )
+
+        for disconnected in disconnects:
+            disconnected.set_result({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.gather(*connections)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"All closed; peak RSS {peak_rss() / 1024:.0f} MiB, "
+                f"{broker.connections} connections left."
+            )
+        )
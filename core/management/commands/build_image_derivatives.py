@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.images import derivative_job, has_derivatives, render_derivatives
+from posts.models import Post
+from users.models import CustomUser
+
+SOURCES = {
+    "posts": (Post, "image"),
+    "users": (CustomUser, "profile_picture"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Render missing derivatives of post images and profile pictures "
+        "across a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2) or 1,
+        )
+        parser.add_argument(
+            "--only", choices=sorted(SOURCES), help="Only process one kind of image."
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Re-render existing derivatives."
+        )
+
+    def handle(self, *args, **options):
+        jobs = [
+            derivative_job(name)
+            for name in self.image_names(options["only"])
+            if options["force"] or not has_derivatives(name)
+        ]
+        self.stdout.write(f"Rendering derivatives of {len(jobs)} images")
+
+        failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [pool.submit(render_derivatives, *job) for job in jobs]
+            for (source, _), future in zip(jobs, futures):
+                try:
+                    future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{source}: {exc}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Image derivatives built: {len(jobs) - failed} rendered, "
+                f"{failed} failed."
+            )
+        )
+
+    def image_names(self, only):
+        for key, (model, field) in SOURCES.items():
+            if only and key != only:
+                continue
+            yield from (
+                model.objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .values_list(field, flat=True)
+                .iterator()
+            )
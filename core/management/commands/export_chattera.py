@@ -0,0 +1,50 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.transfer import MODELS, export_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream users, posts, likes, comments and shares as JSONL, one row "
+        "per line, reading each table in primary key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o", "--output", help="File to write; standard output by default."
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--models",
+            nargs="+",
+            choices=MODELS,
+            default=MODELS,
+            help="Models to export; written in dependency order.",
+        )
+
+    def handle(self, *args, **options):
+        out = open(options["output"], "w") if options["output"] else sys.stdout
+        # Keep the report off standard output when the rows go there
+        report = self.stdout if options["output"] else self.stderr
+        total, started = 0, time.perf_counter()
+        try:
+            for label in [label for label in MODELS if label in options["models"]]:
+                start = time.perf_counter()
+                rows = export_model(label, out, options["chunk_size"])
+                elapsed = time.perf_counter() - start
+                total += rows
+                report.write(
+                    f"{label:<22} {rows:>10} rows   {rows / elapsed:10.0f} rows/s"
+                )
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        elapsed = time.perf_counter() - started
+        report.write(
+            self.style.SUCCESS(
+                f"Exported {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)."
+            )
+        )
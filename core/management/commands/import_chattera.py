@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import ImportCheckpoint
+from core.transfer import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a JSONL export made by export_chattera in batches, remapping "
+        "foreign keys to the ids rows get here. Progress is checkpointed with "
+        "every batch, so running it again resumes where it stopped. Media "
+        "files are not copied, and users whose username already exists are "
+        "mapped to the existing account."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="JSONL file, or - for standard input.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help="Name the progress is saved under; defaults to the file name.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Forget the saved progress and id mappings and start over.",
+        )
+
+    def handle(self, *args, **options):
+        name = options["checkpoint"] or os.path.basename(options["input"])
+        if options["restart"]:
+            ImportCheckpoint.objects.filter(name=name).delete()
+
+        importer = Importer(name, options["batch_size"])
+        if importer.checkpoint.lines_done:
+            self.stdout.write(
+                f"Resuming {name!r} after line {importer.checkpoint.lines_done}"
+            )
+        started = time.perf_counter()
+        if options["input"] == "-":
+            importer.run(sys.stdin)
+        else:
+            with open(options["input"]) as lines:
+                importer.run(lines)
+        elapsed = time.perf_counter() - started
+
+        total = 0
+        for label, (rows, skipped, seconds) in importer.stats.items():
+            total += rows
+            self.stdout.write(
+                f"{label:<22} {rows:>10} rows   {rows / seconds:10.0f} rows/s"
+                + (f"   {skipped} skipped" if skipped else "")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)."
+            )
+        )
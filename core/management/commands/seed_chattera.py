@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.seed import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, follows, posts, likes, "
+        "threaded comments, shares and direct messages, with power-law "
+        "popularity. Adds to what is there; seeded accounts log in with "
+        f"{SEED_PASSWORD!r}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10_000)
+        parser.add_argument("--likes", type=int, default=50_000)
+        parser.add_argument("--comments", type=int, default=10_000)
+        parser.add_argument("--shares", type=int, default=1000)
+        parser.add_argument("--conversations", type=int, default=2000)
+        parser.add_argument("--messages", type=int, default=20_000)
+        parser.add_argument(
+            "--follows", type=int, default=20, help="Accounts followed per user."
+        )
+        parser.add_argument(
+            "--reply-ratio",
+            type=float,
+            default=0.4,
+            help="Fraction of comments that are replies.",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Power-law exponent of popularity; 0 is uniform.",
+        )
+        parser.add_argument("--hashtags", type=int, default=500)
+        parser.add_argument(
+            "--days", type=int, default=30, help="Time span of the activity."
+        )
+        parser.add_argument(
+            "--seed", type=int, help="Random seed, for a reproducible dataset."
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--prefix", default="seed", help="Username and hashtag prefix."
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            users=options["users"],
+            posts=options["posts"],
+            likes=options["likes"],
+            comments=options["comments"],
+            shares=options["shares"],
+            conversations=options["conversations"],
+            messages=options["messages"],
+            follows=options["follows"],
+            reply_ratio=options["reply_ratio"],
+            skew=options["skew"],
+            hashtags=options["hashtags"],
+            days=options["days"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            prefix=options["prefix"],
+            log=self.stdout.write,
+        )
+        started = time.perf_counter()
+        written = seeder.run()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {sum(written.values())} rows in "
+                f"{time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,77 @@
+# core/middleware.py
+"""
+Load shedding for writes.
+
+WriteConcurrencyLimitMiddleware caps the unsafe-method (POST, PUT, PATCH,
+DELETE) requests in flight in this process at WRITE_CONCURRENCY_LIMIT. Past
+that, writes are answered 503 with Retry-After straight away, before any
+other middleware or the database, instead of queueing on the write lock.
+Reads are never limited.
+"""
+
+import json
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from .db import SAFE_METHODS
+
+
+class WriteConcurrencyLimitMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        if not self.enter():
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave()
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS:
+            return await self.get_response(request)
+        if not self.enter():
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave()
+
+    def enter(self):
+        limit = getattr(settings, "WRITE_CONCURRENCY_LIMIT", 64)
+        with self._lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def overloaded(self):
+        return HttpResponse(
+            json.dumps({"detail": "Too many writes in progress, retry shortly."}),
+            status=503,
+            content_type="application/json",
+            headers={
+                "Retry-After": str(
+                    getattr(settings, "WRITE_CONCURRENCY_RETRY_AFTER", 1)
+                )
+            },
+        )
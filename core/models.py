@@ -0,0 +1,55 @@
+# core/models.py
+from django.db import models
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a named import_chattera run: how many input lines are
+    imported, committed together with the rows they produced.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    lines_done = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.lines_done} lines"
+
+
+class ImportedRow(models.Model):
+    """
+    Primary key a row of an import got in this database, for remapping the
+    foreign keys of rows imported after it.
+    """
+
+    checkpoint = models.ForeignKey(
+        ImportCheckpoint, on_delete=models.CASCADE, related_name="rows"
+    )
+    model = models.CharField(max_length=100)  # "app_label.modelname"
+    source_id = models.BigIntegerField()
+    target_id = models.BigIntegerField()
+
+    class Meta:
+        unique_together = (
+            "checkpoint",
+            "model",
+            "source_id",
+        )
+
+    def __str__(self):
+        return f"{self.model} {self.source_id} -> {self.target_id}"
+
+
+class RealtimeEvent(models.Model):
+    """
+    A push event shared between processes by core.realtime.DatabaseBackend;
+    rows are deleted after REALTIME_EVENT_TTL seconds.
+    """
+
+    origin = models.CharField(max_length=32)  # Publishing process
+    user_ids = models.JSONField()
+    payload = models.TextField()  # Encoded event, sent as is
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Event {self.id} for {len(self.user_ids)} user(s)"
@@ -0,0 +1,200 @@
+# core/pagination.py
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+def flip_ordering(term):
+    return term[1:] if term.startswith("-") else "-" + term
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Return a Q selecting the rows strictly after ``position`` for the given
+    ``ordering`` (field names, "-" prefixed when descending).
+
+    The lexicographic OR is ANDed with an inclusive bound on the leading
+    field so the planner can turn it into an index range.
+    """
+    clauses = []
+    equal = {}
+    for term, value in zip(ordering, position):
+        name = term.lstrip("-")
+        lookup = "lt" if term.startswith("-") != reverse else "gt"
+        clauses.append(Q(**equal, **{f"{name}__{lookup}": value}))
+        equal[name] = value
+
+    leading = ordering[0]
+    lookup = "lte" if leading.startswith("-") != reverse else "gte"
+    bound = Q(**{f"{leading.lstrip('-')}__{lookup}": position[0]})
+    return bound & reduce(or_, clauses)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple.
+
+    DRF's CursorPagination only stores the first ordering field and falls
+    back to an OFFSET for ties. Here the cursor carries a value for every
+    ordering field, so each page is a single range scan on an index that
+    covers the ordering and page N costs the same as page 1.
+    The last ordering field must be unique (usually the primary key).
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = getattr(settings, "API_PAGE_SIZE", 20)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "API_MAX_PAGE_SIZE", 100)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position, reverse = self.prepare(queryset, request, view)
+        if not self.page_size:
+            return None
+        results = self.get_results(queryset, position, reverse)
+        return self.finish_page(results, position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, reading through the async ORM.
+        """
+        position, reverse = self.prepare(queryset, request, view)
+        if not self.page_size:
+            return None
+        results = await self.aget_results(queryset, position, reverse)
+        return self.finish_page(results, position, reverse)
+
+    def prepare(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None, False
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = self.get_fields(queryset)
+        return self.decode_cursor(request)
+
+    def finish_page(self, results, position, reverse):
+        has_following = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if self.page:
+            first = self.position_of(self.page[0])
+            last = self.position_of(self.page[-1])
+        else:
+            first = last = position
+
+        if reverse:
+            self.next_position = last
+            self.previous_position = first if has_following else None
+        else:
+            self.next_position = last if has_following else None
+            self.previous_position = first if position is not None else None
+
+        return self.page
+
+    def get_fields(self, queryset):
+        """
+        Return the model field behind each ordering term; used to encode and
+        decode cursor positions.
+        """
+        return [
+            queryset.model._meta.get_field(term.lstrip("-")) for term in self.ordering
+        ]
+
+    def seek_filter(self, position, reverse=False):
+        ordering = [
+            ("-" if term.startswith("-") else "") + field.attname
+            for term, field in zip(self.ordering, self.fields)
+        ]
+        return keyset_filter(ordering, position, reverse)
+
+    def seek(self, queryset, position, reverse):
+        """
+        Return the queryset of the ``page_size + 1`` rows following
+        ``position``, in ordering order (or reversed order when paging
+        backwards).
+        """
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+        ordering = self.ordering
+        if reverse:
+            ordering = [flip_ordering(term) for term in ordering]
+        return queryset.order_by(*ordering)[: self.page_size + 1]
+
+    def get_results(self, queryset, position, reverse):
+        return list(self.seek(queryset, position, reverse))
+
+    async def aget_results(self, queryset, position, reverse):
+        return [row async for row in self.seek(queryset, position, reverse)]
+
+    def position_of(self, obj):
+        if isinstance(obj, dict):  # A .values() row
+            return [obj[term.lstrip("-")] for term in self.ordering]
+        return [getattr(obj, field.attname) for field in self.fields]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor((self.next_position, False))
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor((self.previous_position, True))
+
+    def encode_cursor(self, cursor):
+        position, reverse = cursor
+        tokens = {
+            "p": [
+                field.value_to_string(_Row(field.attname, value))
+                for field, value in zip(self.fields, position)
+            ]
+        }
+        if reverse:
+            tokens["r"] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, separators=(",", ":")).encode()
+        ).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """
+        Return ``(position, reverse)`` for the request's cursor, or
+        ``(None, False)`` for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            raw = tokens["p"]
+            if len(raw) != len(self.fields):
+                raise ValueError
+            position = [
+                field.to_python(value) for field, value in zip(self.fields, raw)
+            ]
+            reverse = bool(tokens.get("r", 0))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+
+class _Row:
+    """
+    Minimal stand-in so Field.value_to_string() can be used on a bare value.
+    """
+
+    def __init__(self, attname, value):
+        setattr(self, attname, value)
@@ -0,0 +1,73 @@
+# core/ratelimit.py
+"""
+Sliding-window counters kept in the cache backend.
+
+Each key is counted in fixed windows of ``window`` seconds. The sliding count
+adds the current window's counter to the previous one's, weighted by how
+much of the previous window still falls in the last ``window`` seconds. A
+check is one get_many and a hit is an add, an incr and a get, and every
+process sharing the cache (RATELIMIT_CACHE_ALIAS) sees the same counts.
+"""
+
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class SlidingWindowCounter:
+    def __init__(self, prefix, window):
+        self.prefix = prefix
+        self.window = window
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "RATELIMIT_CACHE_ALIAS", "default")]
+
+    def _keys(self, key, now):
+        # Hashed so any string (usernames, IPv6 addresses) makes a valid key
+        digest = hashlib.md5(str(key).encode()).hexdigest()
+        index = int(now // self.window)
+        return (
+            f"ratelimit:{self.prefix}:{digest}:{index}",
+            f"ratelimit:{self.prefix}:{digest}:{index - 1}",
+        )
+
+    def count(self, key, now=None):
+        now = time.time() if now is None else now
+        current, previous = self._keys(key, now)
+        values = self.cache.get_many([current, previous])
+        overlap = 1 - (now % self.window) / self.window
+        return values.get(current, 0) + values.get(previous, 0) * overlap
+
+    def hit(self, key, now=None):
+        """
+        Count a hit and return the sliding count including it. The increment
+        is atomic, so concurrent hits each see a distinct count.
+        """
+        now = time.time() if now is None else now
+        current, previous = self._keys(key, now)
+        # Kept long enough to serve as the previous window
+        timeout = 2 * self.window
+        self.cache.add(current, 0, timeout)
+        try:
+            hits = self.cache.incr(current)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.set(current, 1, timeout)
+            hits = 1
+        overlap = 1 - (now % self.window) / self.window
+        return hits + self.cache.get(previous, 0) * overlap
+
+    def reset(self, key, now=None):
+        now = time.time() if now is None else now
+        self.cache.delete_many(self._keys(key, now))
+
+    def retry_after(self, now=None):
+        """
+        Seconds until the current window ends and older hits start to age out.
+        """
+        now = time.time() if now is None else now
+        return max(1, math.ceil(self.window - now % self.window))
@@ -0,0 +1,277 @@
+# core/realtime.py
+"""
+Publish/subscribe of push events to connected users (see core.websocket).
+
+Each WebSocket connection subscribes to its user's events with a bounded
+queue of REALTIME_QUEUE_SIZE encoded events. Publishing never blocks: an
+event is offered to every subscription of its users, and a subscription
+whose queue is full is marked overflowed and closed by its connection,
+whose client reconnects and catches up over the REST API. A slow client
+therefore costs at most one full queue, never the publisher's time.
+
+publish() can be called from any thread, inside a transaction or not. The
+broker hands events to the REALTIME_BACKEND, which delivers them to the
+subscribers of every process:
+
+- LocalBackend delivers in this process only, once the publishing
+  transaction commits. It suits a single process and tests.
+- DatabaseBackend also writes each event to the RealtimeEvent table, in the
+  publishing transaction (so rolled back writes publish nothing), and
+  every process with subscribers polls that table for the events published
+  by the others.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import RealtimeEvent
+
+logger = logging.getLogger(__name__)
+
+
+class Overflowed(Exception):
+    pass
+
+
+class Subscription:
+    """
+    One connection's queue of encoded events. Lives on the event loop that
+    created it; offer() and next() must run there. ``on_overflow`` is called
+    when the queue overflows, so a connection stuck sending can be closed.
+    """
+
+    def __init__(self, user_id, max_size):
+        self.user_id = user_id
+        self.max_size = max_size
+        self.loop = asyncio.get_running_loop()
+        self.events = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.on_overflow = None
+
+    def offer(self, payload):
+        if self.overflowed:
+            return
+        if len(self.events) >= self.max_size:
+            self.overflowed = True
+            self.events.clear()
+            if self.on_overflow is not None:
+                self.on_overflow()
+        else:
+            self.events.append(payload)
+        self.ready.set()
+
+    async def next(self):
+        """
+        Wait for the next encoded event; raise Overflowed once the queue has
+        overflowed.
+        """
+        while not self.events and not self.overflowed:
+            self.ready.clear()
+            await self.ready.wait()
+        if self.overflowed:
+            raise Overflowed
+        return self.events.popleft()
+
+
+class Broker:
+    def __init__(self, backend_path=None, queue_size=None):
+        self.queue_size = queue_size or getattr(settings, "REALTIME_QUEUE_SIZE", 100)
+        backend_path = backend_path or getattr(
+            settings, "REALTIME_BACKEND", "core.realtime.LocalBackend"
+        )
+        self.backend = import_string(backend_path)(self)
+        # user id -> set of subscriptions
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self.connections = 0
+
+    def subscribe(self, user_id):
+        """
+        Return a new Subscription to ``user_id``'s events; call from the
+        connection's event loop.
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self.connections += 1
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                self.connections -= 1
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_ids, event):
+        """
+        Send ``event`` (a JSON-serializable dict) to every connection of
+        ``user_ids``, once the current transaction commits.
+        """
+        user_ids = sorted(set(user_ids))
+        if user_ids:
+            payload = json.dumps(event, cls=JSONEncoder, separators=(",", ":"))
+            self.backend.publish(user_ids, payload)
+
+    def deliver(self, user_ids, payload):
+        """
+        Queue an encoded event on this process's subscriptions of
+        ``user_ids``; safe to call from any thread.
+        """
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for subscription in targets:
+            if subscription.loop is running:
+                subscription.offer(payload)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.offer, payload)
+
+    def subscribed_users(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+
+class LocalBackend:
+    """
+    Delivers events to this process's subscribers only.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def publish(self, user_ids, payload):
+        transaction.on_commit(lambda: self.broker.deliver(user_ids, payload))
+
+
+class DatabaseBackend(LocalBackend):
+    """
+    Shares events between processes through the RealtimeEvent table.
+
+    Events are delivered to local subscribers on commit, as LocalBackend
+    does, and stored for the other processes. Once a process has a
+    subscriber, a thread polls for rows from other processes every
+    REALTIME_POLL_INTERVAL_MS and deletes rows older than
+    REALTIME_EVENT_TTL seconds. Polling follows the id order, so on a
+    database where a lower id can commit after a higher one has been read
+    (PostgreSQL under concurrent publishers) that event is skipped.
+    """
+
+    def __init__(self, broker):
+        super().__init__(broker)
+        self.origin = uuid.uuid4().hex
+        self.interval = getattr(settings, "REALTIME_POLL_INTERVAL_MS", 100) / 1000
+        self.ttl = getattr(settings, "REALTIME_EVENT_TTL", 60)
+        self.batch_size = 1000
+        self._poller = None
+        self._lock = threading.Lock()
+        self.last_id = None
+
+    def publish(self, user_ids, payload):
+        RealtimeEvent.objects.create(
+            origin=self.origin, user_ids=user_ids, payload=payload
+        )
+        super().publish(user_ids, payload)
+
+    def start(self):
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self._run, name="realtime-poller", daemon=True
+                )
+                self._poller.start()
+
+    def _run(self):
+        pruned = 0.0
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.poll()
+                if time.monotonic() - pruned > self.ttl:
+                    self.prune()
+                    pruned = time.monotonic()
+            except Exception:
+                logger.exception("Polling realtime events failed")
+
+    def poll(self):
+        """
+        Deliver the events other processes published since the last poll.
+        """
+        if self.last_id is None:
+            self.last_id = (
+                RealtimeEvent.objects.order_by("-id")
+                .values_list("id", flat=True)
+                .first()
+                or 0
+            )
+        subscribed = set(self.broker.subscribed_users())
+        while True:
+            rows = list(
+                RealtimeEvent.objects.filter(id__gt=self.last_id)
+                .order_by("id")
+                .values_list("id", "origin", "user_ids", "payload")[: self.batch_size]
+            )
+            for event_id, origin, user_ids, payload in rows:
+                self.last_id = event_id
+                targets = subscribed.intersection(user_ids)
+                if origin != self.origin and targets:
+                    self.broker.deliver(targets, payload)
+            if len(rows) < self.batch_size:
+                return
+
+    def prune(self):
+        cutoff = timezone.now() - timedelta(seconds=self.ttl)
+        RealtimeEvent.objects.filter(created_at__lt=cutoff).delete()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker()
+        return _broker
+
+
+def reset_broker(broker=None):
+    """
+    Replace the process's broker (a new one from settings by default).
+    """
+    global _broker
+    with _broker_lock:
+        _broker = broker
+    return get_broker()
+
+
+def publish(user_ids, event):
+    get_broker().publish(user_ids, event)
@@ -0,0 +1,517 @@
+# core/seed.py
+"""
+Synthetic data for load tests and benchmarks, generated by seed_chattera.
+
+Popularity follows a power law: users are followed, posts liked, commented
+on and shared, and hashtags used with probability proportional to
+``1 / rank ** skew``, so a few accounts and posts get most of the traffic
+and there is a long tail. Replies pick their parent uniformly among the
+comments so far, so threads that are already busy grow fastest.
+
+Rows are written with bulk_create in batches, in time order over the last
+``days`` days. Everything the signals would maintain is filled in
+afterwards: thread paths, replies and post counters, followers_count,
+hashtag indexes and home timelines, and inbox entries.
+
+Direct conversations pair a power-law ranked user with a random one, so the
+busiest accounts have many conversations.
+"""
+
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from interactions.models import Comment, Like, Share
+from interactions.signals import counter_subqueries
+from messages.conversations import direct_key
+from messages.models import Conversation, Message, Participant
+from posts.cache import invalidate_posts
+from posts.hashtags import index_posts
+from posts.models import Post, TimelineEntry
+from posts.timeline import CELEBRITY_THRESHOLD
+from users.models import CustomUser, Follow
+from .transfer import MODELS, THREAD_SQL, original_timestamps, refresh_replies
+
+# Every seeded account logs in with this password
+SEED_PASSWORD = "chattera-seed"
+
+# Replies are not nested deeper than this
+MAX_REPLY_DEPTH = 8
+
+WORDS = (
+    "the a of to and in is it you that was for on are with as be at one have "
+    "this from by hot but some what there we can out other were all your when "
+    "up use word how said an each she which do their time if will way about "
+    "many then them would write like so these her long make thing see him two"
+).split()
+
+
+def power_law(n, skew):
+    """
+    Cumulative weights of ranks 1..n, for random.choices(cum_weights=...).
+    """
+    return list(itertools.accumulate(1 / rank**skew for rank in range(1, n + 1)))
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class Seeder:
+    def __init__(
+        self,
+        users=1000,
+        posts=10_000,
+        likes=50_000,
+        comments=10_000,
+        shares=1000,
+        conversations=2000,
+        messages=20_000,
+        follows=20,
+        reply_ratio=0.4,
+        skew=1.1,
+        hashtags=500,
+        days=30,
+        seed=None,
+        batch_size=2000,
+        prefix="seed",
+        log=None,
+    ):
+        self.counts = {
+            "users": users,
+            "posts": posts,
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "conversations": conversations,
+            "messages": messages,
+        }
+        self.follows = follows
+        self.reply_ratio = reply_ratio
+        self.skew = skew
+        self.tags = [f"{prefix}tag{i}" for i in range(hashtags)]
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.log = log or (lambda message: None)
+
+    def run(self):
+        """
+        Generate everything; return ``{table: rows written}``.
+        """
+        written = {}
+        with original_timestamps(
+            [*MODELS, "direct_messages.conversation", "direct_messages.message"]
+        ):
+            for step in (
+                self.seed_users,
+                self.seed_follows,
+                self.seed_posts,
+                self.seed_timelines,
+                self.seed_likes,
+                self.seed_comments,
+                self.seed_shares,
+                self.refresh_post_counters,
+                self.seed_conversations,
+                self.seed_messages,
+            ):
+                start = time.perf_counter()
+                name, rows = step()
+                if name:
+                    written[name] = rows
+                    self.log(
+                        f"{name:<10} {rows:>9} rows in {time.perf_counter() - start:.1f}s"
+                    )
+        return written
+
+    def batches(self, total):
+        for done in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - done)
+
+    def ranked(self, ids):
+        """
+        ``ids`` shuffled into popularity order, with their power-law weights.
+        """
+        ids = list(ids)
+        self.random.shuffle(ids)
+        return ids, power_law(len(ids), self.skew)
+
+    def pick(self, ranked, k):
+        ids, weights = ranked
+        return self.random.choices(ids, cum_weights=weights, k=k)
+
+    def after(self, moment):
+        """
+        A random time between ``moment`` and now, usually soon after it.
+        """
+        span = (self.now - moment).total_seconds()
+        delay = min(self.random.expovariate(1 / 3600), span)
+        return moment + timedelta(seconds=delay)
+
+    def text(self, words):
+        return " ".join(self.random.choices(WORDS, k=words))
+
+    def seed_users(self):
+        # One hash for all accounts: hashing each would take minutes
+        password = make_password(SEED_PASSWORD)
+        offset = CustomUser.objects.filter(
+            username__startswith=f"{self.prefix}-"
+        ).count()
+        self.user_ids = []
+        for size in self.batches(self.counts["users"]):
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create(
+                    CustomUser(
+                        username=f"{self.prefix}-{offset + len(self.user_ids) + i}",
+                        password=password,
+                        bio=self.text(12),
+                        date_joined=self.start,
+                        updated_at=self.start,
+                    )
+                    for i in range(size)
+                )
+            self.user_ids += [user.pk for user in users]
+        # Who gets followed and who posts the most, ranked independently
+        self.followed = self.ranked(self.user_ids)
+        self.authors = self.ranked(self.user_ids)
+        return "users", len(self.user_ids)
+
+    def fill(self, model, total, build):
+        """
+        bulk_create ``build(size)`` batches until ``total`` new rows of
+        ``model`` exist. Pairs that already exist are dropped, so popular
+        pairs drawn twice are made up for by further batches.
+        """
+        last_pk = model.objects.order_by("-pk").values_list("pk", flat=True).first()
+        new = model.objects.filter(pk__gt=last_pk or 0)
+        written = stalled = 0
+        # A few batches adding nothing means (nearly) every pair is taken
+        while written < total and stalled < 3:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    build(min(self.batch_size, total - written)),
+                    ignore_conflicts=True,
+                )
+            progress, written = written, new.count()
+            stalled = stalled + 1 if written == progress else 0
+        return written
+
+    def seed_follows(self):
+        def build(size):
+            followers = self.random.choices(self.user_ids, k=size)
+            followees = self.pick(self.followed, size)
+            return [
+                Follow(
+                    follower_id=follower, followee_id=followee, created_at=self.start
+                )
+                for follower, followee in zip(followers, followees)
+                if follower != followee
+            ]
+
+        written = self.fill(Follow, len(self.user_ids) * self.follows, build)
+        followers = (
+            Follow.objects.filter(followee=OuterRef("pk"))
+            .values("followee")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        for chunk in chunks(self.user_ids, self.batch_size):
+            CustomUser.objects.filter(pk__in=chunk).update(
+                followers_count=Coalesce(Subquery(followers), 0)
+            )
+        Follow.objects.filter(followee__followers_count__gt=CELEBRITY_THRESHOLD).update(
+            followee_is_celebrity=True
+        )
+        return "follows", written
+
+    def seed_posts(self):
+        total = self.counts["posts"]
+        step = (self.now - self.start) / max(total, 1)
+        tag_weights = power_law(len(self.tags), self.skew)
+        self.post_ids = []
+        self.post_times = {}
+        for size in self.batches(total):
+            authors = self.pick(self.authors, size)
+            posts = []
+            for author in authors:
+                created_at = self.start + step * (len(self.post_ids) + len(posts))
+                tags = self.random.choices(
+                    self.tags, cum_weights=tag_weights, k=self.random.randint(0, 3)
+                )
+                posts.append(
+                    Post(
+                        user_id=author,
+                        content=" ".join(
+                            [self.text(self.random.randint(5, 40))]
+                            + [f"#{tag}" for tag in tags]
+                        ),
+                        created_at=created_at,
+                        updated_at=created_at,
+                        # A few deleted and private posts, like production
+                        is_active=self.random.random() > 0.02,
+                        visibility=(
+                            "private" if self.random.random() < 0.05 else "public"
+                        ),
+                    )
+                )
+            with transaction.atomic():
+                posts = Post.objects.bulk_create(posts)
+                index_posts(posts)
+            for post in posts:
+                self.post_ids.append(post.pk)
+                self.post_times[post.pk] = post.created_at
+        self.popular = self.ranked(self.post_ids)
+        return "posts", len(self.post_ids)
+
+    def seed_timelines(self):
+        """
+        Fan the seeded posts out to their authors' followers, as
+        posts.timeline.fan_out_post would have.
+        """
+        written = 0
+        for chunk in chunks(self.post_ids, self.batch_size):
+            posts = list(
+                Post.objects.filter(
+                    pk__in=chunk, is_active=True, visibility="public"
+                ).values_list("pk", "user_id", "created_at")
+            )
+            followers = {}
+            for followee, follower in Follow.objects.filter(
+                followee_id__in={user_id for _, user_id, _ in posts},
+                followee__followers_count__lte=CELEBRITY_THRESHOLD,
+            ).values_list("followee_id", "follower_id"):
+                followers.setdefault(followee, []).append(follower)
+            entries = [
+                TimelineEntry(user_id=reader, post_id=pk, created_at=created_at)
+                for pk, user_id, created_at in posts
+                for reader in [user_id] + followers.get(user_id, [])
+            ]
+            with transaction.atomic():
+                TimelineEntry.objects.bulk_create(
+                    entries, batch_size=self.batch_size, ignore_conflicts=True
+                )
+            written += len(entries)
+        return "timelines", written
+
+    def seed_likes(self):
+        def build(size):
+            return [
+                Like(
+                    post_id=post,
+                    user_id=user,
+                    created_at=self.after(self.post_times[post]),
+                )
+                for post, user in zip(
+                    self.pick(self.popular, size),
+                    self.random.choices(self.user_ids, k=size),
+                )
+            ]
+
+        return "likes", self.fill(Like, self.counts["likes"], build)
+
+    def seed_comments(self):
+        total = self.counts["comments"]
+        replies = int(total * self.reply_ratio)
+        # (id, post, created_at, root, depth, path) of comments that can be
+        # replied to, and of those in the last batch
+        self.threads, self.recent = [], []
+        written = 0
+        for size in self.batches(total - replies):
+            posts = self.pick(self.popular, size)
+            written += self.insert_comments(
+                [(post, None, self.after(self.post_times[post])) for post in posts]
+            )
+        # Replies come in small generations, half of them answering the
+        # previous generation, so conversations run several levels deep
+        generation = max(1, min(self.batch_size, replies // 20))
+        while written < total and self.threads:
+            size = min(generation, total - written)
+            parents = [
+                self.random.choice(
+                    self.recent
+                    if self.recent and self.random.random() < 0.5
+                    else self.threads
+                )
+                for _ in range(size)
+            ]
+            written += self.insert_comments(
+                [(parent[1], parent, self.after(parent[2])) for parent in parents]
+            )
+        refresh = [thread[0] for thread in self.threads]
+        for chunk in chunks(refresh, self.batch_size):
+            refresh_replies(chunk)
+        return "comments", written
+
+    def insert_comments(self, specs):
+        """
+        Insert comments from ``(post, parent thread tuple or None, created_at)``
+        and set their thread position; return how many were written.
+        """
+        with transaction.atomic():
+            comments = Comment.objects.bulk_create(
+                Comment(
+                    post_id=post,
+                    user_id=user,
+                    parent_id=parent[0] if parent else None,
+                    content=self.text(self.random.randint(3, 30)),
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+                for (post, parent, created_at), user in zip(
+                    specs, self.pick(self.authors, len(specs))
+                )
+            )
+            rows, self.recent = [], []
+            for comment, (_, parent, created_at) in zip(comments, specs):
+                segment = f"{comment.pk:0{Comment.PATH_SEGMENT_WIDTH}d}"
+                root, depth, path = comment.pk, 0, segment
+                if parent is not None:
+                    root, parent_depth, parent_path = parent[3:]
+                    depth, path = parent_depth + 1, f"{parent_path}/{segment}"
+                rows.append((root, depth, path, comment.pk))
+                if depth < MAX_REPLY_DEPTH:
+                    self.recent.append(
+                        (comment.pk, comment.post_id, created_at, root, depth, path)
+                    )
+            self.threads += self.recent
+            with connection.cursor() as cursor:
+                cursor.executemany(THREAD_SQL, rows)
+        return len(comments)
+
+    def seed_shares(self):
+        written = 0
+        for size in self.batches(self.counts["shares"]):
+            posts = self.pick(self.popular, size)
+            users = self.pick(self.authors, size)
+            with transaction.atomic():
+                shares = Share.objects.bulk_create(
+                    Share(
+                        post_id=post,
+                        user_id=user,
+                        created_at=self.after(self.post_times[post]),
+                    )
+                    for post, user in zip(posts, users)
+                )
+            written += len(shares)
+        return "shares", written
+
+    def refresh_post_counters(self):
+        # bulk_create skips the counter signals
+        for chunk in chunks(self.post_ids, self.batch_size):
+            Post.objects.filter(pk__in=chunk).update(**counter_subqueries())
+        invalidate_posts([], membership_changed=True)
+        return None, 0
+
+    def seed_conversations(self):
+        existing = set(
+            Conversation.objects.filter(key__isnull=False).values_list("key", flat=True)
+        )
+        total = self.counts["conversations"]
+        pairs = {}
+        stalled = 0
+        while len(pairs) < total and stalled < 3:
+            found = len(pairs)
+            for user, other in zip(
+                self.pick(self.authors, total),
+                self.random.choices(self.user_ids, k=total),
+            ):
+                key = direct_key(user, other)
+                if user != other and key not in existing:
+                    pairs.setdefault(key, (user, other))
+            stalled = stalled + 1 if len(pairs) == found else 0
+        pairs = list(pairs.items())[:total]
+
+        self.conversations = []  # (id, (user, other))
+        for chunk in chunks(pairs, self.batch_size):
+            with transaction.atomic():
+                conversations = Conversation.objects.bulk_create(
+                    Conversation(key=key, created_at=self.start) for key, _ in chunk
+                )
+                Participant.objects.bulk_create(
+                    Participant(
+                        conversation_id=conversation.pk,
+                        user_id=user,
+                        last_message_at=self.start,
+                    )
+                    for conversation, (_, users) in zip(conversations, chunk)
+                    for user in users
+                )
+            self.conversations += [
+                (conversation.pk, users)
+                for conversation, (_, users) in zip(conversations, chunk)
+            ]
+        return "conversations", len(self.conversations)
+
+    def seed_messages(self):
+        """
+        Messages spread over the conversations with power-law popularity,
+        then every inbox entry's last activity and unread count, as
+        messages.conversations.send_message would have kept them.
+        """
+        if not self.conversations:
+            return "messages", 0
+        members = dict(self.conversations)
+        busy = self.ranked(members)
+        specs = sorted(
+            (self.start + (self.now - self.start) * self.random.random(), conversation)
+            for conversation in self.pick(busy, self.counts["messages"])
+        )
+        # conversation -> [(created_at, message id, sender)], in time order
+        history = {}
+        for chunk in chunks(specs, self.batch_size):
+            with transaction.atomic():
+                messages = Message.objects.bulk_create(
+                    Message(
+                        conversation_id=conversation,
+                        sender_id=self.random.choice(members[conversation]),
+                        content=self.text(self.random.randint(2, 25)),
+                        created_at=created_at,
+                    )
+                    for created_at, conversation in chunk
+                )
+            for message in messages:
+                history.setdefault(message.conversation_id, []).append(
+                    (message.created_at, message.pk, message.sender_id)
+                )
+
+        for chunk in chunks(list(history.items()), self.batch_size):
+            entries = {
+                (entry.conversation_id, entry.user_id): entry
+                for entry in Participant.objects.filter(
+                    conversation_id__in=[conversation for conversation, _ in chunk]
+                )
+            }
+            conversations = []
+            for conversation, messages in chunk:
+                conversations.append(
+                    Conversation(pk=conversation, last_message_id=messages[-1][1])
+                )
+                for user in members[conversation]:
+                    # Up to date, or read up to their last message
+                    read = len(messages)
+                    if self.random.random() < 0.5:
+                        read = max(
+                            (i + 1 for i, m in enumerate(messages) if m[2] == user),
+                            default=0,
+                        )
+                    entry = entries[conversation, user]
+                    entry.last_message_at = messages[-1][0]
+                    entry.last_read_at = messages[read - 1][0] if read else None
+                    entry.unread_count = sum(1 for m in messages[read:] if m[2] != user)
+            with transaction.atomic():
+                Conversation.objects.bulk_update(conversations, ["last_message"])
+                Participant.objects.bulk_update(
+                    entries.values(),
+                    ["last_message_at", "last_read_at", "unread_count"],
+                )
+        return "messages", len(specs)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,9 +39,12 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     # Installed apps
+    "core",
     "posts",
     "interactions",
     "users",
+    "messages",
+    "notifications",
     # Third-party apps
     "rest_framework",
     "rest_framework_simplejwt",
@@ -48,7 +52,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its view time covers the whole stack (core.instrumentation)
+    "core.instrumentation.RequestProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Sheds writes over WRITE_CONCURRENCY_LIMIT before any other work
+    "core.middleware.WriteConcurrencyLimitMiddleware",
+    # Before anything that reads from the database
+    "core.db.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -81,13 +91,86 @@ WSGI_APPLICATION = "core.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+# The profile is picked from the environment:
+#   CHATTERA_DB_ENGINE    "sqlite" (default) or "postgresql"
+#   CHATTERA_DB_NAME      SQLite file or PostgreSQL database name
+#   CHATTERA_DB_REPLICAS  comma-separated replica SQLite files or PostgreSQL
+#                         hosts, served as "replica_1", "replica_2", ...
+# PostgreSQL also reads CHATTERA_DB_USER, _PASSWORD, _HOST and _PORT.
+
+DATABASE_ENGINE = os.environ.get("CHATTERA_DB_ENGINE", "sqlite")
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer; synchronous=NORMAL is durable in WAL mode apart from the last
+# transactions before a power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms to wait for the write lock before failing
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+if DATABASE_ENGINE == "postgresql":
+    PRIMARY_DATABASE = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("CHATTERA_DB_NAME", "chattera"),
+        "USER": os.environ.get("CHATTERA_DB_USER", ""),
+        "PASSWORD": os.environ.get("CHATTERA_DB_PASSWORD", ""),
+        "HOST": os.environ.get("CHATTERA_DB_HOST", ""),
+        "PORT": os.environ.get("CHATTERA_DB_PORT", ""),
+    }
+else:
+    PRIMARY_DATABASE = {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("CHATTERA_DB_NAME", BASE_DIR / "db.sqlite3"),
+        "OPTIONS": {
+            "init_command": "; ".join(
+                f"PRAGMA {name} = {value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            # Take the write lock at BEGIN, so a transaction that reads and
+            # then writes waits on busy_timeout instead of failing mid-way
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
+
+# Keep connections open across requests, checking them before reuse
+PRIMARY_DATABASE["CONN_MAX_AGE"] = 600
+PRIMARY_DATABASE["CONN_HEALTH_CHECKS"] = True
+
+DATABASES = {"default": PRIMARY_DATABASE}
+for number, location in enumerate(
+    filter(None, os.environ.get("CHATTERA_DB_REPLICAS", "").split(",")), start=1
+):
+    location_setting = "HOST" if DATABASE_ENGINE == "postgresql" else "NAME"
+    DATABASES[f"replica_{number}"] = {
+        **PRIMARY_DATABASE,
+        location_setting: location.strip(),
+        # Tests read replicas through the primary's connection
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Reads go to a replica, writes and everything after them to "default"
+DATABASE_ROUTERS = ["core.db.PrimaryReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Swap in "django.core.cache.backends.filebased.FileBasedCache" with a
+# directory LOCATION to share the cache between worker processes.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "chattera",
+        "OPTIONS": {"MAX_ENTRIES": 10_000},
     }
 }
 
+# Read-through cache of serialized posts (posts.cache)
+POST_CACHE_ALIAS = "default"
+POST_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -125,6 +208,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (Post.image, CustomUser.profile_picture)
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -137,11 +224,101 @@ AUTH_USER_MODEL = "users.CustomUser"
 # Rest Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Only views with a throttle_scope are limited (core.throttling)
+    "DEFAULT_THROTTLE_CLASSES": [
+        "core.throttling.ScopedUserThrottle",
+        "core.throttling.ScopedIPThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "like.user": "120/min",
+        "like.ip": "600/min",
+        "comment.user": "20/min",
+        "comment.ip": "200/min",
+        "register.ip": "20/hour",
+        "message.user": "60/min",
+        "message.ip": "600/min",
+    },
 }
 
+# Write load shedding (core.middleware)
+WRITE_CONCURRENCY_LIMIT = 64  # Writes in flight per process before 503s; 0 = off
+WRITE_CONCURRENCY_RETRY_AFTER = 1  # Seconds, sent as Retry-After
+
+# Request profiling (core.instrumentation)
+REQUEST_PROFILING_SAMPLE_RATE = 0.01  # Fraction of requests profiled; 0 = off
+REQUEST_PROFILING_SLOW_MS = 500  # Profiled requests this slow are logged
+REQUEST_PROFILING_REPEATED_QUERIES = 5  # Runs of one query shape logged as N+1
+
+# Push events over WebSockets (core.realtime, core.websocket). LocalBackend
+# is per process, like the locmem cache; use core.realtime.DatabaseBackend
+# when serving from more than one process
+REALTIME_BACKEND = "core.realtime.LocalBackend"
+REALTIME_QUEUE_SIZE = 100  # Events a connection may fall behind before it's closed
+REALTIME_MAX_CONNECTIONS = 10_000  # Open WebSockets per process
+REALTIME_POLL_INTERVAL_MS = 100  # DatabaseBackend: how often events are polled
+REALTIME_EVENT_TTL = 60  # DatabaseBackend: seconds events are kept
+
+# Coalesced notifications (notifications.notify)
+NOTIFICATION_SAMPLE_ACTORS = 3  # Most recent actors kept on each notification
+# Distinct actors remembered per notification so repeats aren't counted twice;
+# past this many, further actors' repeat events are counted again
+NOTIFICATION_COUNTED_ACTORS = 1000
+
+# JWT authentication (users.authentication)
+AUTH_USER_CACHE_SIZE = 10_000  # Users kept in each process's LRU
+AUTH_USER_CACHE_TTL = 30  # Seconds a cached user is trusted; 0 disables the cache
+AUTH_STATELESS_READS = False  # Read-only post views trust token claims, no user query
+
+# Login hashing pool and brute-force limits (users.login)
+LOGIN_HASH_WORKERS = 2  # Threads hashing passwords; 0 hashes on the request thread
+LOGIN_HASH_QUEUE_SIZE = 16  # Checks queued or running before logins get a 429
+LOGIN_FAILURE_WINDOW = 900  # Seconds of the sliding failure window
+LOGIN_MAX_FAILURES_PER_USERNAME = 5
+LOGIN_MAX_FAILURES_PER_IP = 50
+RATELIMIT_CACHE_ALIAS = "default"  # Cache holding core.ratelimit counters
+
+# Routes served by their async variant (core.views.select_view); only worth
+# enabling under an ASGI server such as uvicorn. Choices: "post_list",
+# "post_detail", "profile"
+ASYNC_VIEWS = []
+
+# Keyset pagination (core.pagination.KeysetPagination)
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Post and user lists render pages from .values() rows (core.fastpath)
+FAST_SERIALIZERS = True
+
+# Admin user export (users.export)
+USER_EXPORT_CHUNK_SIZE = 2000  # Users fetched per query while streaming
+
+# Home timelines (posts.timeline)
+TIMELINE_FANOUT_BATCH_SIZE = 1000  # Follower rows inserted per bulk INSERT
+TIMELINE_CELEBRITY_THRESHOLD = 10_000  # Above this, merge at read time instead
+TIMELINE_BACKFILL_SIZE = 100  # Recent posts copied into a new follower's timeline
+
+# Threaded comments (interactions.threads)
+COMMENT_THREAD_MAX_DEPTH = 3  # Reply levels nested under each comment in a page
+COMMENT_THREAD_REPLIES_PER_COMMENT = 5  # Replies shown per comment before "more"
+
+# Hashtags and trending tags (posts.hashtags)
+HASHTAG_BUCKET_SECONDS = 300  # Width of one trending counter bucket
+HASHTAG_TRENDING_MAX_LIMIT = 50  # Upper bound on ?limit= for trending tags
+
+# Image derivatives (core.images)
+IMAGE_DERIVATIVE_SIZES = {"thumb": (150, 150), "medium": (800, 800)}
+IMAGE_DERIVATIVE_QUALITY = 82
+IMAGE_DERIVATIVE_WORKERS = 2  # Resizing processes; 0 renders inline
+IMAGE_DERIVATIVE_QUEUE_SIZE = 64  # Jobs in the pool at once; the rest wait in memory
+
+# Write-behind like buffer (interactions.buffer)
+LIKE_WRITE_BEHIND = False  # Buffer like toggles and write them in batches
+LIKE_FLUSH_INTERVAL_MS = 200
+LIKE_FLUSH_MAX_BATCH = 5000  # Pending toggles that trigger an early flush
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Chattera API",
     "DESCRIPTION": "API for the Chattera - Stay Connected project.",
@@ -0,0 +1,544 @@
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from interactions.models import Comment, Like, Share
+from messages.models import Message, Participant
+from posts.models import Post, PostHashtag
+from posts.views import AsyncPostListView
+from users.models import CustomUser, Follow
+from users.views import AsyncUserProfileView
+from . import db
+from .benchmarks import ENDPOINTS, SKIPPED, BenchData, bench_settings, measure, routes
+from .db import PrimaryReplicaRouter, ReplicaPinningMiddleware
+from .instrumentation import RequestProfilingMiddleware
+from .middleware import WriteConcurrencyLimitMiddleware
+from .models import ImportCheckpoint, RealtimeEvent
+from .ratelimit import SlidingWindowCounter
+from .realtime import Broker, DatabaseBackend, reset_broker
+from .seed import SEED_PASSWORD, Seeder
+from .websocket import WebSocketApplication
+
+# The async post and profile views, for AsyncViewCsrfTests
+urlpatterns = [
+    path("posts/", AsyncPostListView.as_view()),
+    path("users/profile/", AsyncUserProfileView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewCsrfTests(TestCase):
+    def test_token_authenticated_writes_skip_csrf_checks(self):
+        user = CustomUser.objects.create_user(username="async_writer")
+        client = Client(
+            enforce_csrf_checks=True,
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+        )
+        response = client.post(
+            "/posts/", {"content": "via async"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        response = client.put(
+            "/users/profile/", {"bio": "via async"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["bio"], "via async")
+
+
+@mock.patch.object(db, "replica_aliases", lambda: ["replica_1"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def run_isolated(self, func, *args):
+        # Start unpinned (setting up the test database writes) and keep the
+        # pin set by ``func`` out of other tests
+        def run():
+            db._pinned.set(False)
+            return func(*args)
+
+        return contextvars.copy_context().run(run)
+
+    def test_reads_go_to_a_replica(self):
+        self.assertEqual(self.run_isolated(self.router.db_for_read, Post), "replica_1")
+
+    def test_reads_follow_a_write_to_the_primary(self):
+        def write_then_read():
+            self.assertEqual(self.router.db_for_write(Post), "default")
+            return self.router.db_for_read(Post)
+
+        self.assertEqual(self.run_isolated(write_then_read), "default")
+
+    def test_reads_stay_with_the_instance_database(self):
+        post = Post()
+        post._state.db = "default"
+        self.assertEqual(
+            self.run_isolated(lambda: self.router.db_for_read(Post, instance=post)),
+            "default",
+        )
+
+    def test_only_the_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "posts"))
+        self.assertFalse(self.router.allow_migrate("replica_1", "posts"))
+
+    def test_unsafe_requests_are_pinned_for_their_duration(self):
+        seen = {}
+
+        def view(request):
+            seen[request.method] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+
+        def requests():
+            middleware(factory.post("/"))
+            middleware(factory.get("/"))
+            return db.is_pinned()
+
+        self.assertFalse(self.run_isolated(requests))
+        self.assertEqual(seen, {"POST": "default", "GET": "replica_1"})
+
+
+@mock.patch.object(db, "replica_aliases", lambda: ["replica_1"])
+class PrimaryReplicaTransactionTests(TestCase):
+    def test_reads_inside_a_transaction_go_to_the_primary(self):
+        with transaction.atomic():
+            self.assertEqual(PrimaryReplicaRouter().db_for_read(Post), "default")
+
+    def test_sqlite_pragmas_are_applied(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class SlidingWindowCounterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = SlidingWindowCounter("test", window=60)
+
+    def test_previous_window_ages_out(self):
+        for _ in range(4):
+            self.counter.hit("key", now=600)
+        self.assertEqual(self.counter.count("key", now=659), 4)
+        # Half of the previous window still overlaps the last 60 seconds
+        self.assertEqual(self.counter.count("key", now=690), 2)
+        self.assertEqual(self.counter.count("key", now=720), 0)
+        self.assertEqual(self.counter.retry_after(now=690), 30)
+
+    def test_keys_are_independent_and_resettable(self):
+        self.counter.hit("a", now=600)
+        self.counter.hit("b", now=600)
+        self.counter.reset("a", now=610)
+        self.assertEqual(self.counter.count("a", now=610), 0)
+        self.assertEqual(self.counter.count("b", now=610), 1)
+
+
+@override_settings(WRITE_CONCURRENCY_LIMIT=2, WRITE_CONCURRENCY_RETRY_AFTER=3)
+class WriteConcurrencyLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.middleware = WriteConcurrencyLimitMiddleware(
+            lambda request: HttpResponse()
+        )
+        self.factory = RequestFactory()
+
+    def test_writes_over_the_limit_are_shed(self):
+        self.middleware.in_flight = 2
+        response = self.middleware(self.factory.post("/"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "3")
+        # Reads are never limited
+        self.assertEqual(self.middleware(self.factory.get("/")).status_code, 200)
+
+    def test_slot_is_released_after_the_response(self):
+        self.middleware.in_flight = 1
+        self.assertEqual(self.middleware(self.factory.post("/")).status_code, 200)
+        self.assertEqual(self.middleware.in_flight, 1)
+
+
+@override_settings(REQUEST_PROFILING_SAMPLE_RATE=1, REQUEST_PROFILING_SLOW_MS=10_000)
+class RequestProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(username="author")
+        Post.objects.bulk_create(
+            Post(user=author, content=f"post {i}") for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def timings(self, response):
+        return {
+            metric.split(";")[0]: metric
+            for metric in response["Server-Timing"].split(", ")
+        }
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/posts/")
+        timings = self.timings(response)
+        self.assertIn(f'desc="{len(queries)} queries"', timings["db"])
+        self.assertRegex(timings["serialize"], r"dur=\d+\.\d$")
+        self.assertIn("view", timings)
+
+    @override_settings(REQUEST_PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_profiled(self):
+        self.assertNotIn("Server-Timing", self.client.get("/posts/"))
+
+    def test_repeated_query_shapes_are_logged(self):
+        def n_plus_one(request):
+            for post in Post.objects.all():
+                CustomUser.objects.get(pk=post.user_id)
+            # IN lists of any size are one shape
+            for size in range(1, 4):
+                list(Post.objects.filter(pk__in=range(size)))
+            return HttpResponse()
+
+        middleware = RequestProfilingMiddleware(n_plus_one)
+        with self.settings(REQUEST_PROFILING_REPEATED_QUERIES=3):
+            with self.assertLogs("core.instrumentation", "WARNING") as logs:
+                middleware(RequestFactory().get("/"))
+        record = logs.records[0].request_profile
+        self.assertEqual(record["queries"], 7)
+        self.assertEqual(
+            [entry["count"] for entry in record["repeated_queries"]], [3, 3]
+        )
+
+    def test_slow_requests_are_logged(self):
+        middleware = RequestProfilingMiddleware(lambda request: HttpResponse())
+        with self.settings(REQUEST_PROFILING_SLOW_MS=0):
+            with self.assertLogs("core.instrumentation", "WARNING") as logs:
+                middleware(RequestFactory().get("/"))
+        self.assertTrue(logs.output[0].startswith("WARNING:core.instrumentation:Slow"))
+
+
+class ExportImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        alice = CustomUser.objects.create_user(username="alice", bio="hi")
+        bob = CustomUser.objects.create_user(username="bob")
+        Follow.objects.create(follower=bob, followee=alice)
+        post = Post.objects.create(user=alice, content="first #import")
+        Post.objects.filter(pk=post.pk).update(created_at="2020-01-01T00:00:00Z")
+        Like.objects.create(post=post, user=bob)
+        top = Comment.objects.create(post=post, user=bob, content="top")
+        reply = Comment.objects.create(post=post, user=alice, content="re", parent=top)
+        Comment.objects.create(post=post, user=bob, content="re re", parent=reply)
+        Share.objects.create(post=post, user=bob)
+
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        call_command(
+            "export_chattera", output=self.path, chunk_size=2, stdout=StringIO()
+        )
+
+        # A different database: bob already exists, and ids are taken
+        Post.objects.all().delete()
+        CustomUser.objects.exclude(username="bob").delete()
+        self.bob = CustomUser.objects.get(username="bob")
+        filler = CustomUser.objects.create_user(username="filler")
+        Post.objects.create(user=filler, content="already here")
+
+    def import_file(self):
+        call_command("import_chattera", self.path, batch_size=2, stdout=StringIO())
+
+    def assert_imported(self):
+        post = Post.objects.get(content="first #import")
+        self.assertEqual(post.user.username, "alice")
+        self.assertEqual(post.user.bio, "hi")
+        self.assertEqual(post.user.followers_count, 0)  # Follows aren't exported
+        self.assertEqual(post.created_at.year, 2020)
+        self.assertEqual(
+            (post.likes_count, post.comments_count, post.shares_count), (1, 3, 1)
+        )
+        self.assertEqual(list(post.likes.values_list("user", flat=True)), [self.bob.pk])
+        self.assertTrue(PostHashtag.objects.filter(post=post).exists())
+
+        comments = {comment.content: comment for comment in post.comments.all()}
+        top, deepest = comments["top"], comments["re re"]
+        self.assertEqual(deepest.parent, comments["re"])
+        self.assertEqual((deepest.root_id, deepest.depth), (top.pk, 2))
+        self.assertEqual(
+            deepest.path.split("/"),
+            [f"{c.pk:010d}" for c in (top, comments["re"], deepest)],
+        )
+        self.assertEqual(top.replies_count, 1)
+
+    def test_round_trip_remaps_keys(self):
+        self.import_file()
+        self.assert_imported()
+        self.assertEqual(CustomUser.objects.filter(username="bob").count(), 1)
+
+    def test_fields_missing_from_older_exports_get_defaults(self):
+        with open(self.path) as export:
+            rows = [json.loads(line) for line in export]
+        for row in rows:
+            if row["model"] == "users.customuser":
+                del row["fields"]["updated_at"]
+        with open(self.path, "w") as export:
+            export.writelines(json.dumps(row) + "\n" for row in rows)
+        self.import_file()
+        self.assert_imported()
+        self.assertIsNotNone(CustomUser.objects.get(username="alice").updated_at)
+
+    def test_likes_already_present_are_counted_as_skipped(self):
+        with open(self.path) as export:
+            rows = [json.loads(line) for line in export]
+        like = next(row for row in rows if row["model"] == "interactions.like")
+        rows.insert(rows.index(like), like)
+        with open(self.path, "w") as export:
+            export.writelines(json.dumps(row) + "\n" for row in rows)
+        out = StringIO()
+        call_command("import_chattera", self.path, batch_size=2, stdout=out)
+        self.assert_imported()
+        line = next(l for l in out.getvalue().splitlines() if "interactions.like" in l)
+        self.assertIn(" 1 rows", line)
+        self.assertIn("1 skipped", line)
+
+    def test_interrupted_import_resumes(self):
+        with mock.patch(
+            "core.transfer.Importer.import_comment", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.import_file()
+        # Users, the post and the like were committed before the failure
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.lines_done, 4)
+
+        self.import_file()
+        self.assert_imported()
+        self.assertEqual(Post.objects.filter(content="first #import").count(), 1)
+
+
+class SeedTests(TestCase):
+    def test_seeded_data_is_consistent(self):
+        written = Seeder(
+            users=20,
+            posts=100,
+            likes=300,
+            comments=120,
+            shares=10,
+            conversations=30,
+            messages=200,
+            seed=1,
+        ).run()
+        self.assertEqual(written["users"], 20)
+        self.assertEqual(written["likes"], Like.objects.count())
+        self.assertEqual(Comment.objects.count(), 120)
+        self.assertTrue(Comment.objects.filter(depth__gte=2).exists())
+        for post in Post.objects.all():
+            self.assertEqual(
+                (post.likes_count, post.comments_count, post.shares_count),
+                (post.likes.count(), post.comments.count(), post.shares.count()),
+            )
+        for reply in Comment.objects.filter(parent__isnull=False).select_related(
+            "parent"
+        ):
+            self.assertEqual(reply.root_id, reply.parent.root_id)
+            self.assertTrue(reply.path.startswith(reply.parent.path + "/"))
+        user = CustomUser.objects.get(username="seed-0")
+        self.assertTrue(user.check_password(SEED_PASSWORD))
+        self.assertEqual(user.followers_count, user.followers.count())
+        for entry in Participant.objects.select_related("conversation"):
+            messages = Message.objects.filter(conversation=entry.conversation_id)
+            last = messages.order_by("created_at", "id").last()
+            if last is None:
+                self.assertIsNone(entry.conversation.last_message_id)
+                continue
+            self.assertEqual(entry.conversation.last_message_id, last.pk)
+            self.assertEqual(entry.last_message_at, last.created_at)
+            if entry.last_read_at is not None:
+                messages = messages.filter(created_at__gt=entry.last_read_at)
+            self.assertEqual(
+                entry.unread_count, messages.exclude(sender=entry.user_id).count()
+            )
+
+
+class EndpointBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Seeder(users=30, posts=150, likes=400, comments=150, shares=20, seed=1).run()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(
+            set(routes()), {endpoint.route for endpoint in ENDPOINTS} | SKIPPED.keys()
+        )
+
+    def test_endpoints_stay_within_query_budgets(self):
+        with bench_settings():
+            bench = BenchData()
+            for endpoint in ENDPOINTS:
+                with self.subTest(str(endpoint)):
+                    _, queries, statuses, _ = measure(endpoint, bench, repeat=2)
+                    self.assertEqual(statuses, [endpoint.status] * 2)
+                    self.assertLessEqual(max(queries), endpoint.budget)
+
+
+class WebSocketTests(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="x")
+        self.fan = CustomUser.objects.create_user(username="fan", password="x")
+        self.post = Post.objects.create(user=self.author, content="hello")
+        self.broker = reset_broker(Broker("core.realtime.LocalBackend"))
+        self.addCleanup(reset_broker)
+
+    def connect(self, user, path="/ws/"):
+        token = AccessToken.for_user(user) if user else "not-a-token"
+        return ApplicationCommunicator(
+            WebSocketApplication(),
+            {
+                "type": "websocket",
+                "path": path,
+                "query_string": f"token={token}".encode(),
+                "headers": [],
+            },
+        )
+
+    async def receive_event(self, communicator):
+        return json.loads((await communicator.receive_output(1))["text"])
+
+    async def test_rejects_connections_without_a_valid_token(self):
+        communicator = self.connect(None)
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual(
+            await communicator.receive_output(1),
+            {"type": "websocket.close", "code": 4401},
+        )
+
+    async def test_pushes_likes_comments_and_messages(self):
+        communicator = self.connect(self.author)
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual(
+            await communicator.receive_output(1), {"type": "websocket.accept"}
+        )
+
+        def interact():
+            client = APIClient()
+            client.force_authenticate(self.fan)
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(reverse("like_post", args=[self.post.id]))
+                client.post(
+                    reverse("comment_post", args=[self.post.id]), {"content": "nice"}
+                )
+                client.post(
+                    reverse("direct_message", args=[self.author.id]), {"content": "hi"}
+                )
+
+        await sync_to_async(interact)()
+        like, comment, message = [
+            await self.receive_event(communicator) for _ in range(3)
+        ]
+        self.assertEqual(
+            like, {"type": "like", "post": self.post.id, "user": self.fan.id}
+        )
+        self.assertEqual(comment["comment"]["content"], "nice")
+        self.assertEqual(message["message"]["content"], "hi")
+
+        await communicator.send_input(
+            {"type": "websocket.receive", "text": '{"type": "ping"}'}
+        )
+        self.assertEqual(await self.receive_event(communicator), {"type": "pong"})
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(1)
+        self.assertEqual(self.broker.connections, 0)
+
+    async def test_slow_connection_is_closed_when_its_queue_overflows(self):
+        broker = reset_broker(Broker("core.realtime.LocalBackend", queue_size=2))
+        received = asyncio.Queue()
+        await received.put({"type": "websocket.connect"})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "websocket.send":
+                await asyncio.Event().wait()  # The client never reads
+
+        scope = {
+            "type": "websocket",
+            "path": "/ws/",
+            "query_string": f"token={AccessToken.for_user(self.author)}".encode(),
+        }
+        connection = asyncio.ensure_future(
+            WebSocketApplication()(scope, received.get, send)
+        )
+        while not broker.connections:
+            await asyncio.sleep(0.01)
+        for i in range(4):
+            broker.deliver([self.author.pk], f'{{"n": {i}}}')
+            await asyncio.sleep(0)
+        await asyncio.wait_for(connection, 1)
+        self.assertEqual(sent[-1], {"type": "websocket.close", "code": 1013})
+        self.assertEqual(broker.connections, 0)
+
+    async def test_connection_closes_when_the_token_expires(self):
+        subscription = self.broker.subscribe(self.author.pk)
+        code = await WebSocketApplication().serve(
+            subscription, asyncio.Event().wait, None, time.time() + 0.05
+        )
+        self.assertEqual(code, 4401)
+
+    @mock.patch.object(DatabaseBackend, "start")
+    async def test_database_backend_shares_events_between_processes(self, start):
+        here = Broker("core.realtime.DatabaseBackend")
+        there = Broker("core.realtime.DatabaseBackend")
+        subscription = there.subscribe(self.author.pk)
+        await sync_to_async(there.backend.poll)()
+
+        def publish():
+            with self.captureOnCommitCallbacks(execute=True):
+                here.publish([self.author.pk, self.fan.pk], {"type": "test"})
+            there.backend.poll()
+
+        await sync_to_async(publish)()
+        await asyncio.sleep(0.01)
+        self.assertEqual(list(subscription.events), ['{"type":"test"}'])
+        self.assertEqual(await RealtimeEvent.objects.acount(), 1)
+
+    def test_bench_websockets_holds_and_closes_connections(self):
+        out = StringIO()
+        call_command("bench_websockets", connections=20, events=2, stdout=out)
+        self.assertIn("20 idle connections opened", out.getvalue())
+        self.assertIn("0 connections left", out.getvalue())
+
+
+class BenchSerializersTests(TestCase):
+    def test_reports_both_paths(self):
+        author = CustomUser.objects.create_user(username="author")
+        Post.objects.create(user=author, content="benchmarked")
+        out = StringIO()
+        call_command("bench_serializers", rows=10, repeat=1, stdout=out)
+        for line in ("PostSerializer     drf", "PostSerializer     compiled"):
+            self.assertIn(line, out.getvalue())
+        self.assertIn("UserSerializer     compiled", out.getvalue())
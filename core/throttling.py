@@ -0,0 +1,133 @@
+# core/throttling.py
+"""
+Per-view rate limits on sliding-window cache counters (core.ratelimit).
+
+A view opts in with ``throttle_scope``. ScopedUserThrottle counts per user
+under the ``"<scope>.user"`` rate of REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+and ScopedIPThrottle per client address under ``"<scope>.ip"``; a scope with
+no rate for a class isn't limited by it. Each request is one atomic cache
+increment, so concurrent requests can't all slip under the limit.
+
+DRF checks throttles after authentication, which loads the user.
+ThrottleFirstMixin checks them first, and the user throttle reads the user
+id from the bearer token's claims, so a rejected request never reaches the
+database.
+"""
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .ratelimit import SlidingWindowCounter
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    ``"30/min"`` -> ``(30, 60)``: allowed requests and window in seconds.
+    """
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+class ScopedSlidingWindowThrottle(BaseThrottle):
+    # Suffix of the view's throttle_scope naming this class's rate
+    kind = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}.{self.kind}")
+        if scope is None or rate is None:
+            return True
+        key = self.get_key(request)
+        if key is None:
+            return True
+
+        limit, window = parse_rate(rate)
+        counter = SlidingWindowCounter(f"throttle:{scope}.{self.kind}", window)
+        # Rejected requests count too, so a client has to back off to recover
+        if counter.hit(key) > limit:
+            self.wait_seconds = counter.retry_after()
+            return False
+        return True
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def wait(self):
+        return getattr(self, "wait_seconds", None)
+
+
+class ScopedUserThrottle(ScopedSlidingWindowThrottle):
+    """
+    Limits each authenticated user; anonymous requests are left to
+    ScopedIPThrottle.
+    """
+
+    kind = "user"
+
+    def get_key(self, request):
+        return request_user_id(request)
+
+
+class ScopedIPThrottle(ScopedSlidingWindowThrottle):
+    """
+    Limits each client address (REMOTE_ADDR, or X-Forwarded-For as set up by
+    REST_FRAMEWORK["NUM_PROXIES"]).
+    """
+
+    kind = "ip"
+
+    def get_key(self, request):
+        return self.get_ident(request)
+
+
+def request_user_id(request):
+    """
+    Id of the requesting user, or None if anonymous. Taken from the bearer
+    token's claims when JWT authenticates the request, without loading the
+    user; an invalid token counts as anonymous and is rejected later by
+    authentication.
+    """
+    user = getattr(request, "_user", None)
+    if user is not None:
+        return user.pk if user.is_authenticated else None
+    for authenticator in request.authenticators:
+        if not isinstance(authenticator, JWTAuthentication):
+            break
+        header = authenticator.get_header(request)
+        raw_token = header and authenticator.get_raw_token(header)
+        if raw_token:
+            try:
+                token = authenticator.get_validated_token(raw_token)
+            except (InvalidToken, TokenError):
+                return None
+            return token.get(jwt_settings.USER_ID_CLAIM)
+    else:
+        return None
+    # Another kind of authentication: authenticate for real
+    return request.user.pk if request.user.is_authenticated else None
+
+
+class ThrottleFirstMixin:
+    """
+    APIView mixin running the throttles before authentication and the
+    permission checks, so rejected requests make no database query.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # APIView.initial() with check_throttles() moved first
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        self.check_throttles(request)
+        self.perform_authentication(request)
+        self.check_permissions(request)
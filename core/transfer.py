@@ -0,0 +1,376 @@
+# core/transfer.py
+"""
+Streaming JSONL export and import of users, posts and interactions, used by
+the export_chattera and import_chattera commands.
+
+Each line is one row in Django's "jsonl" serialization format
+(``{"model": "posts.post", "pk": 1, "fields": {...}}``), with models written
+parents first. Export walks each table in primary key order with keyset
+chunks; import writes batches with bulk_create. Foreign keys are remapped
+through ImportedRow, and each batch is committed together with its id
+mappings and the checkpoint, so memory use doesn't grow with the dataset and
+an interrupted import resumes where it stopped.
+"""
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Count, DateTimeField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from interactions.models import Comment, Like
+from interactions.signals import counter_subqueries
+from posts.cache import invalidate_posts
+from posts.hashtags import index_posts
+from posts.models import Post
+from .models import ImportCheckpoint, ImportedRow
+
+# Dependency order: every model only points at models listed before it
+MODELS = [
+    "users.customuser",
+    "posts.post",
+    "interactions.like",
+    "interactions.comment",
+    "interactions.share",
+]
+
+# Recomputed from the imported rows instead of trusted from the input
+DERIVED_FIELDS = {
+    # Follows aren't exported, so imported accounts start without followers
+    "users.customuser": {"followers_count": 0},
+    "posts.post": {"likes_count": 0, "comments_count": 0, "shares_count": 0},
+    "interactions.comment": {"root": None, "depth": 0, "path": "", "replies_count": 0},
+}
+
+# Thread position of imported comments; bulk_update() would build a CASE
+# expression per row, which costs far more than the write
+THREAD_SQL = f"""
+    UPDATE {Comment._meta.db_table} SET root_id = %s, depth = %s, path = %s
+    WHERE id = %s
+"""
+
+
+def refresh_replies(comment_ids):
+    """
+    Recount replies_count of ``comment_ids`` (bulk_create skips the signals).
+    """
+    replies = (
+        Comment.objects.filter(parent=OuterRef("pk"))
+        .values("parent")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Comment.objects.filter(pk__in=comment_ids).update(
+        replies_count=Coalesce(Subquery(replies), 0)
+    )
+
+
+def exported_fields(model):
+    # Many-to-many relations (groups, permissions) are not exported
+    return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def _encode(value):
+    # Full precision, unlike DjangoJSONEncoder's millisecond datetimes
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def export_model(label, out, chunk_size=2000):
+    """
+    Write every row of ``label`` to ``out``; return the number of rows.
+    """
+    model = apps.get_model(label)
+    fields = exported_fields(model)
+    columns = ["pk"] + [field.attname for field in fields]
+    names = [field.name for field in fields]
+    rows = 0
+    last_pk = None
+    while True:
+        chunk = model._default_manager.order_by("pk")
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        written = 0
+        for values in chunk.values_list(*columns)[:chunk_size].iterator(
+            chunk_size=chunk_size
+        ):
+            last_pk = values[0]
+            out.write(
+                json.dumps(
+                    {
+                        "model": label,
+                        "pk": last_pk,
+                        "fields": dict(zip(names, values[1:])),
+                    },
+                    default=_encode,
+                )
+            )
+            out.write("\n")
+            written += 1
+        rows += written
+        if written < chunk_size:
+            return rows
+
+
+@contextmanager
+def original_timestamps(labels=MODELS):
+    """
+    Keep imported created_at/updated_at values of the ``labels`` models
+    instead of letting auto_now(_add) overwrite them.
+    """
+    changed = []
+    for label in labels:
+        for field in apps.get_model(label)._meta.concrete_fields:
+            if getattr(field, "auto_now", False) or getattr(
+                field, "auto_now_add", False
+            ):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    def __init__(self, name, batch_size=1000):
+        self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=name)
+        self.batch_size = batch_size
+        # label -> [rows, skipped rows, seconds]
+        self.stats = defaultdict(lambda: [0, 0, 0.0])
+
+    def run(self, lines):
+        """
+        Import JSONL ``lines``, skipping those a previous run committed.
+        """
+        label, batch = None, []
+        number = 0
+        with original_timestamps():
+            for number, line in enumerate(lines, start=1):
+                if number <= self.checkpoint.lines_done or not line.strip():
+                    continue
+                row = json.loads(line)
+                if batch and (row["model"] != label or len(batch) >= self.batch_size):
+                    self.flush(label, batch, number - 1)
+                    batch = []
+                label = row["model"]
+                batch.append(row)
+            if batch:
+                self.flush(label, batch, number)
+
+    def flush(self, label, rows, last_line):
+        if label not in MODELS:
+            raise ValueError(f"Unsupported model {label!r}")
+        start = time.perf_counter()
+        with transaction.atomic():
+            written = getattr(self, "import_" + label.split(".")[1])(rows)
+            self.checkpoint.lines_done = last_line
+            self.checkpoint.save(update_fields=["lines_done", "updated_at"])
+        stats = self.stats[label]
+        stats[0] += written
+        stats[1] += len(rows) - written
+        stats[2] += time.perf_counter() - start
+
+    def build(self, label, row, remapped):
+        """
+        Model instance for ``row``, with foreign keys from ``remapped``
+        (``{field name: target id}``).
+        """
+        model = apps.get_model(label)
+        derived = DERIVED_FIELDS.get(label, {})
+        values = {}
+        for field in exported_fields(model):
+            if field.name in derived:
+                value = derived[field.name]
+            elif field.name in remapped:
+                value = remapped[field.name]
+            elif field.name not in row["fields"]:
+                # Added since the export was written
+                if isinstance(field, DateTimeField):
+                    value = timezone.now()
+                else:
+                    value = field.get_default()
+            else:
+                value = field.to_python(row["fields"].get(field.name))
+            values[field.attname] = value
+        return model(**values)
+
+    def lookup(self, label, source_ids):
+        """
+        ``{source id: target id}`` for already imported rows of ``label``.
+        """
+        return dict(
+            ImportedRow.objects.filter(
+                checkpoint=self.checkpoint,
+                model=label,
+                source_id__in={pk for pk in source_ids if pk is not None},
+            ).values_list("source_id", "target_id")
+        )
+
+    def remember(self, label, pairs):
+        ImportedRow.objects.bulk_create(
+            ImportedRow(
+                checkpoint=self.checkpoint,
+                model=label,
+                source_id=source_id,
+                target_id=target_id,
+            )
+            for source_id, target_id in pairs
+        )
+
+    def remap_users_and_posts(self, rows):
+        users = self.lookup("users.customuser", [r["fields"]["user"] for r in rows])
+        posts = self.lookup("posts.post", [r["fields"]["post"] for r in rows])
+        return [
+            (
+                row,
+                {
+                    "user": users[row["fields"]["user"]],
+                    "post": posts[row["fields"]["post"]],
+                },
+            )
+            for row in rows
+            if row["fields"]["user"] in users and row["fields"]["post"] in posts
+        ]
+
+    def import_customuser(self, rows):
+        model = apps.get_model("users.customuser")
+        # Usernames already taken here are mapped to the existing account
+        existing = dict(
+            model._default_manager.filter(
+                username__in=[row["fields"]["username"] for row in rows]
+            ).values_list("username", "pk")
+        )
+        new = [row for row in rows if row["fields"]["username"] not in existing]
+        created = model._default_manager.bulk_create(
+            [self.build("users.customuser", row, {}) for row in new]
+        )
+        pairs = [(row["pk"], user.pk) for row, user in zip(new, created)]
+        pairs += [
+            (row["pk"], existing[row["fields"]["username"]])
+            for row in rows
+            if row["fields"]["username"] in existing
+        ]
+        self.remember("users.customuser", pairs)
+        return len(rows)
+
+    def import_post(self, rows):
+        users = self.lookup("users.customuser", [r["fields"]["user"] for r in rows])
+        rows = [row for row in rows if row["fields"]["user"] in users]
+        posts = Post.objects.bulk_create(
+            [
+                self.build("posts.post", row, {"user": users[row["fields"]["user"]]})
+                for row in rows
+            ]
+        )
+        self.remember(
+            "posts.post", [(row["pk"], post.pk) for row, post in zip(rows, posts)]
+        )
+        index_posts(posts)
+        invalidate_posts([post.pk for post in posts], membership_changed=True)
+        return len(posts)
+
+    def import_interactions(self, label, remapped):
+        model = apps.get_model(label)
+        model._default_manager.bulk_create(
+            [self.build(label, row, keys) for row, keys in remapped]
+        )
+        self.refresh_counters({keys["post"] for _, keys in remapped})
+        return len(remapped)
+
+    def import_like(self, rows):
+        # A like the database already has, or one repeated in the input, is
+        # left out and counted as skipped
+        remapped = self.remap_users_and_posts(rows)
+        seen = set(
+            Like.objects.filter(
+                post__in={keys["post"] for _, keys in remapped},
+                user__in={keys["user"] for _, keys in remapped},
+            ).values_list("post", "user")
+        )
+        new = []
+        for row, keys in remapped:
+            pair = (keys["post"], keys["user"])
+            if pair not in seen:
+                seen.add(pair)
+                new.append((row, keys))
+        return self.import_interactions("interactions.like", new)
+
+    def import_share(self, rows):
+        return self.import_interactions(
+            "interactions.share", self.remap_users_and_posts(rows)
+        )
+
+    def import_comment(self, rows):
+        remapped = self.remap_users_and_posts(rows)
+        parents = self.lookup(
+            "interactions.comment", [row["fields"]["parent"] for row, _ in remapped]
+        )
+        # (root, depth, path) of every parent, for the replies' thread position
+        threads = {
+            pk: (root_id, depth, path)
+            for pk, root_id, depth, path in Comment.objects.filter(
+                pk__in=parents.values()
+            ).values_list("pk", "root_id", "depth", "path")
+        }
+        written = 0
+        pending = remapped
+        # Replies can point at comments in the same batch: insert level by level
+        while pending:
+            ready = [
+                (row, {**keys, "parent": parents.get(row["fields"]["parent"])})
+                for row, keys in pending
+                if row["fields"]["parent"] is None or row["fields"]["parent"] in parents
+            ]
+            if not ready:
+                break  # Replies to comments that weren't imported
+            pending = [
+                (row, keys)
+                for row, keys in pending
+                if row["fields"]["parent"] is not None
+                and row["fields"]["parent"] not in parents
+            ]
+            comments = Comment.objects.bulk_create(
+                [self.build("interactions.comment", row, keys) for row, keys in ready]
+            )
+            for comment in comments:
+                segment = f"{comment.pk:0{Comment.PATH_SEGMENT_WIDTH}d}"
+                if comment.parent_id is None:
+                    comment.root_id, comment.depth, comment.path = (
+                        comment.pk,
+                        0,
+                        segment,
+                    )
+                else:
+                    root_id, depth, path = threads[comment.parent_id]
+                    comment.root_id, comment.depth = root_id, depth + 1
+                    comment.path = f"{path}/{segment}"
+                threads[comment.pk] = (comment.root_id, comment.depth, comment.path)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    THREAD_SQL,
+                    [(c.root_id, c.depth, c.path, c.pk) for c in comments],
+                )
+            pairs = [
+                (row["pk"], comment.pk) for (row, _), comment in zip(ready, comments)
+            ]
+            self.remember("interactions.comment", pairs)
+            parents.update(pairs)
+            refresh_replies({c.parent_id for c in comments if c.parent_id})
+            written += len(comments)
+
+        self.refresh_counters({keys["post"] for _, keys in remapped})
+        return written
+
+    def refresh_counters(self, post_ids):
+        # bulk_create skips the counter signals
+        Post.objects.filter(pk__in=post_ids).update(**counter_subqueries())
+        invalidate_posts(post_ids)
@@ -15,6 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
@@ -32,6 +34,7 @@ urlpatterns = [
     path("interactions/", include("interactions.urls")),
     path("users/", include("users.urls")),
     path("messages/", include("messages.urls")),
+    path("notifications/", include("notifications.urls")),
     # Api Documentation
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     # Optional UI:
@@ -47,3 +50,6 @@ urlpatterns = [
     ),
     #    path("api-auth/", include("rest_framework.urls"))
 ]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,122 @@
+# core/views.py
+"""
+Async read endpoints.
+
+AsyncAPIView is a small async counterpart of DRF's APIView: it authenticates
+with async authenticators (``aauthenticate``), checks ordinary DRF permission
+classes, and renders with DRF's JSONRenderer so responses match the sync
+views. Write methods are delegated to the equivalent sync view in a worker
+thread. ``select_view`` picks the sync or async view for a route from the
+ASYNC_VIEWS setting.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from users.authentication import CachedJWTAuthentication
+
+
+class AsyncAPIView(View):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [AllowAny]
+    # DRF view class that handles the methods delegated with delegate_to_sync
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated, so exempt from CsrfViewMiddleware as DRF's
+        # APIView.as_view() is
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if getattr(handler, "delegated", False):
+            return await handler(request, *args, **kwargs)
+
+        self.request = Request(request)
+        try:
+            await self.perform_authentication(self.request)
+            self.check_permissions(self.request)
+            if request.method.lower() not in self.http_method_names or not handler:
+                raise exceptions.MethodNotAllowed(request.method)
+            return await handler(self.request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def perform_authentication(self, request):
+        user, auth = AnonymousUser(), None
+        for authenticator in self.get_authenticators():
+            result = await authenticator.aauthenticate(request)
+            if result is not None:
+                user, auth = result
+                break
+        request.user, request.auth = user, auth
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.user.is_authenticated:
+                    raise exceptions.PermissionDenied(
+                        getattr(permission, "message", None)
+                    )
+                raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            authenticators = self.get_authenticators()
+            if authenticators:
+                headers["WWW-Authenticate"] = authenticators[0].authenticate_header(
+                    self.request
+                )
+                exc.status_code = status.HTTP_401_UNAUTHORIZED
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        return self.respond(data, status=exc.status_code, headers=headers)
+
+    def respond(self, data, status=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status,
+            content_type="application/json",
+            headers=headers,
+        )
+
+
+async def delegate_to_sync(self, request, *args, **kwargs):
+    """
+    Handler that serves the method with ``sync_view`` in a worker thread;
+    assign it to the methods an async view doesn't implement itself.
+    """
+    view = self.sync_view.as_view()
+    return await sync_to_async(view)(request, *args, **kwargs)
+
+
+delegate_to_sync.delegated = True
+
+
+def select_view(name, sync_view, async_view):
+    """
+    Return the view function for the route ``name``: the async variant if
+    ``name`` is listed in ASYNC_VIEWS, else the sync one.
+    """
+    if name in getattr(settings, "ASYNC_VIEWS", ()):
+        return async_view.as_view()
+    return sync_view.as_view()
@@ -0,0 +1,150 @@
+# core/websocket.py
+"""
+WebSocket endpoint pushing events to the connected user (core.realtime).
+
+Clients connect to ``/ws/`` with a simplejwt access token, in an
+``Authorization: Bearer`` header or, since browsers can't set headers on
+WebSockets, a ``?token=`` query parameter. The server only sends: one JSON
+text frame per event (``{"type": "message", ...}``, ``"like"``,
+``"comment"``), and ``{"type": "pong"}`` for each ``{"type": "ping"}`` the
+client sends. Close codes:
+
+- 4401: missing, invalid or expired token (the connection is closed when
+  the token expires; reconnect with a fresh one)
+- 1013: the client fell REALTIME_QUEUE_SIZE events behind, or the process
+  holds REALTIME_MAX_CONNECTIONS already; reconnect later and catch up over
+  the REST API
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+    TokenError,
+)
+
+from users.authentication import CachedJWTAuthentication
+from .realtime import get_broker
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_TRY_AGAIN_LATER = 1013
+
+PONG = json.dumps({"type": "pong"})
+
+
+def token_from_scope(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            parts = value.decode("latin-1").split()
+            if len(parts) == 2 and parts[0].lower() == "bearer":
+                return parts[1]
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("token", [None])[0]
+
+
+class WebSocketApplication:
+    path = "/ws/"
+
+    async def __call__(self, scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        if scope["path"] != self.path:
+            await send({"type": "websocket.close", "code": 4404})
+            return
+
+        authenticated = await self.authenticate(scope)
+        if authenticated is None:
+            await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+            return
+        user, expires_at = authenticated
+
+        broker = get_broker()
+        if broker.connections >= getattr(settings, "REALTIME_MAX_CONNECTIONS", 10_000):
+            await send({"type": "websocket.close", "code": CLOSE_TRY_AGAIN_LATER})
+            return
+
+        await send({"type": "websocket.accept"})
+        subscription = broker.subscribe(user.pk)
+        try:
+            code = await self.serve(subscription, receive, send, expires_at)
+        finally:
+            broker.unsubscribe(subscription)
+        if code is not None:
+            await send({"type": "websocket.close", "code": code})
+
+    async def authenticate(self, scope):
+        """
+        Return ``(user, token expiry as a Unix time)``, or None.
+        """
+        raw_token = token_from_scope(scope)
+        if not raw_token:
+            return None
+        authentication = CachedJWTAuthentication()
+        try:
+            validated_token = authentication.get_validated_token(raw_token)
+            user = await authentication.aget_user(validated_token)
+        except (InvalidToken, AuthenticationFailed, TokenError):
+            return None
+        return user, validated_token["exp"]
+
+    async def serve(self, subscription, receive, send, expires_at):
+        """
+        Send events until the client disconnects (return None) or the
+        connection must be closed (return the close code).
+        """
+        reader = asyncio.ensure_future(self.read(subscription, receive))
+        writer = asyncio.ensure_future(self.write(subscription, send))
+        subscription.on_overflow = writer.cancel
+        try:
+            done, _ = await asyncio.wait(
+                [reader, writer],
+                timeout=max(0, expires_at - time.time()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            reader.cancel()
+            writer.cancel()
+        if subscription.overflowed:
+            return CLOSE_TRY_AGAIN_LATER
+        if not done:
+            return CLOSE_UNAUTHORIZED
+        for task in done:
+            task.result()
+        return None
+
+    async def read(self, subscription, receive):
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                request = json.loads(message.get("text") or "null")
+            except ValueError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "ping":
+                subscription.offer(PONG)
+
+    async def write(self, subscription, send):
+        while True:
+            await send({"type": "websocket.send", "text": await subscription.next()})
+
+
+class ProtocolRouter:
+    """
+    Route ASGI connections by scope type (``"http"``, ``"websocket"``).
+    """
+
+    def __init__(self, applications):
+        self.applications = applications
+
+    async def __call__(self, scope, receive, send):
+        application = self.applications.get(scope["type"])
+        if application is None:
+            raise ValueError(f"No application for {scope['type']!r} connections")
+        return await application(scope, receive, send)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InteractionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interactions'
+
+    def ready(self):
+        from .signals import connect_counter_signals
+
+        connect_counter_signals()
@@ -0,0 +1,34 @@
+# interactions/events.py
+"""
+Events raised by likes and comments. A post's author is notified of likes
+and comments on it, and a comment's author of replies (notifications.notify),
+and the event is pushed to their open connections (core.realtime). Nobody is
+told about their own actions.
+"""
+
+from core.realtime import publish
+from notifications.notify import notify
+
+
+def post_liked(post_id, author_id, users):
+    """
+    ``users`` liked the post, oldest first.
+    """
+    users = [user for user in users if user.pk != author_id]
+    notify(author_id, post_id, "like", users)
+    for user in users:
+        publish([author_id], {"type": "like", "post": post_id, "user": user.pk})
+
+
+def post_commented(comment, post_author_id, parent_author_id=None, data=None):
+    """
+    ``data`` is the comment's serialized form, sent with the event.
+    """
+    notify(parent_author_id, comment.post_id, "reply", [comment.user])
+    if post_author_id != parent_author_id:
+        notify(post_author_id, comment.post_id, "comment", [comment.user])
+    recipients = {post_author_id, parent_author_id} - {None, comment.user_id}
+    publish(
+        recipients,
+        {"type": "comment", "post": comment.post_id, "comment": data},
+    )
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from interactions.buffer import like_buffer
+from interactions.models import Like
+from interactions.views import LikePostView
+from posts.models import Post
+from users.models import CustomUser as User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark like toggles per second through LikePostView, writing "
+        "directly and through the write-behind buffer (LIKE_WRITE_BEHIND)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--posts", type=int, default=5)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--toggles", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        users, posts = self.seed(options["users"], options["posts"])
+        self.stdout.write(
+            f"{options['toggles']} toggles, {options['threads']} threads, "
+            f"{len(users)} users on {len(posts)} posts"
+        )
+        for label, buffered in (("direct", False), ("buffered", True)):
+            Like.objects.filter(post__in=posts).delete()
+            with override_settings(LIKE_WRITE_BEHIND=buffered):
+                elapsed, errors = self.run(
+                    users, posts, options["threads"], options["toggles"]
+                )
+            self.stdout.write(
+                f"{label:<10} {options['toggles'] / elapsed:10.0f} likes/s"
+                f"   {elapsed * 1000:8.0f} ms total   {errors} errors"
+            )
+
+    def seed(self, user_count, post_count):
+        users = list(User.objects.filter(username__startswith="bench_liker_"))
+        if len(users) < user_count:
+            User.objects.bulk_create(
+                User(username=f"bench_liker_{i}") for i in range(len(users), user_count)
+            )
+            users = list(User.objects.filter(username__startswith="bench_liker_"))
+        author, _ = User.objects.get_or_create(username="bench_author")
+        posts = list(Post.objects.filter(user=author, content="like storm"))
+        if len(posts) < post_count:
+            Post.objects.bulk_create(
+                Post(user=author, content="like storm")
+                for _ in range(post_count - len(posts))
+            )
+            posts = list(Post.objects.filter(user=author, content="like storm"))
+        return users[:user_count], posts[:post_count]
+
+    def run(self, users, posts, thread_count, toggles):
+        factory = APIRequestFactory()
+        view = LikePostView.as_view()
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(offset, toggles, thread_count):
+                    post = posts[i % len(posts)]
+                    request = factory.post(f"/interactions/like/{post.id}/")
+                    force_authenticate(request, user=users[i % len(users)])
+                    if view(request, post_id=post.id).status_code != 200:
+                        errors.append(i)
+            except Exception:
+                errors.append(offset)
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(n,)) for n in range(thread_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The buffered run is only done once its toggles are in the database
+        like_buffer.flush()
+        return time.perf_counter() - start, len(errors)
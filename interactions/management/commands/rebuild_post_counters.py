@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from posts.models import Post
+from interactions.signals import COUNTER_FIELDS, counter_subqueries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Post.likes_count, comments_count and shares_count from the "
+        "interaction tables, walking posts in primary key chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        fields = list(COUNTER_FIELDS.values())
+        actual = {
+            f"actual_{field}": expr for field, expr in counter_subqueries().items()
+        }
+        drifted = Q()
+        for field in fields:
+            drifted |= ~Q(**{field: F(f"actual_{field}")})
+
+        last_pk = 0
+        scanned = fixed = 0
+        while True:
+            chunk = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            scanned += len(chunk)
+
+            with transaction.atomic():
+                stale = list(
+                    Post.objects.filter(pk__in=chunk)
+                    .annotate(**actual)
+                    .filter(drifted)
+                    .values_list("pk", flat=True)
+                )
+                if stale:
+                    fixed += Post.objects.filter(pk__in=stale).update(
+                        **counter_subqueries()
+                    )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Scanned {scanned} posts, fixed {fixed} drifted.")
+        )
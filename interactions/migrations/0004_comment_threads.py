@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_threads(apps, schema_editor):
+    Comment = apps.get_model("interactions", "Comment")
+    last_pk = 0
+    while True:
+        # Parents always have smaller ids than their replies, so walking in
+        # id order means every parent's path is known before its children.
+        chunk = list(Comment.objects.filter(pk__gt=last_pk).order_by("pk")[:1000])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+        known = {comment.pk: comment for comment in chunk}
+        missing = {
+            comment.parent_id
+            for comment in chunk
+            if comment.parent_id and comment.parent_id not in known
+        }
+        known.update((c.pk, c) for c in Comment.objects.filter(pk__in=missing))
+
+        for comment in chunk:
+            segment = f"{comment.pk:010d}"
+            if comment.parent_id:
+                parent = known[comment.parent_id]
+                comment.root_id = parent.root_id
+                comment.depth = parent.depth + 1
+                comment.path = f"{parent.path}/{segment}"
+            else:
+                comment.root_id = comment.pk
+                comment.depth = 0
+                comment.path = segment
+        Comment.objects.bulk_update(chunk, ["root", "depth", "path"])
+
+    replies = (
+        Comment.objects.filter(parent=OuterRef("pk"))
+        .values("parent")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Comment.objects.update(replies_count=Coalesce(Subquery(replies), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0003_initial"),
+        ("posts", "0005_timeline"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="path",
+            field=models.CharField(blank=True, editable=False, max_length=1024),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="replies_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="root",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="thread",
+                to="interactions.comment",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "parent", "created_at", "id"],
+                name="interactions_comment_page_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["root", "path"], name="interactions_comment_path_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_threads, migrations.RunPython.noop),
+    ]
@@ -38,10 +38,57 @@ class Comment(models.Model):
     parent = models.ForeignKey(
         "self", null=True, blank=True, related_name="replies", on_delete=models.CASCADE
     )  # Allows replies to comments
+    # Materialized thread position, filled in on insert (see save())
+    root = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        related_name="thread",
+        on_delete=models.CASCADE,
+        editable=False,
+    )  # Top-level comment of the thread (itself for top-level comments)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    path = models.CharField(
+        max_length=1024, blank=True, editable=False
+    )  # Zero-padded ids from the root down, "/"-separated; sorts in thread order
+    replies_count = models.IntegerField(default=0)  # Direct replies
+
+    PATH_SEGMENT_WIDTH = 10
+    # Deepest reply whose path still fits the column
+    MAX_DEPTH = (path.max_length + 1) // (PATH_SEGMENT_WIDTH + 1) - 1
+
+    class Meta:
+        indexes = [
+            # Pages of top-level comments / direct replies, oldest first
+            models.Index(
+                fields=["post", "parent", "created_at", "id"],
+                name="interactions_comment_page_idx",
+            ),
+            # Descendants of a comment are a contiguous range of (root, path)
+            models.Index(fields=["root", "path"], name="interactions_comment_path_idx"),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on Post {self.post.id}"
 
+    def save(self, *args, **kwargs):
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        if creating and not self.path:
+            segment = f"{self.pk:0{self.PATH_SEGMENT_WIDTH}d}"
+            if self.parent_id:
+                parent = self.parent
+                self.root_id = parent.root_id
+                self.depth = parent.depth + 1
+                self.path = f"{parent.path}/{segment}"
+            else:
+                self.root_id = self.pk
+                self.depth = 0
+                self.path = segment
+            Comment.objects.filter(pk=self.pk).update(
+                root_id=self.root_id, depth=self.depth, path=self.path
+            )
+
 
 class Share(models.Model):
     """
@@ -0,0 +1,11 @@
+# interactions/pagination.py
+from core.pagination import KeysetPagination
+
+
+class CommentThreadPagination(KeysetPagination):
+    """
+    Oldest-first cursor pagination for the comments at one level of a
+    thread, served by the (post, parent, created_at, id) index on Comment.
+    """
+
+    ordering = ("created_at", "id")
@@ -33,7 +33,7 @@ class CommentSerializer(serializers.ModelSerializer):
         queryset=User.objects.all()
     )  # User who made the comment
     parent = serializers.PrimaryKeyRelatedField(
-        queryset="self", required=False, allow_null=True
+        queryset=Comment.objects.all(), required=False, allow_null=True
     )  # Allow replies to comments
 
     class Meta:
@@ -50,6 +50,16 @@ class CommentSerializer(serializers.ModelSerializer):
         return value
 
 
+class CommentNodeSerializer(CommentSerializer):
+    """
+    Read-only serializer for a comment inside a thread tree.
+    """
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ["depth", "replies_count"]
+        read_only_fields = fields
+
+
 class ShareSerializer(serializers.ModelSerializer):
     """
     Serializer for sharing a post.
@@ -0,0 +1,133 @@
+# interactions/signals.py
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from posts.cache import invalidate_post
+from posts.models import Post
+from .models import Comment, Like, Share
+
+# Interaction model -> denormalized counter column on Post
+COUNTER_FIELDS = {
+    Like: "likes_count",
+    Comment: "comments_count",
+    Share: "shares_count",
+}
+
+_deferred = threading.local()
+
+
+@contextmanager
+def counters_deferred():
+    """
+    Skip the per-row counter and cache receivers in this thread, for bulk
+    writers that recompute counters and invalidate posts themselves.
+    """
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = False
+
+
+def is_deferred():
+    return getattr(_deferred, "active", False)
+
+
+def adjust_post_counter(post_id, field, delta):
+    """
+    Apply ``delta`` to a Post counter with a single in-database UPDATE so
+    concurrent writers never lose increments. Also moves ``updated_at``, the
+    post's Last-Modified time.
+    """
+    Post.objects.filter(pk=post_id).update(
+        **{field: F(field) + delta}, updated_at=timezone.now()
+    )
+
+
+def counter_subqueries():
+    """
+    Return ``{counter field: expression}`` computing the true value of each
+    Post counter, for use in ``annotate()`` or ``update()``.
+    """
+    expressions = {}
+    for model, field in COUNTER_FIELDS.items():
+        counts = (
+            model.objects.filter(post=OuterRef("pk"))
+            .values("post")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        expressions[field] = Coalesce(Subquery(counts), 0)
+    return expressions
+
+
+def increment_post_counter(sender, instance, created, **kwargs):
+    if created and not is_deferred():
+        adjust_post_counter(instance.post_id, COUNTER_FIELDS[sender], 1)
+
+
+def decrement_post_counter(sender, instance, origin=None, **kwargs):
+    # Deleting the post itself cascades to its interactions; its counters are
+    # about to disappear with it, so skip one UPDATE per cascaded row.
+    if is_deferred() or isinstance(origin, Post) and origin.pk == instance.post_id:
+        return
+    adjust_post_counter(instance.post_id, COUNTER_FIELDS[sender], -1)
+
+
+def increment_replies_count(sender, instance, created, **kwargs):
+    if created and instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(
+            replies_count=F("replies_count") + 1
+        )
+
+
+def decrement_replies_count(sender, instance, origin=None, **kwargs):
+    if not instance.parent_id or isinstance(origin, Post):
+        return
+    if isinstance(origin, Comment) and origin.pk == instance.parent_id:
+        return
+    Comment.objects.filter(pk=instance.parent_id).update(
+        replies_count=F("replies_count") - 1
+    )
+
+
+def invalidate_cached_post(sender, instance, origin=None, **kwargs):
+    if is_deferred() or isinstance(origin, Post) and origin.pk == instance.post_id:
+        return
+    invalidate_post(instance.post_id)
+
+
+def connect_counter_signals():
+    post_save.connect(
+        increment_replies_count, sender=Comment, dispatch_uid="increment_replies_count"
+    )
+    post_delete.connect(
+        decrement_replies_count, sender=Comment, dispatch_uid="decrement_replies_count"
+    )
+    for model in COUNTER_FIELDS:
+        post_save.connect(
+            increment_post_counter,
+            sender=model,
+            dispatch_uid=f"increment_post_counter_{model.__name__}",
+        )
+        post_delete.connect(
+            decrement_post_counter,
+            sender=model,
+            dispatch_uid=f"decrement_post_counter_{model.__name__}",
+        )
+        # Connected after the counter receivers so the bump follows the UPDATE
+        post_save.connect(
+            invalidate_cached_post,
+            sender=model,
+            dispatch_uid=f"invalidate_cached_post_save_{model.__name__}",
+        )
+        post_delete.connect(
+            invalidate_cached_post,
+            sender=model,
+            dispatch_uid=f"invalidate_cached_post_delete_{model.__name__}",
+        )
@@ -1,3 +1,495 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Post
+from posts.serializers import PostDetailSerializer
+from users.models import CustomUser as User
+from .buffer import like_buffer
+from .models import Comment, Like, Share
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass12345")
+        self.fan = User.objects.create_user(username="fan", password="pass12345")
+        self.post = Post.objects.create(user=self.author, content="hello")
+        self.client.force_authenticate(self.fan)
+
+    def counters(self):
+        self.post.refresh_from_db()
+        return (
+            self.post.likes_count,
+            self.post.comments_count,
+            self.post.shares_count,
+        )
+
+    def test_like_toggle_updates_likes_count(self):
+        url = reverse("like_post", args=[self.post.id])
+        self.client.post(url)
+        self.assertEqual(self.counters(), (1, 0, 0))
+        self.client.post(url)
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+    def test_comment_and_share_update_counts(self):
+        self.client.post(
+            reverse("comment_post", args=[self.post.id]), {"content": "nice"}
+        )
+        response = self.client.post(reverse("share_post", args=[self.post.id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counters(), (0, 1, 1))
+
+    def test_cascading_deletes_decrement_counts(self):
+        other = User.objects.create_user(username="other", password="pass12345")
+        Like.objects.create(post=self.post, user=self.fan)
+        Like.objects.create(post=self.post, user=other)
+        root = Comment.objects.create(post=self.post, user=other, content="a")
+        Comment.objects.create(post=self.post, user=self.fan, content="b", parent=root)
+        Share.objects.create(post=self.post, user=other)
+        self.assertEqual(self.counters(), (2, 2, 1))
+
+        root.delete()  # cascades to the reply
+        self.assertEqual(self.counters(), (2, 0, 1))
+        other.delete()  # cascades to the user's like and share
+        self.assertEqual(self.counters(), (1, 0, 0))
+
+    def test_deleting_post_does_not_update_its_counters(self):
+        for i in range(5):
+            user = User.objects.create_user(username=f"liker{i}")
+            Like.objects.create(post=self.post, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(updates, [])
+
+    def test_detail_serializer_reads_columns(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(2):  # user and comments, no COUNT queries
+            data = PostDetailSerializer(post).data
+        self.assertEqual(data["likes_count"], 1)
+
+
+class RebuildPostCountersTests(TestCase):
+    def test_rebuild_fixes_drift(self):
+        user = User.objects.create_user(username="u")
+        posts = [Post.objects.create(user=user, content=str(i)) for i in range(5)]
+        Like.objects.create(post=posts[0], user=user)
+        Comment.objects.create(post=posts[1], user=user, content="c")
+        Post.objects.filter(pk=posts[0].pk).update(likes_count=42)
+        Post.objects.filter(pk=posts[2].pk).update(shares_count=-3)
+
+        out = StringIO()
+        call_command("rebuild_post_counters", chunk_size=2, stdout=out)
+
+        self.assertIn("fixed 2 drifted", out.getvalue())
+        counts = dict(Post.objects.values_list("pk", "likes_count"))
+        self.assertEqual(counts[posts[0].pk], 1)
+        posts[1].refresh_from_db()
+        posts[2].refresh_from_db()
+        self.assertEqual(posts[1].comments_count, 1)
+        self.assertEqual(posts[2].shares_count, 0)
+
+
+class ViewerStateTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.viewer = User.objects.create_user(username="viewer")
+        cls.posts = [
+            Post.objects.create(user=cls.author, content=str(i)) for i in range(30)
+        ]
+        Like.objects.create(post=cls.posts[0], user=cls.viewer)
+        Share.objects.create(post=cls.posts[1], user=cls.viewer)
+        Comment.objects.create(post=cls.posts[1], user=cls.viewer, content="c")
+        Comment.objects.create(post=cls.posts[1], user=cls.viewer, content="d")
+        Like.objects.create(post=cls.posts[2], user=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.viewer)
+
+    def test_flags_for_batch_in_one_query_per_relation(self):
+        ids = [post.id for post in self.posts]
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("viewer_state"), {"ids": ",".join(map(str, ids))}
+            )
+        results = {row["post"]: row for row in response.data["results"]}
+        self.assertEqual([row["post"] for row in response.data["results"]], ids)
+        self.assertEqual(
+            results[self.posts[0].id],
+            {
+                "post": self.posts[0].id,
+                "liked": True,
+                "shared": False,
+                "commented": False,
+            },
+        )
+        self.assertEqual(
+            results[self.posts[1].id],
+            {
+                "post": self.posts[1].id,
+                "liked": False,
+                "shared": True,
+                "commented": True,
+            },
+        )
+        self.assertFalse(results[self.posts[2].id]["liked"])
+
+    def test_does_not_toggle_and_rejects_bad_ids(self):
+        self.client.get(reverse("viewer_state"), {"ids": str(self.posts[0].id)})
+        self.assertTrue(
+            Like.objects.filter(post=self.posts[0], user=self.viewer).exists()
+        )
+        response = self.client.get(reverse("viewer_state"), {"ids": "1,x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_like_lookup_uses_unique_index(self):
+        sql, params = (
+            Like.objects.filter(post_id__in=[1, 2, 3], user_id=self.viewer.pk)
+            .values_list("post_id", flat=True)
+            .distinct()
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("interactions_like_post_id_user_id", plan)
+
+    def test_post_list_annotation_costs_a_fixed_number_of_queries(self):
+        url = reverse("post_list") + "?viewer_state=1"
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url + "&page_size=5")
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url + "&page_size=30")
+
+        self.assertEqual(len(small), len(large))
+        viewer = {post["id"]: post["viewer"] for post in response.data["results"]}
+        self.assertTrue(viewer[self.posts[0].id]["liked"])
+        self.assertTrue(viewer[self.posts[1].id]["commented"])
+
+        plain = self.client.get(reverse("post_list")).data["results"]
+        self.assertNotIn("viewer", plain[0])
+
+
+@override_settings(LIKE_WRITE_BEHIND=True)
+class LikeBufferTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.fans = [User.objects.create_user(username=f"fan{i}") for i in range(10)]
+        cls.post = Post.objects.create(user=cls.author, content="viral")
+        Like.objects.create(post=cls.post, user=cls.fans[0])
+
+    def setUp(self):
+        cache.clear()
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(like_buffer, "interval", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(like_buffer.clear)
+
+    def toggle(self, user, post_id=None):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("like_post", args=[post_id or self.post.id]))
+
+    def likes_count(self):
+        return self.client.get(reverse("post_detail", args=[self.post.id])).data[
+            "likes_count"
+        ]
+
+    def test_toggles_are_buffered_and_visible_before_flush(self):
+        with CaptureQueriesContext(connection) as queries:
+            for fan in self.fans[1:]:
+                self.assertEqual(self.toggle(fan).data["status"], "liked")
+        self.assertTrue(all(q["sql"].lstrip().startswith("SELECT") for q in queries))
+        self.assertEqual(self.toggle(self.fans[0]).data["status"], "unliked")
+        self.assertEqual(Like.objects.count(), 1)
+
+        self.assertEqual(self.likes_count(), 9)
+        state = self.client.get(reverse("viewer_state"), {"ids": self.post.id})
+        self.assertFalse(state.data["results"][0]["liked"])
+
+        self.assertEqual(like_buffer.flush(), 10)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 9)
+        self.assertEqual(
+            set(Like.objects.values_list("user_id", flat=True)),
+            {fan.id for fan in self.fans[1:]},
+        )
+        self.assertEqual(self.likes_count(), 9)
+
+    def test_repeated_toggles_collapse(self):
+        for _ in range(3):
+            self.toggle(self.fans[1])
+            self.toggle(self.fans[0])
+        self.toggle(self.fans[2])
+        self.toggle(self.fans[2])
+        self.assertEqual(like_buffer.flush(), 2)
+        self.assertEqual(
+            list(Like.objects.values_list("user_id", flat=True)), [self.fans[1].id]
+        )
+
+    def test_flush_cost_does_not_grow_with_toggles(self):
+        other = Post.objects.create(user=self.author, content="other")
+        self.toggle(self.fans[1])
+        with CaptureQueriesContext(connection) as few:
+            like_buffer.flush()
+        for fan in self.fans:
+            self.toggle(fan)
+            self.toggle(fan, other.id)
+        with CaptureQueriesContext(connection) as many:
+            like_buffer.flush()
+        # One extra DELETE for the second post's unlikes at most, and the
+        # second post's notification (savepoint, select, insert, unread
+        # counter, release): flush costs per post, never per toggle
+        self.assertLessEqual(len(many), len(few) + 2 + 5)
+        other.refresh_from_db()
+        self.assertEqual(other.likes_count, 10)
+
+    def test_locked_database_keeps_toggles_for_the_next_flush(self):
+        self.toggle(self.fans[1])
+        with mock.patch.object(
+            Like.objects, "bulk_create", side_effect=OperationalError("locked")
+        ), self.assertLogs("interactions.buffer", "WARNING"):
+            self.assertEqual(like_buffer.flush(), 0)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertTrue(Like.objects.filter(user=self.fans[1]).exists())
+
+    def test_failed_flush_keeps_toggles_and_their_counts(self):
+        self.toggle(self.fans[1])
+        self.toggle(self.fans[2])
+        self.toggle(self.fans[0])
+        with mock.patch.object(
+            Like.objects, "bulk_create", side_effect=ValueError("bug")
+        ), self.assertLogs("interactions.buffer", "ERROR"):
+            self.assertEqual(like_buffer.flush(), 0)
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 1)
+        self.toggle(self.fans[2])
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 0)
+        self.assertEqual(self.likes_count(), 1)
+        self.assertEqual(like_buffer.flush(), 2)
+        self.assertEqual(
+            list(Like.objects.values_list("user_id", flat=True)), [self.fans[1].id]
+        )
+
+    def toggle_during_flush(self, user, error=None):
+        # Flush with ``user`` toggling while the flush's transaction is open
+        bulk_create = Like.objects.bulk_create
+        toggled = []
+
+        def writing(*args, **kwargs):
+            toggled.append(like_buffer.toggle(self.post.id, user.id))
+            if error is not None:
+                raise error
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Like.objects, "bulk_create", side_effect=writing):
+            like_buffer.flush()
+        return toggled[0]
+
+    def test_toggle_during_a_flush_starts_from_the_flushed_state(self):
+        self.toggle(self.fans[1])
+        self.assertFalse(self.toggle_during_flush(self.fans[1]))
+        self.assertTrue(Like.objects.filter(user=self.fans[1]).exists())
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertFalse(Like.objects.filter(user=self.fans[1]).exists())
+
+    def test_toggle_during_a_failed_flush_is_not_lost(self):
+        self.toggle(self.fans[1])
+        self.toggle(self.fans[2])
+        with self.assertLogs("interactions.buffer", "WARNING"):
+            liked = self.toggle_during_flush(self.fans[1], OperationalError("locked"))
+        self.assertFalse(liked)
+        self.assertEqual(like_buffer.pending_delta(self.post.id), 1)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertEqual(
+            list(
+                Like.objects.exclude(user=self.fans[0]).values_list("user", flat=True)
+            ),
+            [self.fans[2].id],
+        )
+
+    def test_missing_post_and_deleted_post(self):
+        self.assertEqual(self.toggle(self.fans[1], 999_999).status_code, 404)
+        self.toggle(self.fans[1])
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(like_buffer.flush(), 0)
+
+
+class CommentThreadTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="talker")
+        cls.post = Post.objects.create(user=cls.user, content="thread")
+
+    def comment(self, parent=None, post=None):
+        return Comment.objects.create(
+            post=post or self.post, user=self.user, content="c", parent=parent
+        )
+
+    def thread(self, query=""):
+        response = self.client.get(
+            reverse("comment_thread", args=[self.post.id]) + query
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_materialized_path_and_reply_counts(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested = self.comment(reply)
+        nested.refresh_from_db()
+        self.assertEqual(nested.root_id, root.id)
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(
+            nested.path, f"{root.id:010d}/{reply.id:010d}/{nested.id:010d}"
+        )
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 1)
+        nested.delete()
+        reply.refresh_from_db()
+        self.assertEqual(reply.replies_count, 0)
+
+    def test_tree_is_nested_and_capped_with_more_links(self):
+        root = self.comment()
+        chain = [root]
+        for _ in range(4):
+            chain.append(self.comment(chain[-1]))
+        other_root = self.comment()
+
+        data = self.thread("?depth=2")
+        self.assertEqual([n["id"] for n in data["results"]], [root.id, other_root.id])
+        level1 = data["results"][0]["replies"][0]
+        level2 = level1["replies"][0]
+        self.assertEqual((level1["id"], level2["id"]), (chain[1].id, chain[2].id))
+        self.assertEqual(level2["replies"], [])
+        self.assertIsNotNone(level2["more_replies"])
+        self.assertIsNone(data["results"][1]["more_replies"])
+
+        more = self.client.get(level2["more_replies"]).data
+        self.assertEqual([n["id"] for n in more["results"]], [chain[3].id])
+        self.assertEqual(more["results"][0]["replies"][0]["id"], chain[4].id)
+
+    def test_replies_per_comment_are_capped(self):
+        root = self.comment()
+        replies = [self.comment(root) for _ in range(7)]
+        node = self.thread()["results"][0]
+        self.assertEqual(
+            [n["id"] for n in node["replies"]], [r.id for r in replies[:5]]
+        )
+        more = self.client.get(node["more_replies"] + "&page_size=10").data
+        self.assertEqual([n["id"] for n in more["results"]], [r.id for r in replies])
+
+    def test_query_count_depends_on_page_not_total_comments(self):
+        for _ in range(3):
+            self.comment(self.comment())
+        with CaptureQueriesContext(connection) as small:
+            self.thread("?page_size=2")
+
+        for _ in range(30):
+            root = self.comment()
+            self.comment(self.comment(root))
+        with CaptureQueriesContext(connection) as large:
+            data = self.thread("?page_size=2")
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNotNone(data["next"])
+
+    def test_replies_of_busy_comments_are_read_with_a_limit(self):
+        busy = self.comment()
+        quiet = self.comment()
+        replies = [self.comment(busy) for _ in range(8)]
+        self.comment(quiet)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.thread("?depth=1")
+        self.assertEqual(
+            [n["id"] for n in data["results"][0]["replies"]],
+            [r.id for r in replies[:5]],
+        )
+        self.assertEqual(len(data["results"][1]["replies"]), 1)
+        self.assertIn("LIMIT 5", queries[-1]["sql"])
+
+    def test_replies_are_capped_at_the_deepest_path_that_fits(self):
+        deepest = self.comment()
+        Comment.objects.filter(pk=deepest.pk).update(depth=Comment.MAX_DEPTH)
+        self.client.force_authenticate(self.user)
+        url = reverse("comment_post", args=[self.post.id])
+        response = self.client.post(url, {"content": "x", "parent": deepest.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Comment.objects.filter(parent=deepest).exists())
+        self.assertLessEqual(
+            (Comment.MAX_DEPTH + 1) * (Comment.PATH_SEGMENT_WIDTH + 1) - 1,
+            Comment._meta.get_field("path").max_length,
+        )
+
+    def test_reply_parent_must_belong_to_post(self):
+        other = Post.objects.create(user=self.user, content="other")
+        foreign = self.comment(post=other)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            reverse("comment_post", args=[self.post.id]),
+            {"content": "x", "parent": foreign.id},
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {"like.user": "2/min", "like.ip": "3/min"},
+    }
+)
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.post = Post.objects.create(user=self.author, content="hello")
+        self.url = reverse("like_post", args=[self.post.id])
+
+    def like(self, user, ip="10.0.0.1"):
+        return self.client.post(
+            self.url,
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_user_limit_rejects_without_queries(self):
+        fan = User.objects.create_user(username="fan")
+        self.assertEqual(self.like(fan).status_code, 200)
+        self.assertEqual(self.like(fan, ip="10.0.0.2").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.like(fan, ip="10.0.0.3")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        # Other users are unaffected
+        other = User.objects.create_user(username="other")
+        self.assertEqual(self.like(other, ip="10.0.0.3").status_code, 200)
+
+    def test_ip_limit_spans_users(self):
+        for number in range(3):
+            user = User.objects.create_user(username=f"fan{number}")
+            self.assertEqual(self.like(user).status_code, 200)
+        user = User.objects.create_user(username="fan3")
+        self.assertEqual(self.like(user).status_code, 429)
+        self.assertEqual(self.like(user, ip="10.0.0.2").status_code, 200)
+
+    def test_unscoped_views_are_not_limited(self):
+        fan = User.objects.create_user(username="fan")
+        self.client.force_authenticate(fan)
+        for _ in range(5):
+            response = self.client.post(
+                reverse("share_post", args=[self.post.id]), REMOTE_ADDR="10.0.0.1"
+            )
+            self.assertEqual(response.status_code, 201)
@@ -2,6 +2,9 @@ from django.urls import path
 from .views import (
     LikePostView,
     CommentPostView,
+    SharePostView,
+    ViewerStateView,
+    CommentThreadView,
 )
 
 urlpatterns = [
@@ -9,4 +12,10 @@ urlpatterns = [
     path("like/<int:post_id>/", LikePostView.as_view(), name="like_post"),
     # Comment on a post
     path("comment/<int:post_id>/", CommentPostView.as_view(), name="comment_post"),
+    # A post's comments as a paginated tree
+    path("comments/<int:post_id>/", CommentThreadView.as_view(), name="comment_thread"),
+    # Share a post
+    path("share/<int:post_id>/", SharePostView.as_view(), name="share_post"),
+    # The requesting user's like/share/comment flags for a batch of posts
+    path("state/", ViewerStateView.as_view(), name="viewer_state"),
 ]
@@ -0,0 +1,37 @@
+# interactions/viewer.py
+from .buffer import like_buffer
+from .models import Comment, Like, Share
+
+VIEWER_FLAGS = {
+    "liked": Like,
+    "shared": Share,
+    "commented": Comment,
+}
+
+
+def viewer_state(user, post_ids):
+    """
+    Return ``{post id: {"liked": bool, "shared": bool, "commented": bool}}``
+    for ``user`` over ``post_ids``.
+
+    Runs one set-based query per relation no matter how many ids are given;
+    the Like lookup is answered from its (post, user) unique index.
+    """
+    post_ids = list(post_ids)
+    states = {post_id: {flag: False for flag in VIEWER_FLAGS} for post_id in post_ids}
+    if not post_ids or not user.is_authenticated:
+        return states
+
+    for flag, model in VIEWER_FLAGS.items():
+        matched = (
+            model.objects.filter(post_id__in=post_ids, user_id=user.pk)
+            .values_list("post_id", flat=True)
+            .distinct()
+        )
+        for post_id in matched:
+            states[post_id][flag] = True
+
+    # Toggles still in the write-behind buffer win over the database
+    for post_id, liked in like_buffer.pending_likes(user.pk, post_ids).items():
+        states[post_id]["liked"] = liked
+    return states
@@ -2,25 +2,54 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Like, Comment
+from django.db import transaction
+from .models import Like, Comment, Share
 from rest_framework.permissions import IsAuthenticated
-from .serializers import LikeSerializer, ShareSerializer, CommentSerializer
+from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from .serializers import (
+    LikeSerializer,
+    ShareSerializer,
+    CommentSerializer,
+    CommentNodeSerializer,
+)
+from .pagination import CommentThreadPagination
+from .threads import MAX_DEPTH, build_tree, load_descendants
+from .buffer import is_enabled as like_buffer_enabled, like_buffer
+from .viewer import viewer_state
+from .events import post_commented, post_liked
 from posts.models import Post
-from posts.serializers import PostSerializer
+from users.authentication import StatelessReadJWTAuthentication
+from core.throttling import ThrottleFirstMixin
+from django.conf import settings
 
 
-class LikePostView(APIView):
+class LikePostView(ThrottleFirstMixin, APIView):
     """
     Like or unlike a post.
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = "like"
 
     def post(self, request, post_id):
         """
         Allows a user to like or unlike a post by providing the post's ID.
         If the user has already liked the post, it will be unliked. If not, the post will be liked.
+        With LIKE_WRITE_BEHIND the toggle is buffered and written in the next batch,
+        which also notifies the post's author.
         """
+        if like_buffer_enabled():
+            liked = like_buffer.toggle(post_id, request.user.pk)
+            if liked is None:
+                return Response(
+                    {"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(
+                {"status": "liked" if liked else "unliked"}, status=status.HTTP_200_OK
+            )
+
         try:
             post = Post.objects.get(id=post_id)
         except Post.DoesNotExist:
@@ -29,53 +58,49 @@ class LikePostView(APIView):
             )
 
         user = request.user
-        like, created = Like.objects.get_or_create(post=post, user=user)
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(post=post, user=user)
 
-        if not created:
-            like.delete()  # If the like already exists, delete it (unlike the post)
-            return Response({"status": "unliked"}, status=status.HTTP_200_OK)
+            if not created:
+                like.delete()  # If the like already exists, delete it (unlike the post)
+                return Response({"status": "unliked"}, status=status.HTTP_200_OK)
+            post_liked(post.pk, post.user_id, [user])
 
         return Response({"status": "liked"}, status=status.HTTP_200_OK)
 
 
 class SharePostView(APIView):
     """
-    Share a post by creating a new post that is associated with the original one.
+    Share a post.
     """
 
     permission_classes = [IsAuthenticated]
 
     def post(self, request, post_id):
         """
-        Allows a user to share a post. The shared post will be linked to the original post.
-        A new post is created, and the user becomes the author of the shared post.
+        Allows a user to share a post by providing the post's ID.
+        The share is recorded against the original post and counted in its shares_count.
         """
         try:
-            post_to_share = Post.objects.get(id=post_id)
+            post = Post.objects.get(id=post_id)
         except Post.DoesNotExist:
             return Response(
                 {"detail": "Post not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        user = request.user
-        # Create a new post with the same content but authored by the user who is sharing
-        shared_post = Post.objects.create(
-            title=f"Shared: {post_to_share.title}",
-            content=post_to_share.content,
-            author=user,  # The user sharing the post becomes the author
-        )
+        with transaction.atomic():
+            share = Share.objects.create(post=post, user=request.user)
 
-        return Response(
-            PostSerializer(shared_post).data, status=status.HTTP_201_CREATED
-        )
+        return Response(ShareSerializer(share).data, status=status.HTTP_201_CREATED)
 
 
-class CommentPostView(APIView):
+class CommentPostView(ThrottleFirstMixin, APIView):
     """
     Comment on a post.
     """
 
     permission_classes = [IsAuthenticated]
+    throttle_scope = "comment"
 
     def post(self, request, post_id):
         """
@@ -96,20 +121,120 @@ class CommentPostView(APIView):
         parent_comment = None
         if parent_comment_id:
             try:
-                parent_comment = Comment.objects.get(id=parent_comment_id)
+                parent_comment = Comment.objects.get(id=parent_comment_id, post=post)
             except Comment.DoesNotExist:
                 return Response(
                     {"detail": "Parent comment not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
+            if parent_comment.depth >= Comment.MAX_DEPTH:
+                return Response(
+                    {"detail": "Thread is too deep to reply to"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
         # Create a new comment linked to the post and optionally to a parent comment
-        comment = Comment.objects.create(
-            post=post, user=user, content=comment_content, parent=parent_comment
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                post=post, user=user, content=comment_content, parent=parent_comment
+            )
+            # Serialize the new comment
+            data = CommentSerializer(comment).data
+            post_commented(
+                comment,
+                post.user_id,
+                parent_comment.user_id if parent_comment else None,
+                data,
+            )
+
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class ViewerStateView(APIView):
+    """
+    The requesting user's like/share/comment flags for a batch of posts.
+    """
+
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    max_ids = getattr(settings, "API_MAX_PAGE_SIZE", 100)
+
+    def get(self, request):
+        """
+        Takes a comma-separated ``ids`` query parameter and returns one entry
+        per post id, in the order given. Read-only: nothing is toggled.
+        """
+        try:
+            post_ids = [
+                int(value)
+                for value in request.query_params.get("ids", "").split(",")
+                if value
+            ]
+        except ValueError:
+            return Response(
+                {"detail": "ids must be a comma-separated list of integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(post_ids) > self.max_ids:
+            return Response(
+                {"detail": f"At most {self.max_ids} ids per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        post_ids = list(dict.fromkeys(post_ids))
+        states = viewer_state(request.user, post_ids)
+        return Response(
+            {"results": [{"post": post_id, **states[post_id]} for post_id in post_ids]}
         )
 
-        # Serialize the new comment
-        return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
+
+class CommentThreadView(generics.ListAPIView):
+    """
+    A post's comments as a tree.
+
+    Pages over the post's top-level comments (or, with ``?parent=<id>``, the
+    direct replies of one comment) and nests up to ``?depth=`` levels of
+    replies under each, loaded in one query per level. Comments whose replies
+    were cut off carry a ``more_replies`` link that continues the thread from
+    there.
+    """
+
+    serializer_class = CommentNodeSerializer
+    pagination_class = CommentThreadPagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+
+    def get_depth(self):
+        try:
+            depth = int(self.request.query_params.get("depth", MAX_DEPTH))
+        except ValueError:
+            depth = MAX_DEPTH
+        return max(0, min(depth, MAX_DEPTH))
+
+    def get_queryset(self):
+        post_id = self.kwargs["post_id"]
+        if not Post.objects.filter(id=post_id).exists():
+            raise NotFound("Post not found")
+        parent_id = self.request.query_params.get("parent")
+        if parent_id is None:
+            return Comment.objects.filter(post_id=post_id, parent__isnull=True)
+        try:
+            return Comment.objects.filter(post_id=post_id, parent_id=int(parent_id))
+        except ValueError:
+            raise NotFound("Parent comment not found")
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        descendants = load_descendants(page, self.get_depth())
+
+        base_url = remove_query_param(
+            request.build_absolute_uri(), self.paginator.cursor_query_param
+        )
+        tree = build_tree(
+            self.get_serializer(page, many=True).data,
+            self.get_serializer(descendants, many=True).data,
+            lambda comment_id: replace_query_param(base_url, "parent", comment_id),
+        )
+        return self.get_paginated_response(tree)
 
 
 # class FriendRequestView(APIView):
@@ -4,3 +4,5 @@ from django.apps import AppConfig
 class MessagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'messages'
+    # "messages" is taken by django.contrib.messages
+    label = 'direct_messages'
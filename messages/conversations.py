@@ -0,0 +1,106 @@
+# messages/conversations.py
+"""
+Starting conversations, sending messages and marking them read.
+
+Each participant's inbox entry carries the conversation's last activity time
+and the participant's unread count. Sending a message updates every entry
+of the conversation in one UPDATE (unread + 1 for everyone but the sender)
+and reading resets one entry, so neither the inbox nor the unread counts
+ever COUNT messages. Each message is also pushed to the participants'
+open connections (core.realtime).
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from core.realtime import publish
+from users.models import CustomUser as User
+from .models import Conversation, Message, Participant
+from .serializers import MessageSerializer
+
+
+def direct_key(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f"{low}:{high}"
+
+
+def start_conversation(user_ids, key=None):
+    """
+    Create a conversation between ``user_ids``.
+    """
+    with transaction.atomic():
+        conversation = Conversation.objects.create(key=key)
+        Participant.objects.bulk_create(
+            Participant(
+                conversation=conversation,
+                user_id=user_id,
+                last_message_at=conversation.created_at,
+            )
+            for user_id in dict.fromkeys(user_ids)
+        )
+    return conversation
+
+
+def direct_conversation(user_id, other_id):
+    """
+    Return the one-to-one conversation between two users, creating it the
+    first time; None if ``other_id`` is not a user.
+    """
+    key = direct_key(user_id, other_id)
+    conversation = Conversation.objects.filter(key=key).first()
+    if conversation is not None:
+        return conversation
+    if not User.objects.filter(pk=other_id).exists():
+        return None
+    try:
+        return start_conversation([user_id, other_id], key=key)
+    except IntegrityError:
+        # Started concurrently by the other user
+        return Conversation.objects.get(key=key)
+
+
+def send_message(conversation_id, sender_id, content, participant_ids=None):
+    """
+    Add a message to a conversation and bump every participant's inbox
+    entry; the sender has read everything up to their own message.
+    ``participant_ids`` saves looking the participants up when the caller
+    has them.
+    """
+    if participant_ids is None:
+        participant_ids = Participant.objects.filter(
+            conversation_id=conversation_id
+        ).values_list("user_id", flat=True)
+    with transaction.atomic():
+        message = Message.objects.create(
+            conversation_id=conversation_id, sender_id=sender_id, content=content
+        )
+        Participant.objects.filter(conversation_id=conversation_id).update(
+            last_message_at=message.created_at,
+            unread_count=Case(
+                When(user_id=sender_id, then=Value(0)),
+                default=F("unread_count") + 1,
+            ),
+            last_read_at=Case(
+                When(user_id=sender_id, then=Value(message.created_at)),
+                default=F("last_read_at"),
+            ),
+        )
+        Conversation.objects.filter(pk=conversation_id).update(last_message=message)
+        publish(
+            participant_ids,
+            {"type": "message", "message": MessageSerializer(message).data},
+        )
+    return message
+
+
+def mark_read(conversation_id, user_id):
+    """
+    Mark a conversation read for ``user_id``; return False if they are not
+    a participant.
+    """
+    return bool(
+        Participant.objects.filter(
+            conversation_id=conversation_id, user_id=user_id
+        ).update(unread_count=0, last_read_at=timezone.now())
+    )
@@ -1,3 +1,84 @@
 from django.db import models
+from django.utils import timezone
+from users.models import CustomUser as User
 
-# Create your models here.
+
+class Conversation(models.Model):
+    """
+    A private conversation between two or more users.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # "<lower user id>:<higher user id>" for one-to-one conversations, so
+    # there is at most one per pair; null for group conversations
+    key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    last_message = models.ForeignKey(
+        "Message",
+        null=True,
+        blank=True,
+        related_name="+",
+        on_delete=models.SET_NULL,
+    )  # Shown in the inbox
+
+    def __str__(self):
+        return f"Conversation {self.id}"
+
+
+class Participant(models.Model):
+    """
+    A user's membership of a conversation and their inbox entry for it.
+    """
+
+    conversation = models.ForeignKey(
+        Conversation, related_name="participants", on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        User, related_name="conversations", on_delete=models.CASCADE
+    )
+    # Denormalized, kept in step by messages.conversations
+    last_message_at = models.DateTimeField(default=timezone.now)
+    unread_count = models.IntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (
+            "conversation",
+            "user",
+        )
+        indexes = [
+            # The inbox: a user's conversations, most recently active first
+            models.Index(
+                fields=["user", "last_message_at", "id"],
+                name="direct_messages_inbox_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in conversation {self.conversation_id}"
+
+
+class Message(models.Model):
+    """
+    A message sent to a conversation.
+    """
+
+    conversation = models.ForeignKey(
+        Conversation, related_name="messages", on_delete=models.CASCADE
+    )
+    sender = models.ForeignKey(
+        User, related_name="sent_messages", on_delete=models.CASCADE
+    )
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pages of a conversation's messages, newest first
+            models.Index(
+                fields=["conversation", "created_at", "id"],
+                name="direct_messages_page_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Message by {self.sender_id} in conversation {self.conversation_id}"
@@ -0,0 +1,20 @@
+# messages/pagination.py
+from core.pagination import KeysetPagination
+
+
+class InboxPagination(KeysetPagination):
+    """
+    A user's conversations, most recently active first, served by the
+    (user, last_message_at, id) index on Participant.
+    """
+
+    ordering = ("-last_message_at", "-id")
+
+
+class MessagePagination(KeysetPagination):
+    """
+    Newest-first cursor pagination for a conversation's messages, served by
+    the (conversation, created_at, id) index on Message.
+    """
+
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,43 @@
+# messages/serializers.py
+from rest_framework import serializers
+from .models import Message, Participant
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    """
+    Serializer for sending and reading messages.
+    """
+
+    class Meta:
+        model = Message
+        fields = ["id", "conversation", "sender", "content", "created_at"]
+        read_only_fields = ["conversation", "sender", "created_at"]
+
+    def validate_content(self, value):
+        """
+        Ensure that the message is not empty.
+        """
+        if not value.strip():
+            raise serializers.ValidationError("Content cannot be empty.")
+        return value
+
+
+class InboxSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for a conversation in the requesting user's inbox.
+    """
+
+    last_message = MessageSerializer(
+        source="conversation.last_message", read_only=True, allow_null=True
+    )
+
+    class Meta:
+        model = Participant
+        fields = [
+            "conversation",
+            "unread_count",
+            "last_read_at",
+            "last_message_at",
+            "last_message",
+        ]
+        read_only_fields = fields
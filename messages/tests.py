@@ -1,3 +1,121 @@
-from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from users.models import CustomUser as User
+from .conversations import direct_conversation, send_message, start_conversation
+from .models import Conversation, Message, Participant
+
+
+class DirectMessageTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="pass12345")
+        self.bob = User.objects.create_user(username="bob", password="pass12345")
+        self.client.force_authenticate(self.alice)
+
+    def unread(self, user, conversation_id):
+        return Participant.objects.get(
+            conversation_id=conversation_id, user=user
+        ).unread_count
+
+    def test_direct_message_starts_one_conversation_per_pair(self):
+        url = reverse("direct_message", args=[self.bob.id])
+        first = self.client.post(url, {"content": "hi bob"})
+        self.assertEqual(first.status_code, 201)
+        self.client.force_authenticate(self.bob)
+        reply = self.client.post(
+            reverse("direct_message", args=[self.alice.id]), {"content": "hi alice"}
+        )
+        self.assertEqual(reply.data["conversation"], first.data["conversation"])
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertEqual(
+            direct_conversation(self.alice.pk, self.bob.pk).pk,
+            first.data["conversation"],
+        )
+
+    def test_direct_message_errors(self):
+        url = reverse("direct_message", args=[self.alice.id])
+        self.assertEqual(self.client.post(url, {"content": "me"}).status_code, 400)
+        url = reverse("direct_message", args=[999])
+        self.assertEqual(self.client.post(url, {"content": "hi"}).status_code, 404)
+        url = reverse("direct_message", args=[self.bob.id])
+        self.assertEqual(self.client.post(url, {"content": "  "}).status_code, 400)
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_unread_counts_follow_sends_and_reads(self):
+        conversation = direct_conversation(self.alice.pk, self.bob.pk)
+        url = reverse("send_message", args=[conversation.pk])
+        self.client.post(url, {"content": "one"})
+        self.client.post(url, {"content": "two"})
+        self.assertEqual(self.unread(self.bob, conversation.pk), 2)
+        self.assertEqual(self.unread(self.alice, conversation.pk), 0)
+
+        self.client.force_authenticate(self.bob)
+        response = self.client.post(reverse("mark_read", args=[conversation.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread(self.bob, conversation.pk), 0)
+
+        self.client.post(url, {"content": "three"})
+        self.assertEqual(self.unread(self.alice, conversation.pk), 1)
+        self.assertEqual(self.unread(self.bob, conversation.pk), 0)
+
+    def test_group_message_counts_for_everyone_but_the_sender(self):
+        carol = User.objects.create_user(username="carol", password="pass12345")
+        conversation = start_conversation([self.alice.pk, self.bob.pk, carol.pk])
+        send_message(conversation.pk, self.bob.pk, "hello all")
+        self.assertEqual(
+            dict(
+                Participant.objects.filter(conversation=conversation).values_list(
+                    "user__username", "unread_count"
+                )
+            ),
+            {"alice": 1, "bob": 0, "carol": 1},
+        )
+
+    def test_outsiders_cannot_read_or_write(self):
+        carol = User.objects.create_user(username="carol", password="pass12345")
+        conversation = direct_conversation(self.bob.pk, carol.pk)
+        send_message(conversation.pk, self.bob.pk, "private")
+        for response in (
+            self.client.get(reverse("conversation_messages", args=[conversation.pk])),
+            self.client.post(
+                reverse("send_message", args=[conversation.pk]), {"content": "hi"}
+            ),
+            self.client.post(reverse("mark_read", args=[conversation.pk])),
+        ):
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_messages_are_paged_newest_first(self):
+        conversation = direct_conversation(self.alice.pk, self.bob.pk)
+        for i in range(5):
+            send_message(conversation.pk, self.bob.pk, f"message {i}")
+        url = reverse("conversation_messages", args=[conversation.pk])
+        seen = []
+        response = self.client.get(url, {"page_size": 2})
+        while True:
+            seen += [message["content"] for message in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(seen, [f"message {i}" for i in reversed(range(5))])
+
+    def test_inbox_is_ordered_by_last_activity_in_one_query(self):
+        direct_conversation(self.alice.pk, self.bob.pk)  # no messages yet
+        conversations = []
+        for i in range(4):
+            other = User.objects.create_user(username=f"friend{i}", password="pass")
+            conversations.append(direct_conversation(self.alice.pk, other.pk))
+            send_message(conversations[-1].pk, other.pk, f"from friend{i}")
+        send_message(conversations[1].pk, self.alice.pk, "back to friend1")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("inbox"), {"page_size": 10})
+        results = response.data["results"]
+        self.assertEqual(
+            [entry["conversation"] for entry in results[:4]],
+            [conversations[i].pk for i in (1, 3, 2, 0)],
+        )
+        self.assertEqual(results[0]["last_message"]["content"], "back to friend1")
+        self.assertEqual(results[0]["unread_count"], 0)
+        self.assertEqual(results[1]["unread_count"], 1)
+        self.assertIsNone(results[4]["last_message"])
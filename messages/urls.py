@@ -1,6 +1,25 @@
 from django.urls import path
-from .views import hello
+from .views import (
+    InboxView,
+    ConversationMessagesView,
+    SendMessageView,
+    DirectMessageView,
+    MarkReadView,
+)
 
 urlpatterns = [
-    path("/", hello, name="like_post"),
+    # The requesting user's conversations, most recently active first
+    path("", InboxView.as_view(), name="inbox"),
+    # A conversation's messages, newest first
+    path(
+        "<int:conversation_id>/",
+        ConversationMessagesView.as_view(),
+        name="conversation_messages",
+    ),
+    # Send a message to a conversation
+    path("<int:conversation_id>/send/", SendMessageView.as_view(), name="send_message"),
+    # Reset the requesting user's unread count
+    path("<int:conversation_id>/read/", MarkReadView.as_view(), name="mark_read"),
+    # Message a user, starting the conversation if needed
+    path("direct/<int:user_id>/", DirectMessageView.as_view(), name="direct_message"),
 ]
@@ -1,6 +1,139 @@
-from django.shortcuts import render
+# messages/views.py
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from core.throttling import ThrottleFirstMixin
+from users.authentication import StatelessReadJWTAuthentication
+from .conversations import direct_conversation, mark_read, send_message
+from .models import Message, Participant
+from .pagination import InboxPagination, MessagePagination
+from .serializers import InboxSerializer, MessageSerializer
 
-# Create your views here.
-def hello(request):
-    return "Hello, World!"
+
+class InboxView(generics.ListAPIView):
+    """
+    The requesting user's conversations, most recently active first, with
+    their unread counts and last message.
+
+    One query per page, a range scan on the user's inbox index joined to
+    each conversation's last message, however many conversations they have.
+    """
+
+    serializer_class = InboxSerializer
+    pagination_class = InboxPagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Participant.objects.filter(user_id=self.request.user.pk).select_related(
+            "conversation__last_message"
+        )
+
+
+class ConversationMessagesView(generics.ListAPIView):
+    """
+    A conversation's messages, newest first, for its participants.
+    """
+
+    serializer_class = MessageSerializer
+    pagination_class = MessagePagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        conversation_id = self.kwargs["conversation_id"]
+        if not Participant.objects.filter(
+            conversation_id=conversation_id, user_id=self.request.user.pk
+        ).exists():
+            raise NotFound("Conversation not found")
+        return Message.objects.filter(conversation_id=conversation_id)
+
+
+class SendMessageView(ThrottleFirstMixin, APIView):
+    """
+    Send a message to a conversation.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "message"
+
+    def post(self, request, conversation_id):
+        """
+        Adds the message and bumps the conversation in every participant's
+        inbox, counting it as unread for everyone but the sender.
+        """
+        participant_ids = list(
+            Participant.objects.filter(conversation_id=conversation_id).values_list(
+                "user_id", flat=True
+            )
+        )
+        if request.user.pk not in participant_ids:
+            return Response(
+                {"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = MessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message = send_message(
+            conversation_id,
+            request.user.pk,
+            serializer.validated_data["content"],
+            participant_ids,
+        )
+        return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+
+
+class DirectMessageView(ThrottleFirstMixin, APIView):
+    """
+    Send a message to a user.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "message"
+
+    def post(self, request, user_id):
+        """
+        Sends the message to the one-to-one conversation with the given user,
+        starting it if this is their first message.
+        """
+        if request.user.pk == user_id:
+            return Response(
+                {"detail": "Cannot message yourself."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = MessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        conversation = direct_conversation(request.user.pk, user_id)
+        if conversation is None:
+            return Response(
+                {"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        message = send_message(
+            conversation.pk,
+            request.user.pk,
+            serializer.validated_data["content"],
+            [request.user.pk, user_id],
+        )
+        return Response(MessageSerializer(message).data, status=status.HTTP_201_CREATED)
+
+
+class MarkReadView(APIView):
+    """
+    Mark a conversation read.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, conversation_id):
+        """
+        Resets the requesting user's unread count for the conversation.
+        """
+        if not mark_read(conversation_id, request.user.pk):
+            return Response(
+                {"detail": "Conversation not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"unread_count": 0}, status=status.HTTP_200_OK)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+def count_sampled_actors(apps, schema_editor):
+    # The sampled actors are the ones known to have been counted
+    Notification = apps.get_model("notifications", "Notification")
+    for notification in Notification.objects.filter(is_read=False).iterator():
+        notification.actor_ids = [actor["id"] for actor in notification.actors]
+        notification.save(update_fields=["actor_ids"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="actor_ids",
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(count_sampled_actors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+from django.db import models
+from django.utils import timezone
+from posts.models import Post
+from users.models import CustomUser as User
+
+
+class Notification(models.Model):
+    """
+    Likes, comments or replies on one of a user's posts, coalesced: there is
+    one row per (recipient, post, verb), updated in place as events arrive.
+    """
+
+    VERBS = [
+        ("like", "liked your post"),
+        ("comment", "commented on your post"),
+        ("reply", "replied to your comment"),
+    ]
+
+    recipient = models.ForeignKey(
+        User, related_name="notifications", on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post, related_name="notifications", on_delete=models.CASCADE
+    )
+    verb = models.CharField(max_length=10, choices=VERBS)
+    # Distinct actors since the notification was last read
+    actor_count = models.IntegerField(default=0)
+    # Ids of the actors counted, up to NOTIFICATION_COUNTED_ACTORS
+    actor_ids = models.JSONField(default=list)
+    actors = models.JSONField(
+        default=list
+    )  # [{"id": ..., "username": ...}], most recent first, a few at most
+    is_read = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(default=timezone.now)  # Latest event
+
+    class Meta:
+        unique_together = (
+            "recipient",
+            "post",
+            "verb",
+        )
+        indexes = [
+            # A user's notifications, most recent first
+            models.Index(
+                fields=["recipient", "updated_at", "id"],
+                name="notifications_recent_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.verb} x{self.actor_count} on Post {self.post_id}"
+
+
+class NotificationCounter(models.Model):
+    """
+    A user's number of unread notifications, kept in step by
+    notifications.notify.
+    """
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name="notification_counter",
+        on_delete=models.CASCADE,
+    )
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
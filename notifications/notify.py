@@ -0,0 +1,124 @@
+# notifications/notify.py
+"""
+Recording and reading coalesced notifications.
+
+An event (a like, a comment, a reply) updates the recipient's unread
+Notification for that post and verb in place: the actor count goes up,
+once per distinct actor among the first NOTIFICATION_COUNTED_ACTORS, and
+the actor joins the front of a short sample. Once the notification has been
+read, the next event starts the count again. A viral post therefore costs
+each recipient one row per verb however many events it gets, and each event
+a read and an update of that row.
+
+Unread counts live in NotificationCounter and change only when a
+notification goes from read to unread or back, or is deleted unread (see
+notifications.signals), so they are never counted.
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+SAMPLE_ACTORS = getattr(settings, "NOTIFICATION_SAMPLE_ACTORS", 3)
+COUNTED_ACTORS = getattr(settings, "NOTIFICATION_COUNTED_ACTORS", 1000)
+
+
+def adjust_unread(user_id, delta):
+    if not NotificationCounter.objects.filter(user_id=user_id).update(
+        unread=F("unread") + delta
+    ):
+        NotificationCounter.objects.create(user_id=user_id, unread=max(delta, 0))
+
+
+def notify(recipient_id, post_id, verb, actors):
+    """
+    Record that ``actors`` (users, oldest first) did ``verb`` on
+    ``recipient_id``'s post. Nobody is notified of their own actions.
+    """
+    actors = [actor for actor in actors if actor.pk != recipient_id]
+    if recipient_id is None or not actors:
+        return
+    try:
+        coalesce(recipient_id, post_id, verb, actors)
+    except IntegrityError:
+        # The notification was created concurrently; coalesce into it
+        coalesce(recipient_id, post_id, verb, actors)
+
+
+def coalesce(recipient_id, post_id, verb, actors):
+    samples = {}
+    for actor in reversed(actors):
+        samples.setdefault(actor.pk, {"id": actor.pk, "username": actor.username})
+    now = timezone.now()
+    with transaction.atomic():
+        notification = (
+            Notification.objects.select_for_update()
+            .filter(recipient_id=recipient_id, post_id=post_id, verb=verb)
+            .first()
+        )
+        if notification is None:
+            Notification.objects.create(
+                recipient_id=recipient_id,
+                post_id=post_id,
+                verb=verb,
+                actor_count=len(samples),
+                actor_ids=list(samples)[:COUNTED_ACTORS],
+                actors=list(samples.values())[:SAMPLE_ACTORS],
+                updated_at=now,
+            )
+            adjust_unread(recipient_id, 1)
+            return
+        if notification.is_read:
+            notification.actor_count = 0
+            notification.actor_ids = []
+            notification.actors = []
+            notification.is_read = False
+            adjust_unread(recipient_id, 1)
+        # Actors already counted (liking again after an unlike) aren't
+        # counted twice
+        counted = set(notification.actor_ids)
+        new = [actor_id for actor_id in samples if actor_id not in counted]
+        notification.actor_count += len(new)
+        room = COUNTED_ACTORS - len(notification.actor_ids)
+        notification.actor_ids += new[: max(room, 0)]
+        others = [a for a in notification.actors if a["id"] not in samples]
+        notification.actors = (list(samples.values()) + others)[:SAMPLE_ACTORS]
+        notification.updated_at = now
+        notification.save(
+            update_fields=[
+                "actor_count",
+                "actor_ids",
+                "actors",
+                "is_read",
+                "updated_at",
+            ]
+        )
+
+
+def unread_count(user_id):
+    return (
+        NotificationCounter.objects.filter(user_id=user_id)
+        .values_list("unread", flat=True)
+        .first()
+        or 0
+    )
+
+
+def mark_read(user_id, notification_id=None):
+    """
+    Mark one of ``user_id``'s notifications read, or all of them; return how
+    many were unread.
+    """
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient_id=user_id, is_read=False)
+        if notification_id is not None:
+            unread = unread.filter(pk=notification_id)
+        marked = unread.update(is_read=True)
+        if notification_id is None:
+            NotificationCounter.objects.filter(user_id=user_id).update(unread=0)
+        elif marked:
+            adjust_unread(user_id, -marked)
+    return marked
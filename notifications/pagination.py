@@ -0,0 +1,11 @@
+# notifications/pagination.py
+from core.pagination import KeysetPagination
+
+
+class NotificationPagination(KeysetPagination):
+    """
+    A user's notifications, most recent first, served by the
+    (recipient, updated_at, id) index on Notification.
+    """
+
+    ordering = ("-updated_at", "-id")
@@ -0,0 +1,22 @@
+# notifications/serializers.py
+from rest_framework import serializers
+from .models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for a coalesced notification.
+    """
+
+    class Meta:
+        model = Notification
+        fields = [
+            "id",
+            "verb",
+            "post",
+            "actor_count",
+            "actors",
+            "is_read",
+            "updated_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,27 @@
+# notifications/signals.py
+from django.db.models.signals import post_delete
+
+from users.models import CustomUser
+from .models import Notification
+from .notify import adjust_unread
+
+
+def discount_deleted_unread(sender, instance, origin=None, **kwargs):
+    """
+    Take an unread notification deleted with its post (or directly) out of
+    its recipient's unread count.
+    """
+    if instance.is_read:
+        return
+    # The counter goes too when the recipient itself is being deleted
+    if isinstance(origin, CustomUser) and origin.pk == instance.recipient_id:
+        return
+    adjust_unread(instance.recipient_id, -1)
+
+
+def connect_notification_signals():
+    post_delete.connect(
+        discount_deleted_unread,
+        sender=Notification,
+        dispatch_uid="discount_deleted_unread",
+    )
@@ -0,0 +1,195 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from interactions.buffer import like_buffer
+from posts.models import Post
+from users.models import CustomUser as User
+from .models import Notification, NotificationCounter
+from .notify import notify, unread_count
+
+
+class NotificationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="pass")
+        self.fans = [User.objects.create_user(username=f"fan{i}") for i in range(5)]
+        self.post = Post.objects.create(user=self.author, content="popular")
+
+    def like(self, user, post=None):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("like_post", args=[(post or self.post).id]))
+
+    def comment(self, user, parent=None):
+        self.client.force_authenticate(user)
+        data = {"content": f"from {user.username}"}
+        if parent is not None:
+            data["parent"] = parent
+        return self.client.post(reverse("comment_post", args=[self.post.id]), data)
+
+    def test_likes_coalesce_into_one_notification(self):
+        for fan in self.fans:
+            self.like(fan)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.verb, "like")
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(
+            [actor["username"] for actor in notification.actors],
+            ["fan4", "fan3", "fan2"],
+        )
+        self.assertEqual(unread_count(self.author.pk), 1)
+
+        # Liking again after an unlike doesn't count the actor twice
+        self.like(self.fans[3])
+        self.like(self.fans[3])
+        notification.refresh_from_db()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actors[0]["username"], "fan3")
+
+    def test_actors_out_of_the_sample_are_not_counted_twice(self):
+        for fan in self.fans:
+            self.like(fan)
+        # fan0 has left the sample of three; unliking and liking again
+        # doesn't make them another actor
+        self.like(self.fans[0])
+        self.like(self.fans[0])
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actors[0]["username"], "fan0")
+
+        # Past NOTIFICATION_COUNTED_ACTORS, repeats are counted again
+        Notification.objects.update(is_read=True)
+        with mock.patch("notifications.notify.COUNTED_ACTORS", 2):
+            for fan in self.fans[:3] + [self.fans[2]]:
+                self.like(fan)  # Unlike
+                self.like(fan)
+        notification.refresh_from_db()
+        self.assertEqual(notification.actor_ids, [self.fans[0].pk, self.fans[1].pk])
+        self.assertEqual(notification.actor_count, 4)
+
+    def test_events_after_reading_start_a_new_count(self):
+        self.like(self.fans[0])
+        self.like(self.fans[1])
+        self.client.force_authenticate(self.author)
+        response = self.client.post(reverse("notification_read_all"))
+        self.assertEqual(response.data, {"unread": 0})
+
+        self.like(self.fans[2])
+        notification = Notification.objects.get()
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.actor_count, 1)
+        self.assertEqual(
+            notification.actors, [{"id": self.fans[2].pk, "username": "fan2"}]
+        )
+        self.assertEqual(unread_count(self.author.pk), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_nobody_is_notified_of_their_own_actions(self):
+        self.like(self.author)
+        self.comment(self.author)
+        notify(self.author.pk, self.post.pk, "like", [self.author])
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(unread_count(self.author.pk), 0)
+
+    def test_comments_and_replies(self):
+        parent = self.comment(self.fans[0]).data["id"]
+        self.comment(self.fans[1], parent)
+        self.comment(self.fans[2], parent)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("recipient__username", "verb")),
+            [("author", "comment"), ("fan0", "reply")],
+        )
+        comments = Notification.objects.get(recipient=self.author, verb="comment")
+        self.assertEqual(comments.actor_count, 3)
+        replies = Notification.objects.get(recipient=self.fans[0])
+        self.assertEqual(replies.actor_count, 2)
+
+    def test_list_is_one_query_and_newest_first(self):
+        other = Post.objects.create(user=self.author, content="other")
+        self.like(self.fans[0])
+        self.like(self.fans[0], other)
+        self.comment(self.fans[1])
+        self.client.force_authenticate(self.author)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("notification_list"))
+        self.assertEqual(
+            [(entry["verb"], entry["post"]) for entry in response.data["results"]],
+            [("comment", self.post.pk), ("like", other.pk), ("like", self.post.pk)],
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("notification_unread"))
+        self.assertEqual(response.data, {"unread": 3})
+
+    def test_deleting_a_post_discounts_its_unread_notifications(self):
+        other = Post.objects.create(user=self.author, content="other")
+        self.like(self.fans[0])
+        self.like(self.fans[0], other)
+        parent = self.comment(self.fans[1]).data["id"]
+        self.comment(self.fans[2], parent)
+        self.client.force_authenticate(self.author)
+        self.client.post(
+            reverse(
+                "notification_read",
+                args=[Notification.objects.get(verb="like", post=other).pk],
+            )
+        )
+        self.assertEqual(unread_count(self.author.pk), 2)
+        self.assertEqual(unread_count(self.fans[1].pk), 1)
+
+        self.post.delete()
+        self.assertEqual(unread_count(self.author.pk), 0)
+        self.assertEqual(unread_count(self.fans[1].pk), 0)
+        other.delete()  # Its notification was already read
+        self.assertEqual(unread_count(self.author.pk), 0)
+
+        # Deleting the recipient takes the counter with it
+        self.like(self.fans[0], Post.objects.create(user=self.author, content="x"))
+        self.author.delete()
+        self.assertFalse(
+            NotificationCounter.objects.filter(user_id=self.author.pk).exists()
+        )
+
+    def test_mark_one_read(self):
+        self.like(self.fans[0])
+        self.comment(self.fans[1])
+        notification = Notification.objects.get(verb="like")
+        self.client.force_authenticate(self.author)
+        url = reverse("notification_read", args=[notification.pk])
+        self.assertEqual(self.client.post(url).data, {"unread": 1})
+        # Marking it again changes nothing
+        self.assertEqual(self.client.post(url).data, {"unread": 1})
+
+        self.client.force_authenticate(self.fans[0])
+        self.assertEqual(self.client.post(url).status_code, 404)
+        url = reverse("notification_read", args=[999])
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+
+@override_settings(LIKE_WRITE_BEHIND=True)
+class BufferedLikeNotificationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(like_buffer, "interval", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(like_buffer.clear)
+
+    def test_flush_notifies_once_per_post(self):
+        author = User.objects.create_user(username="author")
+        post = Post.objects.create(user=author, content="viral")
+        fans = [User.objects.create_user(username=f"fan{i}") for i in range(4)]
+        for fan in fans:
+            self.client.force_authenticate(fan)
+            self.client.post(reverse("like_post", args=[post.id]))
+        self.assertFalse(Notification.objects.exists())
+
+        like_buffer.flush()
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual(
+            [actor["username"] for actor in notification.actors],
+            ["fan3", "fan2", "fan1"],
+        )
+        self.assertEqual(unread_count(author.pk), 1)
@@ -0,0 +1,20 @@
+from django.urls import path
+from .views import (
+    NotificationListView,
+    UnreadCountView,
+    MarkReadView,
+    MarkNotificationReadView,
+)
+
+urlpatterns = [
+    # The requesting user's notifications, most recent first
+    path("", NotificationListView.as_view(), name="notification_list"),
+    path("unread/", UnreadCountView.as_view(), name="notification_unread"),
+    # Mark all, or one, read
+    path("read/", MarkReadView.as_view(), name="notification_read_all"),
+    path(
+        "<int:pk>/read/",
+        MarkNotificationReadView.as_view(),
+        name="notification_read",
+    ),
+]
@@ -0,0 +1,67 @@
+# notifications/views.py
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from users.authentication import StatelessReadJWTAuthentication
+from .models import Notification
+from .notify import mark_read, unread_count
+from .pagination import NotificationPagination
+from .serializers import NotificationSerializer
+
+
+class NotificationListView(generics.ListAPIView):
+    """
+    The requesting user's notifications, most recent first; one range scan
+    on the (recipient, updated_at, id) index per page.
+    """
+
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient_id=self.request.user.pk)
+
+
+class UnreadCountView(APIView):
+    """
+    How many of the requesting user's notifications are unread.
+    """
+
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread": unread_count(request.user.pk)})
+
+
+class MarkReadView(APIView):
+    """
+    Mark all of the requesting user's notifications read.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        mark_read(request.user.pk)
+        return Response({"unread": 0}, status=status.HTTP_200_OK)
+
+
+class MarkNotificationReadView(APIView):
+    """
+    Mark one notification read.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        if not mark_read(request.user.pk, pk) and not (
+            Notification.objects.filter(pk=pk, recipient_id=request.user.pk).exists()
+        ):
+            return Response(
+                {"detail": "Notification not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"unread": unread_count(request.user.pk)})
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from .signals import (
+            connect_cache_signals,
+            connect_hashtag_signals,
+            connect_image_signals,
+            ensure_search_schema,
+        )
+
+        connect_cache_signals()
+        connect_hashtag_signals()
+        connect_image_signals()
+        post_migrate.connect(ensure_search_schema, sender=self)
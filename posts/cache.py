@@ -0,0 +1,292 @@
+# posts/cache.py
+"""
+Versioned read-through cache for serialized posts.
+
+Each post has a version token in the cache. Detail entries are keyed by that
+token, and list page entries record the token of every post they contain,
+so bumping one post's version invalidates its detail entry and every list
+page showing it without scanning keys. A list generation token, bumped when
+a post is created, invalidates pages whose membership may have changed.
+Each token also records the write clock, a counter ticked by every
+invalidation, when it was made: a list page is only stored if neither its
+posts nor the list generation were written while it was rendered.
+The same tokens make the ETags of conditional GETs (post_etag and
+post_list_etag), which change exactly when the cached entries would.
+"""
+
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.conditional import make_etag
+
+CACHE_ALIAS = getattr(settings, "POST_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "POST_CACHE_TIMEOUT", 300)
+
+LIST_GENERATION_KEY = "posts:list:generation"
+WRITE_CLOCK_KEY = "posts:write-clock"
+
+
+class CacheStats:
+    """
+    Process-local hit and miss counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def version_key(post_id):
+    return f"posts:version:{post_id}"
+
+
+def _new_token(tick=0):
+    return f"{tick}:{uuid.uuid4().hex}"
+
+
+def _tick(token):
+    # The write clock reading a token was made at; 0 for ones made on read
+    tick, _, _ = token.partition(":")
+    return int(tick) if tick.isdigit() else 0
+
+
+def write_clock():
+    return get_cache().get(WRITE_CLOCK_KEY, 0)
+
+
+def _tick_write_clock():
+    cache = get_cache()
+    cache.add(WRITE_CLOCK_KEY, 0, None)
+    return cache.incr(WRITE_CLOCK_KEY)
+
+
+def _get_or_create_token(key):
+    cache = get_cache()
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, _new_token(), None)
+        token = cache.get(key)
+    return token
+
+
+def _written_since(clock, tokens):
+    """
+    Whether any of ``tokens`` was made by a write after the write_clock()
+    reading ``clock``. A clock that went backwards was evicted, so anything
+    may have been written.
+    """
+    return write_clock() < clock or any(_tick(token) > clock for token in tokens)
+
+
+def post_version(post_id):
+    return _get_or_create_token(version_key(post_id))
+
+
+def post_versions(post_ids):
+    """
+    Return ``{post id: version token}`` in one cache round trip, creating
+    tokens for posts that have none yet.
+    """
+    keys = {version_key(pk): pk for pk in post_ids}
+    found = get_cache().get_many(keys)
+    for key in keys.keys() - found.keys():
+        found[key] = _get_or_create_token(key)
+    return {keys[key]: token for key, token in found.items()}
+
+
+def invalidate_post(post_id, membership_changed=False):
+    """
+    Bump the version of ``post_id`` (and the list generation when a post
+    was added), now and again once the surrounding transaction commits so
+    readers can't cache pre-commit data under the new version.
+    """
+    invalidate_posts([post_id], membership_changed)
+
+
+def invalidate_posts(post_ids, membership_changed=False):
+    """
+    invalidate_post for many posts in one cache write, for bulk writers.
+    """
+    keys = [version_key(post_id) for post_id in post_ids]
+
+    def bump():
+        tick = _tick_write_clock()
+        tokens = {key: _new_token(tick) for key in keys}
+        if membership_changed:
+            tokens[LIST_GENERATION_KEY] = _new_token(tick)
+        get_cache().set_many(tokens, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def _digest(value):
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def post_etag(post_id, variant):
+    """
+    ETag of ``post_id`` rendered as ``variant``, from its version token, so
+    any edit, like or comment changes it.
+    """
+    return make_etag(post_id, post_version(post_id), variant)
+
+
+def post_list_etag(variant, post_ids, clock=None):
+    """
+    ETag of the list page ``variant`` showing ``post_ids``, from their
+    version tokens and the list generation. Given the write_clock() from
+    before the page was read, returns None if the page's posts or the list
+    generation were written since, as the page may predate their tokens.
+    """
+    versions = post_versions(post_ids)
+    generation = _get_or_create_token(LIST_GENERATION_KEY)
+    if clock is not None and _written_since(clock, [generation, *versions.values()]):
+        return None
+    return make_etag(generation, variant, *(f"{pk}.{versions[pk]}" for pk in post_ids))
+
+
+def _detail_key(post_id, variant):
+    return f"posts:detail:{post_id}:{post_version(post_id)}:{_digest(variant)}"
+
+
+def cached_post_detail(post_id, variant, render):
+    """
+    Return ``(data, hit)`` for a single serialized post. ``variant``
+    distinguishes renderings of the same post (e.g. the request host) and
+    ``render`` produces the data on a miss.
+    """
+    cache = get_cache()
+    key = _detail_key(post_id, variant)
+    data = cache.get(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data, True
+
+    stats.record(hit=False)
+    data = render()
+    cache.set(key, data, CACHE_TIMEOUT)
+    return data, False
+
+
+async def acached_post_detail(post_id, variant, render):
+    """
+    cached_post_detail() for async views; ``render`` is a coroutine function.
+    The cache itself is called synchronously, it's in-process memory.
+    """
+    cache = get_cache()
+    key = _detail_key(post_id, variant)
+    data = cache.get(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data, True
+
+    stats.record(hit=False)
+    data = await render()
+    cache.set(key, data, CACHE_TIMEOUT)
+    return data, False
+
+
+def _list_key(variant):
+    generation = _get_or_create_token(LIST_GENERATION_KEY)
+    return f"posts:list:{generation}:{_digest(variant)}"
+
+
+def _cached_list_page(key):
+    entry = get_cache().get(key)
+    if entry is None:
+        return None
+    current = get_cache().get_many([version_key(pk) for pk in entry["versions"]])
+    if all(
+        current.get(version_key(pk)) == token for pk, token in entry["versions"].items()
+    ):
+        return entry["data"]
+    return None
+
+
+def cached_post_list_ids(variant):
+    """
+    Ids of the posts on the cached page for ``variant``, or None when it
+    isn't cached or no longer valid.
+    """
+    data = _cached_list_page(_list_key(variant))
+    if data is None:
+        return None
+    return [post["id"] for post in data["results"]]
+
+
+def _store_list_page(key, clock, data):
+    # Pages whose posts were written mid-render may hold the old data under
+    # the new tokens; writes to other posts don't matter. The key names the
+    # list generation read before the render, so a newer one orphans it.
+    versions = post_versions(post["id"] for post in data["results"])
+    if not _written_since(clock, versions.values()):
+        get_cache().set(key, {"data": data, "versions": versions}, CACHE_TIMEOUT)
+
+
+def cached_post_list(variant, render):
+    """
+    Return ``(data, hit)`` for a paginated list response whose "results"
+    are serialized posts. ``variant`` is the full request URL.
+    """
+    key = _list_key(variant)
+    data = _cached_list_page(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data, True
+
+    stats.record(hit=False)
+    clock = write_clock()
+    data = render()
+    _store_list_page(key, clock, data)
+    return data, False
+
+
+async def acached_post_list(variant, render):
+    """
+    cached_post_list() for async views; ``render`` is a coroutine function.
+    """
+    key = _list_key(variant)
+    data = _cached_list_page(key)
+    if data is not None:
+        stats.record(hit=True)
+        return data, True
+
+    stats.record(hit=False)
+    clock = write_clock()
+    data = await render()
+    _store_list_page(key, clock, data)
+    return data, False
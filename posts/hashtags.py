@@ -0,0 +1,207 @@
+# posts/hashtags.py
+"""
+Hashtag extraction, the hashtag -> post inverted index and trending counts.
+
+Saving a post diffs its hashtags against the index and only writes the
+changes. Every tag application is also counted into a HashtagBucket for the
+current time bucket (HASHTAG_BUCKET_SECONDS wide), and removals are taken
+back out of the bucket they were counted in, so trending tags over a window
+are a sum over that window's buckets. Buckets older than the longest
+window are never read again: they are neither created nor adjusted, and
+the prune_hashtag_buckets command deletes them.
+"""
+
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Hashtag, HashtagBucket, PostHashtag
+
+BUCKET_SECONDS = getattr(settings, "HASHTAG_BUCKET_SECONDS", 300)
+TRENDING_WINDOWS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+BUCKET_RETENTION = max(TRENDING_WINDOWS.values())
+
+# Tags longer than Hashtag.name allows are skipped rather than truncated
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w{1,100})(?!\w)")
+
+
+def extract_hashtags(content):
+    return {match.lower() for match in HASHTAG_RE.findall(content or "")}
+
+
+def bucket_start(moment):
+    epoch = int(moment.timestamp())
+    return moment.fromtimestamp(epoch - epoch % BUCKET_SECONDS, tz=moment.tzinfo)
+
+
+def bucket_cutoff(now=None):
+    """
+    Start of the oldest bucket a trending window still reads.
+    """
+    return bucket_start((now or timezone.now()) - BUCKET_RETENTION)
+
+
+def prune_buckets(now=None):
+    """
+    Delete the buckets no trending window reads any more; return how many.
+    """
+    return HashtagBucket.objects.filter(bucket_start__lt=bucket_cutoff(now)).delete()[0]
+
+
+def sync_post_hashtags(post, created=False):
+    """
+    Bring the index in line with ``post``'s current content and visibility.
+    Only public, active posts are indexed.
+    """
+    wanted = set()
+    if post.is_active and post.visibility == "public":
+        wanted = extract_hashtags(post.content)
+
+    current = {}
+    if not created:
+        current = {
+            link.hashtag.name: link
+            for link in PostHashtag.objects.filter(post=post).select_related("hashtag")
+        }
+
+    added = wanted - current.keys()
+    removed = [current[name] for name in current.keys() - wanted]
+    if not added and not removed:
+        return
+
+    with transaction.atomic():
+        if added:
+            now = timezone.now()
+            Hashtag.objects.bulk_create(
+                (Hashtag(name=name) for name in added), ignore_conflicts=True
+            )
+            tag_ids = list(
+                Hashtag.objects.filter(name__in=added).values_list("id", flat=True)
+            )
+            PostHashtag.objects.bulk_create(
+                (
+                    PostHashtag(hashtag_id=tag_id, post=post, created_at=now)
+                    for tag_id in tag_ids
+                ),
+                ignore_conflicts=True,
+            )
+            adjust_buckets({bucket_start(now): tag_ids}, 1)
+        if removed:
+            remove_links(removed)
+
+
+def remove_links(links):
+    """
+    Delete index entries and take them back out of their trending buckets.
+    """
+    by_bucket = defaultdict(list)
+    for link in links:
+        by_bucket[bucket_start(link.created_at)].append(link.hashtag_id)
+    PostHashtag.objects.filter(pk__in=[link.pk for link in links]).delete()
+    adjust_buckets(by_bucket, -1)
+
+
+def adjust_buckets(tag_ids_by_bucket, delta):
+    """
+    Add ``delta`` to the bucket counter of each tag, creating missing
+    buckets first so the increment is one in-database UPDATE per bucket.
+    Buckets past the retention are skipped, as they may have been pruned.
+    """
+    cutoff = bucket_cutoff()
+    for start, tag_ids in tag_ids_by_bucket.items():
+        if start < cutoff:
+            continue
+        HashtagBucket.objects.bulk_create(
+            (
+                HashtagBucket(hashtag_id=tag_id, bucket_start=start)
+                for tag_id in tag_ids
+            ),
+            ignore_conflicts=True,
+        )
+        HashtagBucket.objects.filter(hashtag_id__in=tag_ids, bucket_start=start).update(
+            count=F("count") + delta
+        )
+
+
+def trending_hashtags(window="hour", limit=10, now=None):
+    """
+    Return ``[(tag name, uses)]`` for the most used tags in the window,
+    computed from the window's buckets alone.
+    """
+    now = now or timezone.now()
+    since = bucket_start(now - TRENDING_WINDOWS[window])
+    return list(
+        HashtagBucket.objects.filter(bucket_start__gte=since)
+        .values("hashtag__name")
+        .annotate(uses=Sum("count"))
+        .filter(uses__gt=0)
+        .order_by("-uses", "hashtag__name")
+        .values_list("hashtag__name", "uses")[:limit]
+    )
+
+
+def index_posts(posts):
+    """
+    Index posts written without their post_save signal (bulk imports), each
+    tag counted as applied when the post was made, so old posts don't show
+    up as trending.
+    """
+    uses = [
+        (name, post.pk, post.created_at)
+        for post in posts
+        if post.is_active and post.visibility == "public"
+        for name in extract_hashtags(post.content)
+    ]
+    if not uses:
+        return
+    Hashtag.objects.bulk_create(
+        (Hashtag(name=name) for name in {name for name, _, _ in uses}),
+        ignore_conflicts=True,
+    )
+    tag_ids = dict(
+        Hashtag.objects.filter(name__in={name for name, _, _ in uses}).values_list(
+            "name", "id"
+        )
+    )
+    PostHashtag.objects.bulk_create(
+        (
+            PostHashtag(hashtag_id=tag_ids[name], post_id=post_id, created_at=created)
+            for name, post_id, created in uses
+        ),
+        ignore_conflicts=True,
+    )
+    cutoff = bucket_cutoff()
+    uses_per_bucket = Counter(
+        (tag_ids[name], start)
+        for name, _, created in uses
+        if (start := bucket_start(created)) >= cutoff
+    )
+    if not uses_per_bucket:
+        return
+    # Old posts mostly land in buckets that don't exist yet: insert those
+    # with their counts in one go, rather than two queries per bucket
+    starts = {start for _, start in uses_per_bucket}
+    existing = set(
+        HashtagBucket.objects.filter(
+            hashtag_id__in=set(tag_ids.values()),
+            bucket_start__gte=min(starts),
+            bucket_start__lte=max(starts),
+        ).values_list("hashtag_id", "bucket_start")
+    )
+    HashtagBucket.objects.bulk_create(
+        HashtagBucket(hashtag_id=tag_id, bucket_start=start, count=count)
+        for (tag_id, start), count in uses_per_bucket.items()
+        if (tag_id, start) not in existing
+    )
+    # adjust_buckets adds one delta to a list of tags, so group by uses
+    by_delta = defaultdict(lambda: defaultdict(list))
+    for (tag_id, start), count in uses_per_bucket.items():
+        if (tag_id, start) in existing:
+            by_delta[count][start].append(tag_id)
+    for count, tag_ids_by_bucket in by_delta.items():
+        adjust_buckets(tag_ids_by_bucket, count)
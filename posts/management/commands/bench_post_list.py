@@ -0,0 +1,101 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from users.models import CustomUser as User
+from posts import cache as post_cache
+from posts.models import Post
+from posts.pagination import PostCursorPagination
+from posts.views import PostListView
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark GET /posts/ cursor pagination at shallow and deep positions. "
+        "Seeds the configured database with posts until --posts exist."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        self.seed(options["posts"], options["batch_size"])
+        total = Post.objects.count()
+        page_size = options["page_size"]
+        repeat = options["repeat"]
+
+        factory = APIRequestFactory()
+        view = PostListView.as_view()
+
+        def fetch(query):
+            # Measure the database path, not posts.cache
+            post_cache.get_cache().clear()
+            request = factory.get(f"/posts/?{query}", HTTP_HOST="localhost")
+            response = view(request)
+            response.render()
+            return response
+
+        self.stdout.write(f"{total} posts, page_size={page_size}, repeat={repeat}")
+        self.report("page 1", lambda: fetch(f"page_size={page_size}"), repeat)
+
+        ordered = Post.objects.order_by("-created_at", "-id")
+        for fraction in (0.5, 0.99):
+            depth = int(total * fraction)
+            anchor = ordered.values("created_at", "id")[depth : depth + 1].get()
+            paginator = self.paginator()
+            cursor = paginator.encode_cursor(
+                ([anchor["created_at"], anchor["id"]], False)
+            ).split("cursor=", 1)[1]
+            seek = paginator.seek_filter([anchor["created_at"], anchor["id"]])
+            self.report(
+                f"GET /posts/ @ row {depth}",
+                lambda: fetch(f"page_size={page_size}&cursor={cursor}"),
+                repeat,
+            )
+            self.report(
+                f"  keyset query @ row {depth}",
+                lambda: list(ordered.filter(seek)[:page_size]),
+                repeat,
+            )
+            self.report(
+                f"  OFFSET query @ row {depth}",
+                lambda: list(ordered[depth : depth + page_size]),
+                max(1, repeat // 10),
+            )
+
+    def seed(self, target, batch_size):
+        existing = Post.objects.count()
+        if existing >= target:
+            return
+        author, _ = User.objects.get_or_create(username="bench_author")
+        self.stdout.write(f"Seeding {target - existing} posts...")
+        remaining = target - existing
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            Post.objects.bulk_create(
+                Post(user=author, content="benchmark post") for _ in range(size)
+            )
+            remaining -= size
+
+    def paginator(self):
+        paginator = PostCursorPagination()
+        paginator.ordering = PostCursorPagination.ordering
+        paginator.fields = [Post._meta.get_field(name) for name in ("created_at", "id")]
+        paginator.base_url = "/posts/"
+        return paginator
+
+    def report(self, label, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{label:<40} median {statistics.median(timings):8.2f} ms"
+            f"   max {max(timings):8.2f} ms"
+        )
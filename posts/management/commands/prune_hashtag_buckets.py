@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.hashtags import BUCKET_RETENTION, prune_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete trending hashtag buckets older than the longest trending "
+        f"window ({BUCKET_RETENTION}); run it periodically, e.g. daily."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} hashtag buckets."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index over Post.content, in one "
+        "transaction with FTS5's 'rebuild' (SQLite) or with REINDEX "
+        "(PostgreSQL)."
+    )
+
+    def handle(self, *args, **options):
+        total = get_search_backend().rebuild(
+            progress=lambda done: self.stdout.write(f"Indexed {done} posts"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt: {total} posts."))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    updates = {}
+    for field, model_name in (
+        ("likes_count", "Like"),
+        ("comments_count", "Comment"),
+        ("shares_count", "Share"),
+    ):
+        related = apps.get_model("interactions", model_name)
+        counts = (
+            related.objects.filter(post=OuterRef("pk"))
+            .values("post")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        updates[field] = Coalesce(Subquery(counts), 0)
+    Post.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_posts_created_at_id_idx'),
+        ('interactions', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='shares_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import FTS_TABLE, install_search_schema
+
+    connection = schema_editor.connection
+    install_search_schema(connection)
+    if connection.vendor == "sqlite":
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    from posts.search import FTS_TABLE
+
+    if schema_editor.connection.vendor == "sqlite":
+        for trigger in ("insert", "delete", "update"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS posts_post_fts_{trigger}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS posts_post_content_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0005_timeline"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
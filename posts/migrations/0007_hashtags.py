@@ -0,0 +1,176 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w{1,100})(?!\w)")
+BUCKET_SECONDS = 300
+CHUNK_SIZE = 2000
+
+
+def backfill_hashtags(apps, schema_editor):
+    # Index existing posts as if each tag was applied when the post was made,
+    # CHUNK_SIZE posts at a time so memory doesn't grow with the table
+    Post = apps.get_model("posts", "Post")
+    posts = Post.objects.filter(is_active=True, visibility="public").order_by("id")
+    last_id = 0
+    while True:
+        chunk = list(
+            posts.filter(id__gt=last_id).values_list("id", "content", "created_at")[
+                :CHUNK_SIZE
+            ]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        index_chunk(apps, chunk)
+
+
+def index_chunk(apps, chunk):
+    Hashtag = apps.get_model("posts", "Hashtag")
+    PostHashtag = apps.get_model("posts", "PostHashtag")
+    HashtagBucket = apps.get_model("posts", "HashtagBucket")
+
+    uses = [
+        (name, post_id, created_at)
+        for post_id, content, created_at in chunk
+        for name in {tag.lower() for tag in HASHTAG_RE.findall(content)}
+    ]
+    if not uses:
+        return
+    names = {name for name, _, _ in uses}
+    Hashtag.objects.bulk_create(
+        (Hashtag(name=name) for name in names), ignore_conflicts=True
+    )
+    tag_ids = dict(Hashtag.objects.filter(name__in=names).values_list("name", "id"))
+    PostHashtag.objects.bulk_create(
+        PostHashtag(hashtag_id=tag_ids[name], post_id=post_id, created_at=created_at)
+        for name, post_id, created_at in uses
+    )
+
+    buckets = Counter()
+    for name, _, created_at in uses:
+        epoch = int(created_at.timestamp())
+        start = created_at.fromtimestamp(
+            epoch - epoch % BUCKET_SECONDS, tz=created_at.tzinfo
+        )
+        buckets[tag_ids[name], start] += 1
+    # Buckets straddling chunks were created by an earlier one: add to those
+    starts = {start for _, start in buckets}
+    existing = set(
+        HashtagBucket.objects.filter(
+            hashtag_id__in=set(tag_ids.values()),
+            bucket_start__gte=min(starts),
+            bucket_start__lte=max(starts),
+        ).values_list("hashtag_id", "bucket_start")
+    )
+    HashtagBucket.objects.bulk_create(
+        HashtagBucket(hashtag_id=tag_id, bucket_start=start, count=count)
+        for (tag_id, start), count in buckets.items()
+        if (tag_id, start) not in existing
+    )
+    for tag_id, start in existing:
+        HashtagBucket.objects.filter(hashtag_id=tag_id, bucket_start=start).update(
+            count=models.F("count") + buckets[tag_id, start]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0006_post_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="HashtagBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="buckets",
+                        to="posts.hashtag",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["bucket_start"], name="posts_hashtag_bucket_idx"
+                    )
+                ],
+                "unique_together": {("hashtag", "bucket_start")},
+            },
+        ),
+        migrations.CreateModel(
+            name="PostHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="post_links",
+                        to="posts.hashtag",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_links",
+                        to="posts.post",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["hashtag", "created_at", "post"],
+                        name="posts_hashtag_page_idx",
+                    )
+                ],
+                "unique_together": {("hashtag", "post")},
+            },
+        ),
+        migrations.RunPython(backfill_hashtags, migrations.RunPython.noop),
+    ]
@@ -19,6 +19,114 @@ class Post(models.Model):
         choices=[("public", "Public"), ("private", "Private")],
         default="public",
     )
+    # Denormalized counters, kept in step by interactions.signals
+    likes_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    shares_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the post list on (created_at, id)
+            models.Index(fields=["created_at", "id"], name="posts_created_at_id_idx"),
+            # Per-author newest-first reads (timeline backfill and read-time merge)
+            models.Index(
+                fields=["user", "created_at", "id"], name="posts_user_created_at_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} on {self.created_at}"
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized into a follower's home timeline (fan-out-on-write).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created_at = models.DateTimeField()  # Copy of post.created_at, the sort key
+
+    class Meta:
+        unique_together = (
+            "user",
+            "post",
+        )
+        indexes = [
+            # A timeline page is one range scan on (user, created_at, post)
+            models.Index(
+                fields=["user", "created_at", "post"], name="posts_timeline_user_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in timeline of {self.user_id}"
+
+
+class Hashtag(models.Model):
+    """
+    A hashtag, stored lowercased and without the leading "#".
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostHashtag(models.Model):
+    """
+    Inverted index entry: a hashtag used in a public, active post.
+    """
+
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="post_links"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="hashtag_links"
+    )
+    created_at = models.DateTimeField()  # When the tag was applied to the post
+
+    class Meta:
+        unique_together = (
+            "hashtag",
+            "post",
+        )
+        indexes = [
+            # A tag page is one range scan on (hashtag, created_at, post)
+            models.Index(
+                fields=["hashtag", "created_at", "post"], name="posts_hashtag_page_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.hashtag_id} on Post {self.post_id}"
+
+
+class HashtagBucket(models.Model):
+    """
+    Number of times a hashtag was applied within one time bucket; summed
+    over recent buckets to rank trending tags without scanning posts.
+    """
+
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="buckets"
+    )
+    bucket_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            "hashtag",
+            "bucket_start",
+        )
+        indexes = [
+            models.Index(fields=["bucket_start"], name="posts_hashtag_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.hashtag_id} x{self.count} from {self.bucket_start}"
@@ -0,0 +1,78 @@
+# posts/pagination.py
+from django.db import models
+
+from core.fieldsets import plan
+from core.pagination import KeysetPagination
+from .models import Post
+from .search import get_search_backend
+from .timeline import read_home_timeline
+
+
+class PostCursorPagination(KeysetPagination):
+    """
+    Newest-first cursor pagination for posts, served by the
+    (created_at, id) index on Post.
+    """
+
+    ordering = ("-created_at", "-id")
+
+
+class TimelinePagination(PostCursorPagination):
+    """
+    Pages the requesting user's home timeline, including posts merged in at
+    read time from high-follower accounts.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_results(self, queryset, position, reverse):
+        columns = None
+        fieldset = getattr(self.view, "get_fieldset", lambda: None)()
+        if fieldset is not None:
+            columns = plan(self.view.get_serializer_class(), fieldset)[0]
+        return read_home_timeline(
+            self.request.user, position, self.page_size + 1, reverse, columns
+        )
+
+
+class PostSearchPagination(KeysetPagination):
+    """
+    Pages search results best match first; positions are (score, post id).
+    """
+
+    ordering = ("score", "id")
+
+    def get_fields(self, queryset):
+        score = models.FloatField()
+        score.set_attributes_from_name("score")
+        return [score, Post._meta.pk]
+
+    def get_results(self, queryset, position, reverse):
+        query = self.request.query_params.get("q", "")
+        ranked = get_search_backend().search(
+            query, position, self.page_size + 1, reverse
+        )
+        posts = queryset.in_bulk([post_id for post_id, _ in ranked])
+        results = []
+        for post_id, score in ranked:
+            if post_id in posts:
+                posts[post_id].score = score
+                results.append(posts[post_id])
+        return results
+
+
+class HashtagPagination(KeysetPagination):
+    """
+    Pages a tag's PostHashtag index entries, newest first, off the
+    (hashtag, created_at, post) index, and returns their posts.
+    """
+
+    ordering = ("-created_at", "-post_id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        links = super().paginate_queryset(queryset, request, view)
+        if links is None:
+            return None
+        return [link.post for link in links]
@@ -0,0 +1,153 @@
+# posts/search.py
+"""
+Full-text search over Post.content.
+
+On SQLite the index is an external-content FTS5 table kept in sync with
+posts_post by triggers and ranked with BM25. On PostgreSQL the same API
+runs against a GIN index on to_tsvector(content), ranked with ts_rank_cd.
+Scores are "lower is better" on both backends so cursors work the same.
+"""
+
+from django.db import connection, transaction
+
+from .models import Post
+
+FTS_TABLE = "posts_post_fts"
+
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete AFTER DELETE ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF content ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+POSTGRES_SCHEMA = [
+    """
+    CREATE INDEX IF NOT EXISTS posts_post_content_search_idx
+    ON posts_post USING GIN (to_tsvector('english', content))
+    """,
+]
+
+
+def install_search_schema(conn=connection):
+    """
+    Create the search index and its triggers if missing.
+
+    Runs from the migration and again after every migrate, because SQLite
+    table rebuilds done by later schema changes drop triggers.
+    """
+    statements = {"sqlite": SQLITE_SCHEMA, "postgresql": POSTGRES_SCHEMA}
+    with conn.cursor() as cursor:
+        for statement in statements.get(conn.vendor, []):
+            cursor.execute(statement)
+
+
+class SQLiteSearchBackend:
+    def search(self, query, position=None, limit=20, reverse=False):
+        """
+        Return ``[(post id, score)]`` for public, active posts matching
+        ``query``, best match first (reversed when paging backwards).
+        """
+        match = to_fts5_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT p.id, bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE} JOIN posts_post p ON p.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s
+              AND p.is_active AND p.visibility = 'public'
+        """
+        return run_ranked(sql, [match], position, limit, reverse)
+
+    def rebuild(self, progress=None):
+        """
+        Reindex every post with FTS5's 'rebuild', in one transaction. The
+        triggers keep firing on post writes, so clearing and refilling the
+        index in steps would race them: a 'delete' for a row not indexed yet
+        corrupts an external-content index, and a post inserted meanwhile
+        would be indexed twice.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            total = Post.objects.count()
+        if progress:
+            progress(total)
+        return total
+
+
+class PostgresSearchBackend:
+    def search(self, query, position=None, limit=20, reverse=False):
+        if not query.strip():
+            return []
+        sql = """
+            SELECT p.id, -ts_rank_cd(to_tsvector('english', p.content), q) AS score
+            FROM posts_post p, websearch_to_tsquery('english', %s) q
+            WHERE to_tsvector('english', p.content) @@ q
+              AND p.is_active AND p.visibility = 'public'
+        """
+        return run_ranked(sql, [query], position, limit, reverse)
+
+    def rebuild(self, progress=None):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX posts_post_content_search_idx")
+        total = Post.objects.count()
+        if progress:
+            progress(total)
+        return total
+
+
+def run_ranked(sql, params, position, limit, reverse):
+    """
+    Wrap a ``SELECT id, score`` query with (score, id) keyset paging.
+    """
+    comparison, direction = (">", "ASC") if not reverse else ("<", "DESC")
+    seek = ""
+    if position is not None:
+        seek = f"WHERE score {comparison}= %s AND (score {comparison} %s OR id {comparison} %s)"
+        params = params + [position[0], position[0], position[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, score FROM ({sql}) ranked {seek} "
+            f"ORDER BY score {direction}, id {direction} LIMIT %s",
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+def to_fts5_query(query):
+    """
+    Turn free text into an FTS5 query that ANDs each word as a literal
+    string, so user input can't inject FTS5 syntax.
+    """
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def get_search_backend():
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+    return SQLiteSearchBackend()
@@ -1,17 +1,48 @@
 # posts/serializers.py
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsMixin
+from core.images import derivative_urls, stored_derivative_urls
+from interactions.buffer import like_buffer
 from .models import Post
-from users.models import CustomUser as User
 
 
-class PostSerializer(serializers.ModelSerializer):
+class ImageDerivativesMixin:
+    """
+    Adds ``image_derivatives``: URLs of the resized copies of ``image``.
+    """
+
+    def get_image_derivatives(self, obj):
+        return derivative_urls(obj.image, self.context.get("request"))
+
+
+class PendingLikesMixin:
+    """
+    Counts likes still held in the write-behind buffer in ``likes_count``.
+    """
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        delta = like_buffer.pending_delta(instance.pk)
+        if delta and "likes_count" in data:
+            data["likes_count"] += delta
+        return data
+
+
+class PostSerializer(
+    SparseFieldsMixin,
+    PendingLikesMixin,
+    ImageDerivativesMixin,
+    serializers.ModelSerializer,
+):
     """
     Serializer for creating and viewing posts.
     """
 
     user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
-    )  # Represent the user as an ID
+        read_only=True
+    )  # Represent the user as an ID; set to the requesting user on create
+    # Rendered in the background after upload, see core.images
+    image_derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -20,27 +51,51 @@ class PostSerializer(serializers.ModelSerializer):
             "user",
             "content",
             "image",
+            "image_derivatives",
             "video",
             "created_at",
             "updated_at",
             "visibility",
             "is_active",
+            "likes_count",
+            "comments_count",
+            "shares_count",
         ]
+        read_only_fields = ["likes_count", "comments_count", "shares_count"]
+        # Columns read by computed fields, for core.fieldsets
+        field_columns = {"image_derivatives": ["image"]}
+
+    @classmethod
+    def fast_converters(cls, context):
+        """
+        The computed fields, from ``.values()`` rows, for core.fastpath.
+        """
+        request = context.get("request")
+        return {
+            "image_derivatives": (
+                ["image"],
+                lambda row: stored_derivative_urls(row["image"], request),
+            ),
+            "likes_count": (
+                ["likes_count"],
+                lambda row: row["likes_count"] + like_buffer.pending_delta(row["id"]),
+            ),
+        }
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(
+    SparseFieldsMixin,
+    PendingLikesMixin,
+    ImageDerivativesMixin,
+    serializers.ModelSerializer,
+):
     """
     Serializer for detailed view of a post (includes comments, likes, etc).
     """
 
     user = serializers.StringRelatedField()  # User's username as a string
     comments = serializers.StringRelatedField(many=True)  # Comments related to the post
-    likes_count = serializers.IntegerField(
-        source="likes.count", read_only=True
-    )  # Number of likes for the post
-    shares_count = serializers.IntegerField(
-        source="shares.count", read_only=True
-    )  # Number of shares for the post
+    image_derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -49,6 +104,7 @@ class PostDetailSerializer(serializers.ModelSerializer):
             "user",
             "content",
             "image",
+            "image_derivatives",
             "video",
             "created_at",
             "updated_at",
@@ -56,5 +112,9 @@ class PostDetailSerializer(serializers.ModelSerializer):
             "is_active",
             "comments",
             "likes_count",
+            "comments_count",
             "shares_count",
         ]
+        # Counters are denormalized columns maintained by interactions.signals
+        read_only_fields = ["likes_count", "comments_count", "shares_count"]
+        field_columns = {"image_derivatives": ["image"]}
@@ -0,0 +1,66 @@
+# posts/signals.py
+from django.db import connections
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from core.images import is_new_upload, schedule_derivatives
+from .cache import invalidate_post
+from .hashtags import remove_links, sync_post_hashtags
+from .models import Post
+from .search import install_search_schema
+
+
+def invalidate_cached_post(sender, instance, created=False, **kwargs):
+    invalidate_post(instance.pk, membership_changed=created)
+
+
+def connect_cache_signals():
+    post_save.connect(
+        invalidate_cached_post, sender=Post, dispatch_uid="invalidate_cached_post_save"
+    )
+    post_delete.connect(
+        invalidate_cached_post,
+        sender=Post,
+        dispatch_uid="invalidate_cached_post_delete",
+    )
+
+
+def index_post_hashtags(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        sync_post_hashtags(instance, created=created)
+
+
+def unindex_post_hashtags(sender, instance, **kwargs):
+    # Runs before the cascade so the links' trending buckets can be decremented
+    remove_links(list(instance.hashtag_links.all()))
+
+
+def connect_hashtag_signals():
+    post_save.connect(
+        index_post_hashtags, sender=Post, dispatch_uid="index_post_hashtags"
+    )
+    pre_delete.connect(
+        unindex_post_hashtags, sender=Post, dispatch_uid="unindex_post_hashtags"
+    )
+
+
+def note_image_upload(sender, instance, **kwargs):
+    instance._image_uploaded = is_new_upload(instance.image)
+
+
+def render_image_derivatives(sender, instance, **kwargs):
+    if getattr(instance, "_image_uploaded", False):
+        schedule_derivatives(instance.image)
+
+
+def connect_image_signals():
+    pre_save.connect(note_image_upload, sender=Post, dispatch_uid="note_post_image")
+    post_save.connect(
+        render_image_derivatives, sender=Post, dispatch_uid="render_post_image"
+    )
+
+
+def ensure_search_schema(sender, using, **kwargs):
+    # SQLite table rebuilds in later migrations drop the FTS triggers
+    connection = connections[using]
+    if Post._meta.db_table in connection.introspection.table_names():
+        install_search_schema(connection)
@@ -1,3 +1,1002 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import images
+from core.fastpath import CompiledSerializer, NotCompilable
+
+from users.models import CustomUser as User, Follow
+from interactions.buffer import like_buffer
+from interactions.models import Like
+from . import cache as post_cache
+from .hashtags import extract_hashtags, trending_hashtags
+from .models import HashtagBucket, Post, PostHashtag, TimelineEntry
+from .pagination import PostCursorPagination
+from .serializers import PostDetailSerializer, PostSerializer
+from .timeline import fan_out_post
+from .views import AsyncPostDetailView, AsyncPostListView
+
+
+class PostListPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="author", password="pass12345")
+        now = timezone.now()
+        posts = Post.objects.bulk_create(
+            Post(user=cls.user, content=f"post {i}") for i in range(45)
+        )
+        # Give every third post the same timestamp to exercise the id tiebreak.
+        for i, post in enumerate(posts):
+            post.created_at = now - timedelta(seconds=i // 3)
+        Post.objects.bulk_update(posts, ["created_at"])
+
+    def setUp(self):
+        cache.clear()
+
+    def _walk(self, url, key="next"):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(post["id"] for post in response.data["results"])
+            url = response.data[key]
+        return ids
+
+    def test_pages_cover_all_posts_in_order_without_duplicates(self):
+        ids = self._walk(reverse("post_list") + "?page_size=10")
+        expected = list(
+            Post.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_previous_cursor_walks_back(self):
+        url = reverse("post_list") + "?page_size=10"
+        first = self.client.get(url).data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(
+            [p["id"] for p in back["results"]], [p["id"] for p in first["results"]]
+        )
+        self.assertIsNone(back["previous"])
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(PostCursorPagination, "max_page_size", 10):
+            response = self.client.get(reverse("post_list") + "?page_size=1000")
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse("post_list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+    def test_deep_page_costs_the_same_queries_as_first_page(self):
+        url = reverse("post_list") + "?page_size=5"
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url)
+        for _ in range(5):
+            response = self.client.get(response.data["next"])
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(response.data["next"])
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(deep), 1)
+        self.assertNotIn("OFFSET", deep.captured_queries[0]["sql"].upper())
+
+
+class PostIndexTests(TestCase):
+    def test_keyset_query_uses_created_at_id_index(self):
+        paginator = PostCursorPagination()
+        paginator.ordering = PostCursorPagination.ordering
+        paginator.fields = [
+            Post._meta.get_field("created_at"),
+            Post._meta.get_field("id"),
+        ]
+        queryset = Post.objects.filter(
+            paginator.seek_filter([timezone.now(), 10])
+        ).order_by("-created_at", "-id")[:20]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("posts_created_at_id_idx", plan)
+
+
+class HomeTimelineTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.followers = [User.objects.create_user(username=f"f{i}") for i in range(5)]
+
+    def follow(self, follower, followee):
+        self.client.force_authenticate(follower)
+        response = self.client.post(reverse("follow_user", args=[followee.id]))
+        self.assertEqual(response.status_code, 200)
+        return response.data["status"]
+
+    def create_post(self, user, **data):
+        self.client.force_authenticate(user)
+        response = self.client.post(
+            reverse("post_create"), {"content": "hi", **data}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def feed_ids(self, user, query=""):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse("home_timeline") + query)
+        self.assertEqual(response.status_code, 200)
+        return [post["id"] for post in response.data["results"]]
+
+    def test_new_post_is_fanned_out_in_batches(self):
+        for follower in self.followers:
+            self.follow(follower, self.author)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 5)
+
+        with mock.patch("posts.timeline.FANOUT_BATCH_SIZE", 2):
+            post_id = self.create_post(self.author)
+
+        self.assertEqual(
+            TimelineEntry.objects.filter(post_id=post_id).count(), 6
+        )  # followers plus the author
+        self.assertEqual(self.feed_ids(self.followers[0]), [post_id])
+        self.assertEqual(self.feed_ids(self.reader), [])
+
+    def test_private_posts_are_not_fanned_out(self):
+        self.follow(self.reader, self.author)
+        self.create_post(self.author, visibility="private")
+        self.assertEqual(self.feed_ids(self.reader), [])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        older = self.create_post(self.author)
+        self.assertEqual(self.follow(self.reader, self.author), "followed")
+        self.assertEqual(self.feed_ids(self.reader), [older])
+        self.assertEqual(self.follow(self.reader, self.author), "unfollowed")
+        self.assertEqual(self.feed_ids(self.reader), [])
+
+    def test_celebrity_posts_are_merged_at_read_time(self):
+        celebrity = User.objects.create_user(username="celebrity")
+        with mock.patch("posts.timeline.CELEBRITY_THRESHOLD", 3):
+            for follower in self.followers:
+                self.follow(follower, celebrity)
+            self.follow(self.reader, celebrity)
+            self.follow(self.reader, self.author)
+            self.assertEqual(
+                set(
+                    Follow.objects.filter(followee_is_celebrity=True).values_list(
+                        "follower", flat=True
+                    )
+                ),
+                {self.reader.pk, *(f.pk for f in self.followers)},
+            )
+            celebrity.refresh_from_db()
+
+            first = self.create_post(celebrity)
+            second = self.create_post(self.author)
+            third = self.create_post(celebrity)
+            self.assertFalse(
+                TimelineEntry.objects.filter(user=self.reader, post_id=first).exists()
+            )
+            self.assertEqual(self.feed_ids(self.reader), [third, second, first])
+
+            page = self.feed_ids(self.reader, "?page_size=2")
+            self.assertEqual(page, [third, second])
+            self.client.force_authenticate(self.reader)
+            first_page = self.client.get(reverse("home_timeline") + "?page_size=2")
+            last_page = self.client.get(first_page.data["next"]).data
+            self.assertEqual([p["id"] for p in last_page["results"]], [first])
+            back = self.client.get(last_page["previous"]).data
+            self.assertEqual([p["id"] for p in back["results"]], [third, second])
+
+            # Dropping back under the threshold unflags every follow
+            for follower in self.followers[:3]:
+                self.follow(follower, celebrity)
+            self.assertFalse(Follow.objects.filter(followee_is_celebrity=True).exists())
+
+    def test_read_cost_does_not_grow_with_follow_count(self):
+        self.follow(self.reader, self.author)
+        self.create_post(self.author)
+        self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse("home_timeline"))
+
+        for user in self.followers:
+            self.follow(self.reader, user)
+            self.create_post(user)
+        self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse("home_timeline"))
+
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(len(few), len(many))
+        # The reader's celebrities are read from the partial index, not by
+        # joining each of their follows to its followee
+        celebrities = next(q["sql"] for q in many if "users_follow" in q["sql"])
+        self.assertNotIn("users_customuser", celebrities)
+        sql, params = (
+            Follow.objects.filter(follower=self.reader, followee_is_celebrity=True)
+            .values_list("followee_id", flat=True)
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("users_follow_celebrity_idx", plan)
+
+
+class PostCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        post_cache.stats.reset()
+        self.author = User.objects.create_user(username="author")
+        self.fan = User.objects.create_user(username="fan")
+        self.post = Post.objects.create(user=self.author, content="original")
+        self.detail_url = reverse("post_detail", args=[self.post.id])
+        self.list_url = reverse("post_list")
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def list_post(self):
+        results = self.get(self.list_url).data["results"]
+        return next(p for p in results if p["id"] == self.post.id)
+
+    def test_repeat_reads_are_hits_without_queries(self):
+        self.assertEqual(self.get(self.detail_url)["X-Cache"], "MISS")
+        self.assertEqual(self.get(self.list_url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.detail_url)["X-Cache"], "HIT")
+            self.assertEqual(self.get(self.list_url)["X-Cache"], "HIT")
+        self.assertEqual(post_cache.stats.snapshot()["hits"], 2)
+        self.assertEqual(post_cache.stats.snapshot()["misses"], 2)
+
+    def test_update_is_never_served_stale(self):
+        self.get(self.detail_url)
+        self.list_post()
+        self.client.force_authenticate(self.author)
+        self.client.patch(self.detail_url, {"content": "edited"}, format="json")
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.get(self.detail_url).data["content"], "edited")
+        self.assertEqual(self.list_post()["content"], "edited")
+
+    def test_interactions_invalidate(self):
+        self.get(self.detail_url)
+        self.list_post()
+        self.client.force_authenticate(self.fan)
+        self.client.post(reverse("like_post", args=[self.post.id]))
+        self.client.post(
+            reverse("comment_post", args=[self.post.id]), {"content": "hi"}
+        )
+        self.client.force_authenticate(None)
+
+        data = self.get(self.detail_url).data
+        self.assertEqual((data["likes_count"], data["comments_count"]), (1, 1))
+        self.assertEqual(self.list_post()["likes_count"], 1)
+
+        Like.objects.get(post=self.post).delete()
+        self.assertEqual(self.get(self.detail_url).data["likes_count"], 0)
+        self.assertEqual(self.list_post()["likes_count"], 0)
+
+    def test_create_and_delete_change_list_pages(self):
+        self.get(self.list_url)
+        newer = Post.objects.create(user=self.author, content="newer")
+        ids = [p["id"] for p in self.get(self.list_url).data["results"]]
+        self.assertEqual(ids, [newer.id, self.post.id])
+
+        self.get(self.detail_url)
+        self.post.delete()
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+        ids = [p["id"] for p in self.get(self.list_url).data["results"]]
+        self.assertEqual(ids, [newer.id])
+
+    def test_page_rendered_during_a_write_is_not_stored(self):
+        def render_while_writing(view, request, *args, **kwargs):
+            # Simulate another request invalidating the post mid-render.
+            post_cache.invalidate_post(self.post.id)
+            return mock.Mock(data={"results": [{"id": self.post.id}]})
+
+        with mock.patch(
+            "core.fastpath.FastListMixin.list",
+            autospec=True,
+            side_effect=render_while_writing,
+        ):
+            self.get(self.list_url)
+        self.assertEqual(self.get(self.list_url)["X-Cache"], "MISS")
+
+    def test_writes_to_other_posts_do_not_stop_pages_being_stored(self):
+        other = Post.objects.create(user=self.fan, content="other")
+        page = [{"id": self.post.id}]
+
+        def render_while_writing(view, request, *args, **kwargs):
+            post_cache.invalidate_post(other.id)
+            return mock.Mock(data={"results": page})
+
+        with mock.patch(
+            "core.fastpath.FastListMixin.list",
+            autospec=True,
+            side_effect=render_while_writing,
+        ):
+            response = self.client.get(self.list_url, {"page_size": 1})
+        self.assertIsNotNone(response.get("ETag"))
+        response = self.client.get(self.list_url, {"page_size": 1})
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["results"], page)
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.fan = User.objects.create_user(username="fan")
+        self.post = Post.objects.create(user=self.author, content="original")
+        self.detail_url = reverse("post_detail", args=[self.post.id])
+        self.list_url = reverse("post_list")
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def urls(self):
+        return [self.detail_url, self.list_url, self.detail_url + "?fields=content"]
+
+    def test_unchanged_post_and_page_are_not_modified(self):
+        for url in (self.detail_url, self.list_url):
+            response = self.client.get(url)
+            self.assertIn("no-cache", response["Cache-Control"])
+            with self.assertNumQueries(0):
+                response = self.revalidate(url, response["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+            self.assertIn("ETag", response)
+
+        # Without a cached page only the page's ids are read, nothing rendered
+        with mock.patch(
+            "posts.views.cached_post_list_ids", return_value=None
+        ), mock.patch("core.fastpath.FastListMixin.list", side_effect=AssertionError):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.revalidate(self.list_url, response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("content", queries[0]["sql"])
+
+    def test_edits_likes_and_comments_change_the_validators(self):
+        def edit():
+            self.client.force_authenticate(self.author)
+            self.client.patch(self.detail_url, {"content": "edited"}, format="json")
+
+        def like():
+            self.client.force_authenticate(self.fan)
+            self.client.post(reverse("like_post", args=[self.post.id]))
+
+        def comment():
+            self.client.force_authenticate(self.fan)
+            self.client.post(
+                reverse("comment_post", args=[self.post.id]), {"content": "hi"}
+            )
+
+        etags = {url: self.client.get(url)["ETag"] for url in self.urls()}
+        for change in (edit, like, comment):
+            change()
+            self.client.force_authenticate(None)
+            for url, etag in etags.items():
+                response = self.revalidate(url, etag)
+                self.assertEqual(response.status_code, 200, (change, url))
+                self.assertNotEqual(response["ETag"], etag)
+                etags[url] = response["ETag"]
+
+    @override_settings(LIKE_WRITE_BEHIND=True)
+    def test_buffered_like_changes_the_etag_before_the_flush(self):
+        patcher = mock.patch.object(like_buffer, "interval", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(like_buffer.clear)
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.client.force_authenticate(self.fan)
+        self.client.post(reverse("like_post", args=[self.post.id]))
+        response = self.revalidate(self.detail_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["likes_count"], 1)
+
+    def test_if_modified_since(self):
+        Post.objects.filter(pk=self.post.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        response = self.client.get(self.detail_url)
+        last_modified = response["Last-Modified"]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+            )
+        self.assertEqual(response.status_code, 304)
+
+        self.client.force_authenticate(self.fan)
+        self.client.post(
+            reverse("comment_post", args=[self.post.id]), {"content": "hi"}
+        )
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["Last-Modified"], last_modified)
+
+        # If-None-Match takes precedence over If-Modified-Since
+        response = self.client.get(
+            self.detail_url,
+            HTTP_IF_NONE_MATCH='"stale"',
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_viewer_state_pages_have_per_viewer_etags(self):
+        url = self.list_url + "?viewer_state=1"
+        self.client.force_authenticate(self.fan)
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    async def test_async_views(self):
+        factory = AsyncRequestFactory()
+        for view, url, kwargs in (
+            (AsyncPostDetailView, self.detail_url, {"pk": self.post.pk}),
+            (AsyncPostListView, self.list_url, {}),
+        ):
+            response = await view.as_view()(factory.get(url), **kwargs)
+            etag = response["ETag"]
+            request = factory.get(url, headers={"If-None-Match": etag})
+            response = await view.as_view()(request, **kwargs)
+            self.assertEqual(response.status_code, 304)
+            sync = await sync_to_async(self.revalidate)(url, etag)
+            self.assertEqual(sync.status_code, 304)
+
+
+class PostSearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="searcher")
+
+    def create(self, content, **fields):
+        return Post.objects.create(user=self.user, content=content, **fields)
+
+    def ids(self, query):
+        response = self.client.get(reverse("post_search"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [post["id"] for post in response.data["results"]]
+
+    def test_results_are_ranked_and_filtered(self):
+        strong = self.create("django django django tips")
+        weak = self.create("a long post that mentions django once among many words")
+        self.create("django but private", visibility="private")
+        self.create("django but hidden", is_active=False)
+        self.create("nothing relevant")
+        self.assertEqual(self.ids("django"), [strong.id, weak.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        post = self.create("original words")
+        self.assertEqual(self.ids("original"), [post.id])
+        post.content = "replacement words"
+        post.save()
+        self.assertEqual(self.ids("original"), [])
+        self.assertEqual(self.ids("replacement"), [post.id])
+        Post.objects.filter(pk=post.pk).update(content="bulk edited")
+        self.assertEqual(self.ids("bulk"), [post.id])
+        post.delete()
+        self.assertEqual(self.ids("bulk"), [])
+
+    def test_cursor_pagination(self):
+        posts = [self.create("same text") for _ in range(5)]
+        first = self.client.get(reverse("post_search"), {"q": "same", "page_size": 2})
+        ids = [p["id"] for p in first.data["results"]]
+        url = first.data["next"]
+        while url:
+            page = self.client.get(url).data
+            ids.extend(p["id"] for p in page["results"])
+            url = page["next"]
+        self.assertEqual(sorted(ids), [post.id for post in posts])
+        self.assertEqual(len(set(ids)), 5)
+
+    def test_query_syntax_is_treated_as_text(self):
+        post = self.create('quoted "phrase" AND NEAR stuff')
+        self.assertEqual(self.ids('"phrase" AND'), [post.id])
+        self.assertEqual(self.ids("NEAR("), [post.id])
+        self.assertEqual(self.ids("missing)*"), [])
+        self.assertEqual(self.ids(""), [])
+
+    def test_rebuild_command_reindexes(self):
+        posts = [self.create(f"rebuild {i}") for i in range(5)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('delete-all')"
+            )
+        self.assertEqual(self.ids("rebuild"), [])
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("5 posts", out.getvalue())
+        self.assertEqual(sorted(self.ids("rebuild")), [p.id for p in posts])
+
+        # Indexed rows are replaced, not added to
+        call_command("rebuild_search_index", stdout=StringIO())
+        posts[0].content = "edited"
+        posts[0].save()
+        self.assertEqual(sorted(self.ids("rebuild")), [p.id for p in posts[1:]])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('integrity-check')"
+            )
+
+
+class HashtagTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="tagger")
+
+    def create(self, content, **fields):
+        return Post.objects.create(user=self.user, content=content, **fields)
+
+    def tags_of(self, post):
+        return set(
+            PostHashtag.objects.filter(post=post).values_list(
+                "hashtag__name", flat=True
+            )
+        )
+
+    def test_extraction(self):
+        self.assertEqual(
+            extract_hashtags("#Django and #django_rest, not a#b or ##x. #42!"),
+            {"django", "django_rest", "42"},
+        )
+        longest = "t" * 100
+        self.assertEqual(
+            extract_hashtags(f"#{longest} #{longest}x #ok"), {longest, "ok"}
+        )
+
+    def test_edits_and_deletes_update_index_and_buckets(self):
+        post = self.create("hello #one #two")
+        self.assertEqual(self.tags_of(post), {"one", "two"})
+        post.content = "hello #two #three"
+        post.save()
+        self.assertEqual(self.tags_of(post), {"two", "three"})
+        self.assertEqual(dict(trending_hashtags("hour")), {"two": 1, "three": 1})
+        post.visibility = "private"
+        post.save()
+        self.assertEqual(self.tags_of(post), set())
+        post.visibility = "public"
+        post.save()
+        post.delete()
+        self.assertFalse(PostHashtag.objects.exists())
+        self.assertEqual(trending_hashtags("day"), [])
+
+    def test_unchanged_tags_only_read_the_index(self):
+        post = self.create("#steady")
+        # The UPDATE itself plus one read of the post's index entries
+        with self.assertNumQueries(2):
+            post.save(update_fields=["content"])
+
+    def test_trending_windows_and_limit(self):
+        for _ in range(3):
+            self.create("#hot")
+        self.create("#warm")
+        old = self.create("#stale #hot")
+        HashtagBucket.objects.filter(hashtag__name="stale").update(
+            bucket_start=timezone.now() - timedelta(hours=5)
+        )
+
+        response = self.client.get(reverse("trending_tags"), {"limit": 1})
+        self.assertEqual(response.data["results"], [{"tag": "hot", "uses": 4}])
+        hour = dict(trending_hashtags("hour"))
+        self.assertNotIn("stale", hour)
+        self.assertEqual(dict(trending_hashtags("day"))["stale"], 1)
+        old.delete()
+        self.assertNotIn("stale", dict(trending_hashtags("day")))
+        response = self.client.get(reverse("trending_tags"), {"window": "year"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_buckets_past_the_longest_window_are_pruned(self):
+        old = self.create("#old #kept")
+        self.create("#kept")
+        HashtagBucket.objects.filter(hashtag__name="old").update(
+            bucket_start=timezone.now() - timedelta(days=2)
+        )
+        out = StringIO()
+        call_command("prune_hashtag_buckets", stdout=out)
+        self.assertIn("Deleted 1 hashtag buckets", out.getvalue())
+        self.assertEqual(dict(trending_hashtags("day")), {"kept": 2})
+
+        # Removing the old use doesn't bring its pruned bucket back
+        PostHashtag.objects.filter(post=old, hashtag__name="old").update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        old.delete()
+        self.assertFalse(HashtagBucket.objects.filter(hashtag__name="old").exists())
+        self.assertEqual(dict(trending_hashtags("day")), {"kept": 1})
+
+    def test_tag_page_is_cursor_paginated(self):
+        posts = [self.create(f"#Paged post {i}") for i in range(5)]
+        self.create("#other")
+        self.create("#paged but private", visibility="private")
+        url = reverse("hashtag_posts", args=["PAGED"]) + "?page_size=2"
+        ids = []
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).data
+            ids.extend(post["id"] for post in page["results"])
+            url = page["next"]
+        self.assertEqual(ids, [post.id for post in reversed(posts)])
+
+
+def make_upload(name="photo.png", size=(1200, 900), mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128)[: len(mode)]).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageDerivativeTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="photographer")
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client.force_authenticate(self.user)
+
+    def test_upload_renders_derivatives_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("post_create"),
+                {"content": "with a picture", "image": make_upload()},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 201)
+        urls = response.data["image_derivatives"]
+        self.assertEqual(set(urls), {"thumb", "thumb_webp", "medium", "medium_webp"})
+        # Same stem, different format: separate derivatives
+        self.assertNotEqual(
+            images.derivative_names("post_images/a.png")["thumb"],
+            images.derivative_names("post_images/a.jpg")["thumb"],
+        )
+
+        post = Post.objects.get(pk=response.data["id"])
+        names = images.derivative_names(post.image.name)
+        self.assertTrue(urls["thumb"].endswith(default_storage.url(names["thumb"])))
+        with default_storage.open(names["thumb"]) as thumb:
+            self.assertEqual(Image.open(thumb).size, (150, 113))
+        with default_storage.open(names["medium_webp"]) as medium:
+            image = Image.open(medium)
+            self.assertEqual((image.format, image.size), ("WEBP", (800, 600)))
+
+    def test_posts_without_images_have_no_derivatives(self):
+        post = Post.objects.create(user=self.user, content="text only")
+        response = self.client.get(reverse("post_detail", args=[post.pk]))
+        self.assertIsNone(response.data["image_derivatives"])
+
+    def test_upload_never_waits_for_the_pool(self):
+        with override_settings(IMAGE_DERIVATIVE_WORKERS=2), mock.patch.object(
+            images, "get_executor"
+        ) as get_executor, mock.patch.object(images, "render_derivatives") as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.create(user=self.user, content="x", image=make_upload())
+            render.assert_not_called()
+            get_executor.return_value.submit.assert_called_once()
+
+            # A full pool queues the job rather than blocking the upload
+            self.addCleanup(images._backlog.clear)
+            with mock.patch.object(images, "_slots") as slots:
+                slots.acquire.return_value = False
+                with self.captureOnCommitCallbacks(execute=True):
+                    Post.objects.create(
+                        user=self.user, content="y", image=make_upload()
+                    )
+            get_executor.return_value.submit.assert_called_once()
+            self.assertEqual(len(images._backlog), 1)
+
+            # It takes over the slot of the next job to finish
+            done = mock.Mock(**{"exception.return_value": None})
+            executor = get_executor.return_value
+            with mock.patch.object(images, "_slots") as slots:
+                images._finished("post_images/x.png", executor, done)
+                slots.release.assert_not_called()
+                self.assertEqual(get_executor.return_value.submit.call_count, 2)
+                images._finished("post_images/y.png", executor, done)
+                slots.release.assert_called_once()
+
+    def test_broken_pool_is_replaced_without_failing_the_upload(self):
+        broken = mock.Mock(**{"submit.side_effect": BrokenProcessPool("died")})
+        working = mock.Mock()
+        self.addCleanup(setattr, images, "_executor", None)
+        self.addCleanup(images._backlog.clear)
+        images._executor = broken
+        with override_settings(IMAGE_DERIVATIVE_WORKERS=2), mock.patch.object(
+            images, "ProcessPoolExecutor", return_value=working
+        ), mock.patch.object(images, "_slots") as slots:
+            images._backlog.append("post_images/queued.png")
+            with self.assertLogs("core.images", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Post.objects.create(
+                        user=self.user, content="x", image=make_upload()
+                    )
+            broken.shutdown.assert_called_once()
+            # The slot went to the queued job, which got a new pool
+            working.submit.assert_called_once()
+            slots.release.assert_not_called()
+
+            # A worker dying mid-job discards its pool too, and frees the slot
+            died = mock.Mock(**{"exception.return_value": BrokenProcessPool("died")})
+            with self.assertLogs("core.images", "ERROR"):
+                images._finished("post_images/queued.png", working, died)
+            working.shutdown.assert_called_once()
+            self.assertIsNone(images._executor)
+            slots.release.assert_called_once()
+
+    def test_backfill_command_renders_missing_derivatives(self):
+        # Saved without the signal's render, like media from before the pipeline
+        with self.captureOnCommitCallbacks(execute=False):
+            post = Post.objects.create(
+                user=self.user, content="old", image=make_upload()
+            )
+        self.assertFalse(images.has_derivatives(post.image.name))
+
+        out = StringIO()
+        call_command("build_image_derivatives", workers=2, stdout=out)
+        self.assertIn("1 rendered", out.getvalue())
+        self.assertTrue(images.has_derivatives(post.image.name))
+
+        call_command("build_image_derivatives", stdout=out)
+        self.assertIn("0 rendered", out.getvalue())
+
+
+class AsyncPostViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="async_author")
+        posts = Post.objects.bulk_create(
+            Post(user=cls.user, content=f"async {i}") for i in range(7)
+        )
+        Like.objects.create(post=posts[0], user=cls.user)
+        cls.post = posts[0]
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.token = f"Bearer {AccessToken.for_user(self.user)}"
+
+    async def call(self, view, path, method="get", **kwargs):
+        request = getattr(self.factory, method)(
+            path, headers={"Authorization": self.token}
+        )
+        return await view.as_view()(request, **kwargs)
+
+    async def test_list_pages_match_the_sync_view(self):
+        url = reverse("post_list") + "?page_size=3&viewer_state=1"
+        while url:
+            sync = await sync_to_async(self.client.get)(
+                url, HTTP_AUTHORIZATION=self.token
+            )
+            cache.clear()
+            response = await self.call(AsyncPostListView, url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), sync.json())
+            url = sync.json()["next"]
+
+    async def test_detail_matches_sync_and_is_cached(self):
+        url = reverse("post_detail", args=[self.post.pk])
+        sync = await sync_to_async(self.client.get)(url)
+        cache.clear()
+        response = await self.call(AsyncPostDetailView, url, pk=self.post.pk)
+        self.assertEqual(json.loads(response.content), sync.json())
+        self.assertEqual(response["X-Cache"], "MISS")
+        response = await self.call(AsyncPostDetailView, url, pk=self.post.pk)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        missing = await self.call(AsyncPostDetailView, url, pk=999_999)
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_writes_are_delegated_to_the_sync_view(self):
+        request = self.factory.post(
+            reverse("post_list"),
+            {"content": "via async route"},
+            content_type="application/json",
+            headers={"Authorization": self.token},
+        )
+        response = await AsyncPostListView.as_view()(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Post.objects.filter(content="via async route").aexists())
+
+        request = self.factory.post(
+            reverse("post_list"), {"content": "x"}, content_type="application/json"
+        )
+        response = await AsyncPostListView.as_view()(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_bad_token_is_rejected(self):
+        self.token = "Bearer not-a-token"
+        response = await self.call(AsyncPostListView, reverse("post_list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+
+class SparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        Follow.objects.create(follower=cls.reader, followee=cls.author)
+        cls.posts = [
+            Post.objects.create(user=cls.author, content=f"#sparse post {i}")
+            for i in range(5)
+        ]
+        for post in cls.posts:
+            fan_out_post(post)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        post_queries = [q["sql"] for q in queries if '"posts_post"' in q["sql"]]
+        return response, post_queries
+
+    def test_list_reads_only_the_requested_columns(self):
+        response, queries = self.get(
+            reverse("post_list"), fields="created_at,likes_count", page_size=2
+        )
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "created_at", "likes_count"}
+        )
+        self.assertNotIn('"posts_post"."content"', queries[0])
+        # The cursor still works off the ordering columns, in one query
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_exclude(self):
+        response, queries = self.get(reverse("post_list"), exclude="content,image")
+        first = response.data["results"][0]
+        self.assertNotIn("content", first)
+        self.assertIn("image_derivatives", first)
+        self.assertNotIn('"posts_post"."content"', queries[0])
+        self.assertIn('"posts_post"."image"', queries[0])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse("post_list"), {"fields": "id,secret"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("fields", response.data)
+
+    def test_detail_variants_are_cached_separately(self):
+        url = reverse("post_detail", args=[self.posts[0].pk])
+        full = self.client.get(url).data
+        narrow, queries = self.get(url, fields="content")
+        self.assertEqual(narrow.data, {"id": full["id"], "content": full["content"]})
+        self.assertEqual(narrow["X-Cache"], "MISS")
+        self.assertNotIn('"posts_post"."likes_count"', queries[0])
+        self.assertEqual(self.client.get(url).data, full)
+
+    def test_timeline_and_hashtag_pages(self):
+        self.client.force_authenticate(self.reader)
+        for url in (
+            reverse("home_timeline"),
+            reverse("hashtag_posts", args=["sparse"]),
+        ):
+            response, queries = self.get(url, fields="created_at")
+            self.assertEqual(len(response.data["results"]), 5)
+            self.assertEqual(set(response.data["results"][0]), {"id", "created_at"})
+            self.assertTrue(queries)
+            for sql in queries:
+                self.assertNotIn('"posts_post"."content"', sql)
+
+    def test_writes_ignore_fieldsets(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            reverse("post_list") + "?fields=id", {"content": "kept"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["content"], "kept")
+
+    async def test_async_views_match_the_sync_ones(self):
+        factory = AsyncRequestFactory()
+        for view, url, kwargs in (
+            (AsyncPostListView, reverse("post_list") + "?fields=id,user", {}),
+            (
+                AsyncPostDetailView,
+                reverse("post_detail", args=[self.posts[0].pk]) + "?exclude=content",
+                {"pk": self.posts[0].pk},
+            ),
+        ):
+            sync = await sync_to_async(self.client.get)(url)
+            cache.clear()
+            response = await view.as_view()(factory.get(url), **kwargs)
+            self.assertEqual(json.loads(response.content), sync.json())
+
+
+class FastSerializerParityTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        Post.objects.create(user=cls.author, content="plain")
+        Post.objects.create(
+            user=cls.author,
+            content='Ünïcode, "quotes" and </script>',
+            image="post_images/photo.jpg",
+            video="post_videos/clip.mp4",
+            visibility="private",
+            is_active=False,
+            likes_count=3,
+        )
+        Post.objects.create(user=cls.author, content="", image="", video=None)
+
+    def setUp(self):
+        cache.clear()
+
+    def render_both(self, fields=None, request=None):
+        context = {"fields": fields}
+        if request is not None:
+            context["request"] = request
+        posts = Post.objects.order_by("id")
+        compiled = CompiledSerializer(PostSerializer, fields, context)
+        return (
+            JSONRenderer().render(
+                PostSerializer(posts, many=True, context=context).data
+            ),
+            JSONRenderer().render(compiled.many(posts.values(*compiled.columns))),
+        )
+
+    def test_output_is_byte_identical(self):
+        request = Request(APIRequestFactory().get("/"))
+        pending = {Post.objects.get(content="plain").pk: 2}
+        with mock.patch.object(
+            like_buffer, "pending_delta", side_effect=lambda pk: pending.get(pk, 0)
+        ):
+            for fields in (None, ["id", "created_at"], ["likes_count", "video"]):
+                for context_request in (None, request):
+                    drf, fast = self.render_both(fields, context_request)
+                    self.assertEqual(fast, drf)
+
+    @override_settings(TIME_ZONE="Asia/Kolkata")
+    def test_timestamps_match_in_other_timezones(self):
+        with timezone.override("Asia/Kolkata"):
+            drf, fast = self.render_both()
+        self.assertEqual(fast, drf)
+        self.assertIn(b"+05:30", fast)
+
+    def test_list_responses_match_the_serializer(self):
+        url = reverse("post_list") + "?page_size=2"
+        while url:
+            fast = self.client.get(url)
+            cache.clear()
+            with override_settings(FAST_SERIALIZERS=False):
+                drf = self.client.get(url)
+            cache.clear()
+            self.assertEqual(fast.content, drf.content)
+            url = drf.data["next"]
+
+    def test_related_fields_are_not_compiled(self):
+        with self.assertRaises(NotCompilable):
+            CompiledSerializer(PostDetailSerializer)
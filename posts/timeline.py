@@ -0,0 +1,174 @@
+# posts/timeline.py
+"""
+Home timelines, materialized with fan-out-on-write.
+
+Creating a post copies a TimelineEntry into each follower's timeline in
+batches, so reading a timeline is one range scan on
+(user, created_at, post) however many accounts the reader follows.
+Authors with more than TIMELINE_CELEBRITY_THRESHOLD followers are not
+fanned out; their posts are merged in when a follower reads. Follows of
+them are flagged, so a reader's celebrities are a range of a partial index
+however many other accounts they follow.
+"""
+
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+
+from core.pagination import flip_ordering, keyset_filter
+from users.models import CustomUser, Follow
+from .models import Post, TimelineEntry
+
+FANOUT_BATCH_SIZE = getattr(settings, "TIMELINE_FANOUT_BATCH_SIZE", 1000)
+CELEBRITY_THRESHOLD = getattr(settings, "TIMELINE_CELEBRITY_THRESHOLD", 10_000)
+BACKFILL_SIZE = getattr(settings, "TIMELINE_BACKFILL_SIZE", 100)
+
+ENTRY_ORDERING = ("-created_at", "-post_id")
+POST_ORDERING = ("-created_at", "-id")
+
+
+def is_timeline_visible(post):
+    return post.is_active and post.visibility == "public"
+
+
+def is_celebrity(user):
+    return user.followers_count > CELEBRITY_THRESHOLD
+
+
+def flag_celebrity_follows(follow, change):
+    """
+    Bring Follow.followee_is_celebrity in line after the followee's
+    followers_count changed by ``change`` through ``follow``. All of the
+    followee's follows are rewritten only when the count crosses the
+    threshold; otherwise only a new follow of a celebrity is flagged.
+    """
+    count = (
+        CustomUser.objects.filter(pk=follow.followee_id)
+        .values_list("followers_count", flat=True)
+        .first()
+    )
+    if count is None:
+        return
+    celebrity = count > CELEBRITY_THRESHOLD
+    if celebrity != (count - change > CELEBRITY_THRESHOLD):
+        Follow.objects.filter(followee_id=follow.followee_id).update(
+            followee_is_celebrity=celebrity
+        )
+    elif celebrity and change > 0:
+        Follow.objects.filter(pk=follow.pk).update(followee_is_celebrity=True)
+
+
+def fan_out_post(post):
+    """
+    Push a new post into its author's and followers' timelines.
+
+    Followers are walked by Follow id in FANOUT_BATCH_SIZE batches and each
+    batch is one bulk INSERT, so the write lock is only held per batch.
+    """
+    if not is_timeline_visible(post):
+        return
+    _insert_entries(post, [post.user_id])
+    if is_celebrity(post.user):
+        return
+
+    last_id = 0
+    while True:
+        batch = list(
+            Follow.objects.filter(followee_id=post.user_id, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "follower_id")[:FANOUT_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        _insert_entries(post, [follower_id for _, follower_id in batch])
+
+
+def _insert_entries(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, created_at=post.created_at)
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(follower, followee):
+    """
+    Copy the followee's most recent posts into a new follower's timeline.
+    """
+    if is_celebrity(followee):
+        return
+    recent = (
+        Post.objects.filter(user=followee, is_active=True, visibility="public")
+        .order_by(*POST_ORDERING)
+        .values_list("id", "created_at")[:BACKFILL_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user=follower, post_id=post_id, created_at=created_at)
+            for post_id, created_at in recent
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_from_timeline(follower, followee):
+    TimelineEntry.objects.filter(user=follower, post__user=followee).delete()
+
+
+def read_home_timeline(user, position=None, limit=20, reverse=False, columns=None):
+    """
+    Return up to ``limit`` posts from ``user``'s home timeline following
+    ``position`` (a ``[created_at, post id]`` pair), newest first, or oldest
+    first when ``reverse`` is set. ``columns`` restricts the Post columns
+    loaded (the ordering ones are always loaded).
+    """
+    entry_ordering, post_ordering = ENTRY_ORDERING, POST_ORDERING
+    if reverse:
+        entry_ordering = [flip_ordering(term) for term in entry_ordering]
+        post_ordering = [flip_ordering(term) for term in post_ordering]
+
+    entries = TimelineEntry.objects.filter(
+        user=user, post__is_active=True, post__visibility="public"
+    )
+    if position is not None:
+        entries = entries.filter(keyset_filter(ENTRY_ORDERING, position, reverse))
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "id", "created_at"]))
+        entries = entries.only(
+            "created_at", "post", *(f"post__{column}" for column in columns)
+        )
+    posts = [
+        entry.post
+        for entry in entries.select_related("post").order_by(*entry_ordering)[:limit]
+    ]
+
+    celebrity_ids = list(
+        Follow.objects.filter(follower=user, followee_is_celebrity=True).values_list(
+            "followee_id", flat=True
+        )
+    )
+    if not celebrity_ids:
+        return posts
+
+    merged_in = Post.objects.filter(
+        user_id__in=celebrity_ids, is_active=True, visibility="public"
+    )
+    if position is not None:
+        merged_in = merged_in.filter(keyset_filter(POST_ORDERING, position, reverse))
+    if columns is not None:
+        merged_in = merged_in.only(*columns)
+    merged_in = list(merged_in.order_by(*post_ordering)[:limit])
+
+    seen = set()
+    combined = merge(
+        posts,
+        merged_in,
+        key=lambda post: (post.created_at, post.id),
+        reverse=not reverse,
+    )
+    unique = (post for post in combined if not (post.id in seen or seen.add(post.id)))
+    return list(islice(unique, limit))
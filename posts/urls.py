@@ -1,21 +1,45 @@
 from django.urls import path
+from core.views import select_view
 from .views import (
+    AsyncPostDetailView,
+    AsyncPostListView,
     PostListView,
     PostDetailView,
     PostCreateView,
     PostUpdateView,
     PostDeleteView,
+    HomeTimelineView,
+    PostCacheStatsView,
+    PostSearchView,
+    HashtagPostsView,
+    TrendingHashtagsView,
 )
 
 urlpatterns = [
     # List all posts
-    path("", PostListView.as_view(), name="post_list"),
+    path(
+        "", select_view("post_list", PostListView, AsyncPostListView), name="post_list"
+    ),
+    # The authenticated user's home timeline
+    path("feed/", HomeTimelineView.as_view(), name="home_timeline"),
+    # Full-text search
+    path("search/", PostSearchView.as_view(), name="post_search"),
+    # Trending hashtags over the last hour or day
+    path("tags/trending/", TrendingHashtagsView.as_view(), name="trending_tags"),
+    # Posts using a hashtag
+    path("tags/<str:name>/", HashtagPostsView.as_view(), name="hashtag_posts"),
     # Create a new post
     path("create/", PostCreateView.as_view(), name="post_create"),
     # Retrieve a specific post by ID
-    path("<int:pk>/", PostDetailView.as_view(), name="post_detail"),
+    path(
+        "<int:pk>/",
+        select_view("post_detail", PostDetailView, AsyncPostDetailView),
+        name="post_detail",
+    ),
     # Update a specific post by ID
     path("<int:pk>/update/", PostUpdateView.as_view(), name="post_update"),
     # Delete a specific post by ID
     path("<int:pk>/delete/", PostDeleteView.as_view(), name="post_delete"),
+    # Post cache hit/miss counters (admin)
+    path("cache-stats/", PostCacheStatsView.as_view(), name="post_cache_stats"),
 ]
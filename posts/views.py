@@ -1,33 +1,278 @@
-from rest_framework import generics
-from .models import Post
-from .serializers import PostSerializer
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import (
+    IsAdminUser,
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.views import APIView
+
+from core.conditional import (
+    add_validators,
+    checks_modified_since,
+    conditional_response,
+)
+from core.fastpath import FastListMixin, compile_serializer, values_for
+from core.fieldsets import SparseFieldsetViewMixin, project, requested_fields
+from core.views import AsyncAPIView, delegate_to_sync
+from interactions.viewer import viewer_state
+from users.authentication import StatelessReadJWTAuthentication
+from .cache import (
+    acached_post_detail,
+    acached_post_list,
+    cached_post_detail,
+    cached_post_list,
+    cached_post_list_ids,
+    post_etag,
+    post_list_etag,
+    stats as cache_stats,
+    write_clock,
+)
+from .hashtags import TRENDING_WINDOWS, trending_hashtags
+from .models import Post, PostHashtag
+from .pagination import (
+    HashtagPagination,
+    PostCursorPagination,
+    PostSearchPagination,
+    TimelinePagination,
+)
+from .serializers import PostSerializer
+from .timeline import fan_out_post
 
 
-class PostListView(generics.ListCreateAPIView):
+def with_viewer_state(data, states):
     """
-    List all posts or create a new post
+    Add each post's ``viewer`` flags to a cached list page.
+    """
+    return {
+        **data,
+        "results": [{**post, "viewer": states[post["id"]]} for post in data["results"]],
+    }
+
+
+def fieldset_variant(request, fieldset):
+    # Cache variant of a post rendered with ``fieldset`` for ``request``
+    if fieldset is None:
+        return request.get_host()
+    return f"{request.get_host()}:{','.join(fieldset)}"
+
+
+def list_etag_variant(request, variant):
+    # Pages with viewer flags differ per viewer, so do their ETags
+    if request.query_params.get("viewer_state") in ("1", "true"):
+        return f"{variant}:{request.user.pk}"
+    return variant
+
+
+def id_rows(queryset, paginator):
+    """
+    ``queryset`` as ``.values()`` rows of just the ids and the columns
+    ``paginator`` orders by, to find the posts on a page without loading
+    them.
+    """
+    ordering = [term.lstrip("-") for term in paginator.ordering]
+    return queryset.values(*dict.fromkeys(["id", *ordering]))
+
+
+def last_modified(data):
+    # A rendered post's Last-Modified time, unless the fieldset left it out
+    value = data.get("updated_at")
+    return parse_datetime(value) if value else None
+
+
+class PostListView(FastListMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    """
+    List all posts (newest first, cursor paginated) or create a new post
     """
 
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    authentication_classes = [StatelessReadJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PostCursorPagination
+    fieldset_required = ("created_at",)  # The pagination ordering
+
+    def list(self, request, *args, **kwargs):
+        variant = request.build_absolute_uri()
+        etag_variant = list_etag_variant(request, variant)
+        if "HTTP_IF_NONE_MATCH" in request.META:
+            # Revalidation costs at most the page's ids, never a render
+            post_ids = cached_post_list_ids(variant)
+            if post_ids is None:
+                paginator = self.pagination_class()
+                rows = paginator.paginate_queryset(
+                    id_rows(self.get_queryset(), paginator), request, self
+                )
+                post_ids = [row["id"] for row in rows]
+            response = conditional_response(
+                request, post_list_etag(etag_variant, post_ids)
+            )
+            if response is not None:
+                return response
+
+        # Pages are served from posts.cache and invalidated by model signals
+        clock = write_clock()
+        data, hit = cached_post_list(
+            variant,
+            lambda: super(PostListView, self).list(request, *args, **kwargs).data,
+        )
+        post_ids = [post["id"] for post in data["results"]]
+        if request.query_params.get("viewer_state") in ("1", "true"):
+            # Per-viewer flags are added after the shared cached page
+            data = with_viewer_state(data, viewer_state(request.user, post_ids))
+        return add_validators(
+            Response(data, headers={"X-Cache": "HIT" if hit else "MISS"}),
+            post_list_etag(etag_variant, post_ids, clock),
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(user=self.request.user)
+        fan_out_post(post)
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PostDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a specific post
     """
 
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    authentication_classes = [StatelessReadJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def retrieve(self, request, *args, **kwargs):
+        variant = fieldset_variant(request, self.get_fieldset())
+        etag = post_etag(kwargs["pk"], variant)
+        modified = None
+        if checks_modified_since(request):
+            modified = (
+                Post.objects.filter(pk=kwargs["pk"])
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        response = conditional_response(request, etag, modified)
+        if response is not None:
+            return response
+
+        data, hit = cached_post_detail(
+            kwargs["pk"],
+            variant,
+            lambda: super(PostDetailView, self).retrieve(request, *args, **kwargs).data,
+        )
+        return add_validators(
+            Response(data, headers={"X-Cache": "HIT" if hit else "MISS"}),
+            etag,
+            last_modified(data),
+        )
+
+
+class AsyncPostListView(AsyncAPIView):
+    """
+    Async variant of PostListView: reads through the async ORM, creates via
+    PostListView
+    """
+
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    sync_view = PostListView
+
+    async def get(self, request):
+        fieldset = requested_fields(request, PostSerializer)
+        variant = request.build_absolute_uri()
+        etag_variant = list_etag_variant(request, variant)
+        if "HTTP_IF_NONE_MATCH" in request.META:
+            post_ids = cached_post_list_ids(variant)
+            if post_ids is None:
+                paginator = PostCursorPagination()
+                rows = await paginator.apaginate_queryset(
+                    id_rows(Post.objects.all(), paginator), request, self
+                )
+                post_ids = [row["id"] for row in rows]
+            response = conditional_response(
+                request, post_list_etag(etag_variant, post_ids)
+            )
+            if response is not None:
+                return response
+
+        async def render():
+            paginator = PostCursorPagination()
+            context = {"request": request, "fields": fieldset}
+            compiled = compile_serializer(PostSerializer, fieldset, context)
+            if compiled is not None:
+                posts = values_for(Post.objects.all(), compiled, paginator)
+                page = await paginator.apaginate_queryset(posts, request, self)
+                data = compiled.many(page)
+            else:
+                posts = project(
+                    Post.objects.all(), PostSerializer, fieldset, ["created_at"]
+                )
+                page = await paginator.apaginate_queryset(posts, request, self)
+                data = PostSerializer(page, many=True, context=context).data
+            return paginator.get_paginated_response(data).data
+
+        clock = write_clock()
+        data, hit = await acached_post_list(variant, render)
+        post_ids = [post["id"] for post in data["results"]]
+        if request.query_params.get("viewer_state") in ("1", "true"):
+            states = await sync_to_async(viewer_state)(request.user, post_ids)
+            data = with_viewer_state(data, states)
+        return add_validators(
+            self.respond(data, headers={"X-Cache": "HIT" if hit else "MISS"}),
+            post_list_etag(etag_variant, post_ids, clock),
+        )
+
+    post = delegate_to_sync
+
+
+class AsyncPostDetailView(AsyncAPIView):
+    """
+    Async variant of PostDetailView: reads through the async ORM, updates
+    and deletes via PostDetailView
+    """
+
+    authentication_classes = [StatelessReadJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    sync_view = PostDetailView
+
+    async def get(self, request, pk):
+        fieldset = requested_fields(request, PostSerializer)
+        variant = fieldset_variant(request, fieldset)
+        etag = post_etag(pk, variant)
+        modified = None
+        if checks_modified_since(request):
+            modified = (
+                await Post.objects.filter(pk=pk)
+                .values_list("updated_at", flat=True)
+                .afirst()
+            )
+        response = conditional_response(request, etag, modified)
+        if response is not None:
+            return response
+
+        async def render():
+            try:
+                post = await project(Post.objects.all(), PostSerializer, fieldset).aget(
+                    pk=pk
+                )
+            except Post.DoesNotExist:
+                raise NotFound("No Post matches the given query.")
+            return PostSerializer(
+                post, context={"request": request, "fields": fieldset}
+            ).data
+
+        data, hit = await acached_post_detail(pk, variant, render)
+        return add_validators(
+            self.respond(data, headers={"X-Cache": "HIT" if hit else "MISS"}),
+            etag,
+            last_modified(data),
+        )
+
+    put = patch = delete = delegate_to_sync
+
 
 class PostCreateView(generics.CreateAPIView):
     """
@@ -39,7 +284,20 @@ class PostCreateView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(user=self.request.user)
+        fan_out_post(post)
+
+
+class HomeTimelineView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    The authenticated user's home timeline: their own posts and posts from
+    accounts they follow, newest first
+    """
+
+    queryset = Post.objects.all()
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
 
 
 class PostUpdateView(generics.UpdateAPIView):
@@ -60,3 +318,67 @@ class PostDeleteView(generics.DestroyAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+
+
+class PostSearchView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Full-text search over public, active posts (``?q=``), best match first
+    """
+
+    queryset = Post.objects.all()
+    serializer_class = PostSerializer
+    pagination_class = PostSearchPagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+
+
+class PostCacheStatsView(APIView):
+    """
+    Hit and miss counters of this process's post cache (admin only)
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats.snapshot())
+
+
+class HashtagPostsView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    Public posts using a hashtag, newest first, read from the hashtag index
+    """
+
+    serializer_class = PostSerializer
+    pagination_class = HashtagPagination
+    authentication_classes = [StatelessReadJWTAuthentication]
+    # Posts are loaded through their PostHashtag index entries
+    fieldset_prefix = "post__"
+    fieldset_required = ("created_at", "post")
+
+    def get_queryset(self):
+        return PostHashtag.objects.filter(
+            hashtag__name=self.kwargs["name"].lower()
+        ).select_related("post")
+
+
+class TrendingHashtagsView(APIView):
+    """
+    Most used hashtags over the last hour or day (``?window=hour|day``)
+    """
+
+    def get(self, request):
+        window = request.query_params.get("window", "hour")
+        if window not in TRENDING_WINDOWS:
+            raise ValidationError(
+                {"window": f"Must be one of {list(TRENDING_WINDOWS)}."}
+            )
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, getattr(settings, "HASHTAG_TRENDING_MAX_LIMIT", 50)))
+
+        results = [
+            {"tag": name, "uses": uses}
+            for name, uses in trending_hashtags(window, limit)
+        ]
+        return Response({"window": window, "results": results})
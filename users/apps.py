@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from .signals import (
+            connect_auth_signals,
+            connect_follow_signals,
+            connect_image_signals,
+        )
+
+        connect_follow_signals()
+        connect_image_signals()
+        connect_auth_signals()
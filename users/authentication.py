@@ -0,0 +1,225 @@
+# users/authentication.py
+"""
+JWT authentication classes.
+
+simplejwt's JWTAuthentication loads the user row on every request.
+CachedJWTAuthentication keeps recently seen users in a small per-process LRU
+for AUTH_USER_CACHE_TTL seconds instead. Saving or deleting a user drops
+their entry (users.signals), so deactivation and password changes apply on
+the next request in this process and within the TTL everywhere else. The
+token's is_active and password checks still run against the cached user.
+
+StatelessReadJWTAuthentication goes further on read-only requests when
+AUTH_STATELESS_READS is on: the user is built from the token claims alone
+(a TokenUser carrying only the id), so it only suits views that need
+nothing of the user but its id.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that can also authenticate from async views, loading
+    the user through the async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+        self.check_user(user, validated_token)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    def check_user(self, user, validated_token):
+        # Same checks as JWTAuthentication.get_user()
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+
+class UserCache:
+    """
+    Bounded LRU of users by id, each kept for ``ttl`` seconds. Ids are keyed
+    as strings, the form tokens carry them in. Callers get a copy, so a view
+    changing ``request.user`` can't affect other requests.
+    """
+
+    def __init__(self, max_size=10_000, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user id -> (monotonic expiry, user)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every discard, so a load that raced an invalidation
+        # isn't stored
+        self._version = 0
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return copy.copy(entry[1])
+            if entry is not None:
+                del self._users[user_id]
+            self.misses += 1
+            return None
+
+    def version(self):
+        return self._version
+
+    def set(self, user_id, user, version):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            if version != self._version:
+                return
+            self._users[user_id] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def discard(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._version += 1
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._users.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, "AUTH_USER_CACHE_SIZE", 10_000),
+    ttl=getattr(settings, "AUTH_USER_CACHE_TTL", 30),
+)
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """
+    JWT authentication that loads each user at most once per TTL.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            version = user_cache.version()
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, version)
+        else:
+            self.check_user(user, validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            version = user_cache.version()
+            user = await super().aget_user(validated_token)
+            user_cache.set(user_id, user, version)
+        else:
+            self.check_user(user, validated_token)
+        return user
+
+
+class ClaimsUser(TokenUser):
+    """
+    TokenUser whose id has the user model's primary key type (tokens carry
+    it as a string), so it matches ids stored elsewhere.
+    """
+
+    @cached_property
+    def id(self):
+        user_id = self.token[api_settings.USER_ID_CLAIM]
+        return get_user_model()._meta.pk.to_python(user_id)
+
+
+class StatelessReadJWTAuthentication(CachedJWTAuthentication):
+    """
+    With AUTH_STATELESS_READS on, authenticates read-only requests from the
+    token claims without loading the user; other requests are served by
+    CachedJWTAuthentication. Deactivated users and changed passwords are
+    then only enforced once the access token expires.
+    """
+
+    stateless = False
+
+    def authenticate(self, request):
+        self.stateless = self.use_claims(request)
+        return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        self.stateless = self.use_claims(request)
+        return await super().aauthenticate(request)
+
+    def use_claims(self, request):
+        return request.method in SAFE_METHODS and getattr(
+            settings, "AUTH_STATELESS_READS", False
+        )
+
+    def get_user(self, validated_token):
+        if self.stateless:
+            self.get_user_id(validated_token)
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
+
+    async def aget_user(self, validated_token):
+        if self.stateless:
+            return self.get_user(validated_token)
+        return await super().aget_user(validated_token)
@@ -0,0 +1,118 @@
+# users/export.py
+"""
+Streaming export of users as JSON or CSV, for UserExportView.
+
+Users are read in primary key order in keyset chunks of
+USER_EXPORT_CHUNK_SIZE, each through a server-side iterator, and encoded
+as they are read, a few hundred lines per write, so memory use doesn't grow
+with the number of users.
+"""
+
+import csv
+from datetime import datetime
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+EXPORT_FIELDS = [
+    "id",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "bio",
+    "profile_picture",
+    "phone_number",
+    "gender",
+    "is_staff",
+    "is_active",
+    "date_joined",
+]
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+}
+
+
+class _Line:
+    """
+    File-like object csv.writer can write a row to, returning the line.
+    """
+
+    def write(self, value):
+        return value
+
+
+def user_rows(queryset, chunk_size=None):
+    """
+    Yield a tuple of ``EXPORT_FIELDS`` values per user, in primary key order.
+    """
+    chunk_size = chunk_size or getattr(settings, "USER_EXPORT_CHUNK_SIZE", 2000)
+    last_pk = None
+    while True:
+        chunk = queryset.order_by("pk")
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        read = 0
+        for row in chunk.values_list(*EXPORT_FIELDS)[:chunk_size].iterator(
+            chunk_size=chunk_size
+        ):
+            last_pk = row[0]
+            read += 1
+            yield row
+        if read < chunk_size:
+            return
+
+
+def _batched(lines, size=500):
+    # One write per few hundred lines rather than per user
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def export_json(queryset, chunk_size=None):
+    """
+    Yield a JSON array of user objects.
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def lines():
+        separator = "[\n"
+        for row in user_rows(queryset, chunk_size):
+            yield separator + encoder.encode(dict(zip(EXPORT_FIELDS, row)))
+            separator = ",\n"
+        yield "[]\n" if separator == "[\n" else "\n]\n"
+
+    return _batched(lines())
+
+
+def export_csv(queryset, chunk_size=None):
+    """
+    Yield CSV with a header line and a line per user.
+    """
+    writer = csv.writer(_Line())
+
+    def lines():
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in user_rows(queryset, chunk_size):
+            yield writer.writerow(
+                [
+                    value.isoformat() if isinstance(value, datetime) else value
+                    for value in row
+                ]
+            )
+
+    return _batched(lines())
+
+
+EXPORTERS = {
+    "json": export_json,
+    "csv": export_csv,
+}
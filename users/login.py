@@ -0,0 +1,125 @@
+# users/login.py
+"""
+Credential checks for LoginView.
+
+Password hashing takes tens of milliseconds of CPU per attempt, so it runs in
+a small thread pool instead of on the request thread (hashlib releases the
+GIL, so the pool uses up to LOGIN_HASH_WORKERS cores). At most
+LOGIN_HASH_QUEUE_SIZE checks may be queued or running; past that
+check_credentials raises LoginOverloaded and the attempt is shed, so a login
+burst can't take the CPU from other traffic.
+
+Failed attempts are counted per username and per client IP in sliding
+windows (core.ratelimit), and login_retry_after rejects attempts over either
+limit before any hashing happens.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+
+from core.ratelimit import SlidingWindowCounter
+
+WINDOW = getattr(settings, "LOGIN_FAILURE_WINDOW", 900)
+
+failures_by_username = SlidingWindowCounter("login-username", WINDOW)
+failures_by_ip = SlidingWindowCounter("login-ip", WINDOW)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(getattr(settings, "LOGIN_HASH_QUEUE_SIZE", 16))
+
+
+class LoginOverloaded(Exception):
+    """
+    Raised when the hashing queue is full.
+    """
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "LOGIN_HASH_WORKERS", 2),
+                thread_name_prefix="login-hash",
+            )
+        return _executor
+
+
+def _hash(func, *args):
+    if getattr(settings, "LOGIN_HASH_WORKERS", 2) == 0:
+        return func(*args)
+    if not _slots.acquire(blocking=False):
+        raise LoginOverloaded
+    try:
+        return get_executor().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def _verify(password, encoded):
+    if encoded is None:
+        # Hash anyway, so unknown usernames take as long as wrong passwords
+        make_password(password)
+        return False
+    return check_password(password, encoded)
+
+
+def check_credentials(username, password):
+    """
+    Return the active user matching ``username`` and ``password``, or None.
+    Does what ModelBackend.authenticate does, with the hashing in the pool.
+    """
+    if username is None or password is None:
+        return None
+    user_model = get_user_model()
+    try:
+        user = user_model._default_manager.get_by_natural_key(username)
+    except user_model.DoesNotExist:
+        user = None
+
+    if not _hash(_verify, password, user.password if user else None):
+        return None
+    if not user.is_active:
+        return None
+
+    # Re-hash with the current hasher or work factor, as check_password would
+    preferred = get_hasher()
+    current = identify_hasher(user.password)
+    if current.algorithm != preferred.algorithm or preferred.must_update(user.password):
+        user.password = _hash(make_password, password)
+        user.save(update_fields=["password"])
+    return user
+
+
+def login_retry_after(username, ip):
+    """
+    Seconds to wait if ``username`` or ``ip`` has too many recent failures,
+    else None.
+    """
+    max_per_username = getattr(settings, "LOGIN_MAX_FAILURES_PER_USERNAME", 5)
+    max_per_ip = getattr(settings, "LOGIN_MAX_FAILURES_PER_IP", 50)
+    if (
+        failures_by_username.count(username) >= max_per_username
+        or failures_by_ip.count(ip) >= max_per_ip
+    ):
+        return failures_by_ip.retry_after()
+    return None
+
+
+def record_login_failure(username, ip):
+    failures_by_username.hit(username)
+    failures_by_ip.hit(ip)
+
+
+def record_login_success(username):
+    failures_by_username.reset(username)
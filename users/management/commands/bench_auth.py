@@ -0,0 +1,77 @@
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Post
+from posts.views import PostDetailView
+from users.authentication import (
+    CachedJWTAuthentication,
+    StatelessReadJWTAuthentication,
+    user_cache,
+)
+from users.models import CustomUser as User
+
+AUTHENTICATORS = [
+    ("simplejwt", JWTAuthentication),
+    ("cached", CachedJWTAuthentication),
+    ("stateless", StatelessReadJWTAuthentication),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure JWT authentication overhead per request: the authenticator "
+        "alone, then a cached GET /posts/<id>/, with simplejwt's "
+        "JWTAuthentication, CachedJWTAuthentication and stateless reads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username="bench_auth")
+        post = Post.objects.filter(user=user).first() or Post.objects.create(
+            user=user, content="auth bench"
+        )
+        token = AccessToken.for_user(user)
+        count = options["requests"]
+        self.stdout.write(f"{count} requests per run")
+
+        # The test client sends "Host: testserver"
+        with override_settings(AUTH_STATELESS_READS=True, ALLOWED_HOSTS=["testserver"]):
+            self.stdout.write("authenticator only")
+            request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+            for label, authenticator in AUTHENTICATORS:
+                user_cache.clear()
+                self.report(
+                    label, count, lambda: authenticator().authenticate(Request(request))
+                )
+
+            self.stdout.write(f"GET /posts/{post.id}/")
+            client = Client(headers={"Authorization": f"Bearer {token}"})
+            client.get(f"/posts/{post.id}/")  # Fill the post cache
+            for label, authenticator in AUTHENTICATORS:
+                user_cache.clear()
+                with mock.patch.object(
+                    PostDetailView, "authentication_classes", [authenticator]
+                ):
+                    self.report(label, count, lambda: client.get(f"/posts/{post.id}/"))
+
+    def report(self, label, count, call):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(count):
+                call()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"  {label:<10} {elapsed / count * 1e6:8.1f} us/request"
+            f"   {len(queries) / count:5.2f} queries/request"
+        )
@@ -0,0 +1,141 @@
+import itertools
+import logging
+import statistics
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from users.models import CustomUser as User
+
+SCENARIOS = [
+    ("no flood", None, {}),
+    # Every attempt from a new address, so only the hashing pool limits it
+    ("inline hashing", "spread", {"LOGIN_HASH_WORKERS": 0}),
+    ("hashing pool", "spread", {}),
+    # One attacking address, stopped by the per-IP failure counter
+    ("pool + counters", "single", {"LOGIN_MAX_FAILURES_PER_IP": 10}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p99 latency of GET /posts/ while threads flood "
+        "/users/login/ with bad passwords: hashing inline, through the "
+        "bounded hashing pool, and with the failure counters tripped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--flooders", type=int, default=32)
+        parser.add_argument(
+            "--flood-interval",
+            type=float,
+            default=0.05,
+            help="Seconds each flood thread waits between attempts.",
+        )
+
+    def handle(self, *args, **options):
+        # Every rejected login would log a warning
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        author, _ = User.objects.get_or_create(username="bench_flood_author")
+        if not Post.objects.filter(user=author).exists():
+            Post.objects.bulk_create(
+                Post(user=author, content=f"flood bench {i}") for i in range(50)
+            )
+        self.stdout.write(
+            f"{options['requests']} reads over {options['readers']} threads, "
+            f"{options['flooders']} login flood threads, "
+            f"{options['flood_interval'] * 1000:.0f} ms between attempts"
+        )
+        # The test client sends "Host: testserver"; reads skip the post cache
+        overrides = {
+            "ALLOWED_HOSTS": ["testserver"],
+            "LOGIN_MAX_FAILURES_PER_USERNAME": 10**9,
+            "CACHES": {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "bench_login_flood",
+                }
+            },
+        }
+        for label, flood, scenario in SCENARIOS:
+            with override_settings(**overrides, **scenario):
+                cache.clear()
+                latencies, logins = self.run(flood, options)
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            self.stdout.write(
+                f"{label:<16} p50 {statistics.median(latencies) * 1000:7.1f} ms"
+                f"   p99 {p99 * 1000:7.1f} ms"
+                + "".join(
+                    f"   {status}: {count}" for status, count in sorted(logins.items())
+                )
+            )
+
+    def run(self, flood, options):
+        done = threading.Event()
+        logins = {}
+        lock = threading.Lock()
+        addresses = itertools.count()
+
+        def flooder():
+            client = Client()
+            try:
+                while not done.is_set():
+                    number = next(addresses)
+                    ip = (
+                        "10.0.0.1"
+                        if flood == "single"
+                        else f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+                    )
+                    status = client.post(
+                        reverse("login"),
+                        {"username": f"guess{number}", "password": "nope"},
+                        REMOTE_ADDR=ip,
+                    ).status_code
+                    with lock:
+                        logins[status] = logins.get(status, 0) + 1
+                    done.wait(options["flood_interval"])
+            finally:
+                connections.close_all()
+
+        latencies = []
+
+        def reader(count):
+            client = Client()
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    client.get("/posts/?page_size=20")
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                connections.close_all()
+
+        flooders = [
+            threading.Thread(target=flooder)
+            for _ in range(options["flooders"] if flood else 0)
+        ]
+        readers = [
+            threading.Thread(
+                target=reader, args=(options["requests"] // options["readers"],)
+            )
+            for _ in range(options["readers"])
+        ]
+        for thread in flooders:
+            thread.start()
+        time.sleep(0.5 if flood else 0)  # Let the flood build up
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        done.set()
+        for thread in flooders:
+            thread.join()
+        return latencies, logins
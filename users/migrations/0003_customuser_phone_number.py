@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_follow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="phone_number",
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
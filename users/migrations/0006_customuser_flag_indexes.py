@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0005_customuser_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                condition=models.Q(("is_staff", True)),
+                fields=["date_joined", "id"],
+                name="users_staff_joined_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                condition=models.Q(("is_active", False)),
+                fields=["date_joined", "id"],
+                name="users_inactive_joined_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_celebrity_follows(apps, schema_editor):
+    Follow = apps.get_model("users", "Follow")
+    threshold = getattr(settings, "TIMELINE_CELEBRITY_THRESHOLD", 10_000)
+    Follow.objects.filter(followee__followers_count__gt=threshold).update(
+        followee_is_celebrity=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_customuser_flag_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="follow",
+            name="followee_is_celebrity",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                condition=models.Q(("followee_is_celebrity", True)),
+                fields=["follower", "followee"],
+                name="users_follow_celebrity_idx",
+            ),
+        ),
+        migrations.RunPython(flag_celebrity_follows, migrations.RunPython.noop),
+    ]
@@ -13,12 +13,72 @@ class CustomUser(AbstractUser):
     profile_picture = models.ImageField(
         upload_to="profile_pics/", null=True, blank=True
     )
+    phone_number = models.CharField(max_length=20, null=True, blank=True)
     gender = models.CharField(
         max_length=10,
         choices=[("Male", "Male"), ("Female", "Female")],
         null=True,
         blank=True,
     )
+    # Denormalized, kept in step by users.signals
+    followers_count = models.IntegerField(default=0)
+    # Last profile change, the validator of conditional profile reads
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # The admin user list, newest first, and its join date filters
+            models.Index(fields=["date_joined", "id"], name="users_joined_idx"),
+            # ... filtered to its few staff or inactive accounts. Partial, as
+            # the other halves are most of the table and boolean filters
+            # compile to the bare column, which a (flag, ...) index can't seek
+            models.Index(
+                fields=["date_joined", "id"],
+                condition=models.Q(is_staff=True),
+                name="users_staff_joined_idx",
+            ),
+            models.Index(
+                fields=["date_joined", "id"],
+                condition=models.Q(is_active=False),
+                name="users_inactive_joined_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.username
+
+
+class Follow(models.Model):
+    """
+    A user following another user's posts.
+    """
+
+    follower = models.ForeignKey(
+        CustomUser, related_name="following", on_delete=models.CASCADE
+    )
+    followee = models.ForeignKey(
+        CustomUser, related_name="followers", on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Whether the followee is above TIMELINE_CELEBRITY_THRESHOLD, kept in
+    # step by posts.timeline.flag_celebrity_follows
+    followee_is_celebrity = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        unique_together = (
+            "follower",
+            "followee",
+        )
+        indexes = [
+            # Fan-out walks an author's followers in id batches
+            models.Index(fields=["followee", "id"], name="users_follow_followee_idx"),
+            # Home timeline reads merge in the few celebrities a user follows
+            models.Index(
+                fields=["follower", "followee"],
+                condition=models.Q(followee_is_celebrity=True),
+                name="users_follow_celebrity_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} follows {self.followee_id}"
@@ -0,0 +1,11 @@
+# users/pagination.py
+from core.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    """
+    Newest-first cursor pagination for users, served by the
+    (date_joined, id) index on CustomUser.
+    """
+
+    ordering = ("-date_joined", "-id")
@@ -0,0 +1,86 @@
+# users/signals.py
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.images import is_new_upload, schedule_derivatives
+from posts.timeline import flag_celebrity_follows
+from .authentication import user_cache
+from .models import CustomUser, Follow
+
+
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        CustomUser.objects.filter(pk=instance.followee_id).update(
+            followers_count=F("followers_count") + 1
+        )
+        user_cache.discard(instance.followee_id)
+        flag_celebrity_follows(instance, 1)
+
+
+def decrement_followers_count(sender, instance, origin=None, **kwargs):
+    # Skip the UPDATE when the followee itself is being deleted
+    if isinstance(origin, CustomUser) and origin.pk == instance.followee_id:
+        return
+    CustomUser.objects.filter(pk=instance.followee_id).update(
+        followers_count=F("followers_count") - 1
+    )
+    user_cache.discard(instance.followee_id)
+    flag_celebrity_follows(instance, -1)
+
+
+def connect_follow_signals():
+    post_save.connect(
+        increment_followers_count,
+        sender=Follow,
+        dispatch_uid="increment_followers_count",
+    )
+    post_delete.connect(
+        decrement_followers_count,
+        sender=Follow,
+        dispatch_uid="decrement_followers_count",
+    )
+
+
+def note_profile_picture_upload(sender, instance, **kwargs):
+    instance._picture_uploaded = is_new_upload(instance.profile_picture)
+
+
+def render_profile_picture_derivatives(sender, instance, **kwargs):
+    if getattr(instance, "_picture_uploaded", False):
+        schedule_derivatives(instance.profile_picture)
+
+
+def connect_image_signals():
+    pre_save.connect(
+        note_profile_picture_upload,
+        sender=CustomUser,
+        dispatch_uid="note_profile_picture",
+    )
+    post_save.connect(
+        render_profile_picture_derivatives,
+        sender=CustomUser,
+        dispatch_uid="render_profile_picture",
+    )
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Covers deactivation and password changes, both saved through save()
+    user_cache.discard(instance.pk)
+    # Again on commit, in case a request cached the old row meanwhile
+    transaction.on_commit(partial(user_cache.discard, instance.pk))
+
+
+def connect_auth_signals():
+    post_save.connect(
+        invalidate_cached_user,
+        sender=CustomUser,
+        dispatch_uid="invalidate_cached_user_on_save",
+    )
+    post_delete.connect(
+        invalidate_cached_user,
+        sender=CustomUser,
+        dispatch_uid="invalidate_cached_user_on_delete",
+    )
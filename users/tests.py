@@ -1,3 +1,393 @@
-from django.test import TestCase
+import csv
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncRequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.fastpath import CompiledSerializer
+from core.images import has_derivatives
+from core.views import select_view
+from interactions.models import Like
+from posts.models import Post
+from .authentication import (
+    CachedJWTAuthentication,
+    StatelessReadJWTAuthentication,
+    UserCache,
+    user_cache,
+)
+from .serializers import UserSerializer
+from .views import AsyncUserProfileView, UserProfileView
+from .models import CustomUser
+
+
+class ProfileTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = override_settings(MEDIA_ROOT=media_root, IMAGE_DERIVATIVE_WORKERS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = CustomUser.objects.create_user(username="member")
+        self.client.force_authenticate(self.user)
+
+    def test_profile_picture_upload_exposes_derivatives(self):
+        buffer = BytesIO()
+        Image.new("RGB", (400, 400)).save(buffer, "JPEG")
+        upload = SimpleUploadedFile("me.jpg", buffer.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse("profile"),
+                {"profile_picture": upload, "phone_number": "+15550100"},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["phone_number"], "+15550100")
+        self.assertIn("thumb_webp", response.data["profile_picture_derivatives"])
+        self.user.refresh_from_db()
+        self.assertTrue(has_derivatives(self.user.profile_picture.name))
+
+    def test_conditional_get(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.user.refresh_from_db()
+        response = self.client.get(reverse("profile"))
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        for headers in (
+            {"HTTP_IF_NONE_MATCH": etag},
+            {"HTTP_IF_MODIFIED_SINCE": last_modified},
+        ):
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse("profile"), **headers)
+            self.assertEqual(response.status_code, 304)
+        # Each fieldset has its own ETag
+        response = self.client.get(
+            reverse("profile") + "?fields=bio", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.client.put(reverse("profile"), {"bio": "changed"})
+        self.user.refresh_from_db()
+        response = self.client.get(reverse("profile"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["bio"], "changed")
+        self.assertNotEqual(response["ETag"], etag)
+        response = self.client.get(
+            reverse("profile"), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncProfileTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="async_member", bio="hi")
+        self.factory = AsyncRequestFactory()
+        self.view = AsyncUserProfileView.as_view()
+
+    def authorization(self, user):
+        return {"headers": {"Authorization": f"Bearer {AccessToken.for_user(user)}"}}
+
+    def test_profile_matches_sync_view_in_one_query(self):
+        self.client.force_authenticate(self.user)
+        expected = self.client.get(reverse("profile")).json()
+        request = self.factory.get(reverse("profile"), **self.authorization(self.user))
+        with self.assertNumQueries(1):
+            response = async_to_sync(self.view)(request)
+        self.assertEqual(json.loads(response.content), expected)
+
+    async def test_anonymous_and_inactive_users_are_rejected(self):
+        response = await self.view(self.factory.get(reverse("profile")))
+        self.assertEqual(response.status_code, 401)
+
+        self.user.is_active = False
+        await self.user.asave()
+        request = self.factory.get(reverse("profile"), **self.authorization(self.user))
+        response = await self.view(request)
+        self.assertEqual(response.status_code, 401)
+
+    def test_route_switch(self):
+        view = select_view("profile", UserProfileView, AsyncUserProfileView)
+        self.assertEqual(view.view_class, UserProfileView)
+        with override_settings(ASYNC_VIEWS=["profile"]):
+            view = select_view("profile", UserProfileView, AsyncUserProfileView)
+        self.assertEqual(view.view_class, AsyncUserProfileView)
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = CustomUser.objects.create_user(username="cached")
+        self.factory = APIRequestFactory()
+
+    def request(self, method="get", user=None):
+        token = AccessToken.for_user(user or self.user)
+        return Request(
+            getattr(self.factory, method)("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        )
+
+    def test_user_is_loaded_once(self):
+        authenticator = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            first, _ = authenticator.authenticate(self.request())
+        with self.assertNumQueries(0):
+            second, _ = authenticator.authenticate(self.request())
+        self.assertEqual(second, self.user)
+        # Each request gets its own copy
+        self.assertIsNot(first, second)
+
+    def test_saving_the_user_invalidates(self):
+        authenticator = CachedJWTAuthentication()
+        authenticator.authenticate(self.request())
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authenticator.authenticate(self.request())
+
+    def test_following_refreshes_the_followee(self):
+        authenticator = CachedJWTAuthentication()
+        authenticator.authenticate(self.request())
+        follower = CustomUser.objects.create_user(username="follower")
+        self.client.force_authenticate(follower)
+        self.client.post(reverse("follow_user", args=[self.user.id]))
+        user, _ = authenticator.authenticate(self.request())
+        self.assertEqual(user.followers_count, 1)
+
+    def test_cache_is_bounded_and_expires(self):
+        cache = UserCache(max_size=2, ttl=30)
+        users = [CustomUser(pk=pk, username=f"u{pk}") for pk in (1, 2, 3)]
+        for user in users:
+            cache.set(user.pk, user, cache.version())
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.get("3").username, "u3")
+
+        with mock.patch("users.authentication.time.monotonic", return_value=1e12):
+            self.assertIsNone(cache.get(3))
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        cache = UserCache()
+        version = cache.version()
+        cache.discard(self.user.pk)
+        cache.set(self.user.pk, self.user, version)
+        self.assertIsNone(cache.get(self.user.pk))
+
+    @override_settings(AUTH_STATELESS_READS=True)
+    def test_stateless_reads_skip_the_user_query(self):
+        authenticator = StatelessReadJWTAuthentication()
+        with self.assertNumQueries(0):
+            user, _ = authenticator.authenticate(self.request())
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_authenticated)
+
+        # Writes still load the real user
+        with self.assertNumQueries(1):
+            user, _ = authenticator.authenticate(self.request("post"))
+        self.assertIsInstance(user, CustomUser)
+
+    @override_settings(AUTH_STATELESS_READS=True)
+    def test_stateless_viewer_state(self):
+        post = Post.objects.create(user=self.user, content="liked")
+        Like.objects.create(post=post, user=self.user)
+        response = self.client.get(
+            reverse("viewer_state"),
+            {"ids": str(post.id)},
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}",
+        )
+        self.assertTrue(response.data["results"][0]["liked"])
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    LOGIN_MAX_FAILURES_PER_USERNAME=3,
+    LOGIN_MAX_FAILURES_PER_IP=5,
+)
+class LoginTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        CustomUser.objects.create_user(username="alice", password="right")
+
+    def login(self, username="alice", password="wrong", ip="10.0.0.1"):
+        return self.client.post(
+            reverse("login"),
+            {"username": username, "password": password},
+            REMOTE_ADDR=ip,
+        )
+
+    def test_login_returns_tokens(self):
+        response = self.login(password="right")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+        self.assertEqual(self.login(username="nobody").status_code, 400)
+
+    def test_username_locked_out_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 400)
+        with mock.patch("users.views.check_credentials") as check:
+            response = self.login(password="right", ip="10.0.0.2")
+        check.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_ip_locked_out_across_usernames(self):
+        for number in range(5):
+            self.login(username=f"guess{number}")
+        self.assertEqual(self.login(password="right").status_code, 429)
+        self.assertEqual(self.login(password="right", ip="10.0.0.2").status_code, 200)
+
+    def test_success_clears_username_failures(self):
+        self.login()
+        self.login()
+        self.assertEqual(self.login(password="right").status_code, 200)
+        self.login()
+        self.login()
+        self.assertEqual(self.login(password="right").status_code, 200)
+
+    def test_full_hashing_queue_sheds_logins(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch("users.login._slots", slots):
+            response = self.login(password="right")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        # Shed attempts are not failures
+        self.assertEqual(self.login(password="right").status_code, 200)
+
+
+class UserListTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username="admin", is_staff=True)
+        start = timezone.now() - timedelta(days=10)
+        for number in range(6):
+            CustomUser.objects.create_user(
+                username=f"member{number}",
+                email=f"member{number}@example.com",
+                date_joined=start + timedelta(days=number),
+                is_active=number != 5,
+            )
+        self.client.force_authenticate(self.admin)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(CustomUser.objects.get(username="member0"))
+        self.assertEqual(self.client.get(reverse("user_list")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("user_export")).status_code, 403)
+
+    def test_pages_newest_first_loading_only_serialized_columns(self):
+        url = reverse("user_list")
+        seen = []
+        response = self.client.get(url, {"page_size": 3})
+        while True:
+            seen += [user["username"] for user in response.data["results"]]
+            if not response.data["next"]:
+                break
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.data["next"])
+            self.assertEqual(len(queries), 1)
+            self.assertNotIn("password", queries[0]["sql"])
+        self.assertEqual(seen, ["admin"] + [f"member{n}" for n in range(5, -1, -1)])
+
+    def test_filters(self):
+        def usernames(**params):
+            response = self.client.get(reverse("user_list"), params)
+            return [user["username"] for user in response.data["results"]]
+
+        self.assertEqual(usernames(username="adm"), ["admin"])
+        self.assertEqual(usernames(username="ADM"), [])  # Case-sensitive
+        self.assertEqual(usernames(username="member5"), ["member5"])
+        self.assertEqual(len(usernames(username="member")), 6)
+        self.assertEqual(usernames(username="adm\U0010ffff"), [])
+        self.assertEqual(usernames(username="\U0010ffff"), [])
+        self.assertEqual(usernames(username="\ud7ff"), [])
+        self.assertEqual(usernames(is_staff="true"), ["admin"])
+        self.assertEqual(usernames(is_active="false"), ["member5"])
+        joined = CustomUser.objects.get(username="member2").date_joined
+        self.assertEqual(
+            usernames(joined_after=joined.isoformat(), joined_before="2100-01-01"),
+            ["admin", "member5", "member4", "member3", "member2"],
+        )
+        response = self.client.get(reverse("user_list"), {"joined_after": "soon"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("joined_after", response.data)
+
+    def test_sparse_fieldsets(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user_list"), {"fields": "username"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "username"})
+        self.assertNotIn('"users_customuser"."email"', queries[-1]["sql"])
+
+        response = self.client.get(reverse("profile"), {"exclude": "email,bio"})
+        self.assertEqual(response.data["username"], "admin")
+        self.assertNotIn("email", response.data)
+        self.assertNotIn("bio", response.data)
+
+    def test_fast_path_is_byte_identical(self):
+        CustomUser.objects.filter(username="member1").update(
+            profile_picture="profile_pics/me.png",
+            bio="Ünïcode </script>",
+            gender="Female",
+            phone_number="+1 555",
+        )
+        request = Request(APIRequestFactory().get("/"))
+        users = CustomUser.objects.order_by("id")
+        for context in ({}, {"request": request}, {"fields": ["id", "gender"]}):
+            compiled = CompiledSerializer(
+                UserSerializer, context.get("fields"), context
+            )
+            self.assertEqual(
+                JSONRenderer().render(compiled.many(users.values(*compiled.columns))),
+                JSONRenderer().render(
+                    UserSerializer(users, many=True, context=context).data
+                ),
+            )
+
+        url = reverse("user_list") + "?page_size=4"
+        fast = self.client.get(url)
+        with override_settings(FAST_SERIALIZERS=False):
+            self.assertEqual(fast.content, self.client.get(url).content)
+
+    @override_settings(USER_EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user_export"), {"username": "member"})
+            self.assertTrue(response.streaming)
+            body = b"".join(response.streaming_content)
+        # Three full chunks of two members, then an empty one
+        self.assertEqual(len([q for q in queries if "users_customuser" in q["sql"]]), 4)
+        users = json.loads(body)
+        self.assertEqual(
+            [user["username"] for user in users], [f"member{n}" for n in range(6)]
+        )
+        self.assertNotIn("password", users[0])
+        self.assertEqual(users[5]["is_active"], False)
+
+    def test_export_csv(self):
+        response = self.client.get(
+            reverse("user_export"), {"output": "csv", "is_active": "false"}
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:2], ["id", "username"])
+        self.assertEqual([row[1] for row in rows[1:]], ["member5"])
+        response = self.client.get(reverse("user_export"), {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_export_is_valid_json(self):
+        response = self.client.get(reverse("user_export"), {"username": "nobody"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
@@ -1,17 +1,27 @@
 # users/urls.py
 from django.urls import path
+from core.views import select_view
 from .views import (
+    AsyncUserProfileView,
     RegisterUserView,
     UserProfileView,
     UserListView,
+    UserExportView,
     UserUpdateView,
     LoginView,
+    FollowUserView,
 )
 
 urlpatterns = [
     path("register/", RegisterUserView.as_view(), name="register"),
-    path("profile/", UserProfileView.as_view(), name="profile"),
+    path(
+        "profile/",
+        select_view("profile", UserProfileView, AsyncUserProfileView),
+        name="profile",
+    ),
     path("users/", UserListView.as_view(), name="user_list"),  # Admin
+    path("users/export/", UserExportView.as_view(), name="user_export"),  # Admin
     path("users/<int:pk>/", UserUpdateView.as_view(), name="user_update"),  # Admin
     path("login/", LoginView.as_view(), name="login"),
+    path("follow/<int:user_id>/", FollowUserView.as_view(), name="follow_user"),
 ]
@@ -1,12 +1,37 @@
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.contrib.auth import authenticate
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework import status
-from .serializers import RegisterUserSerializer, UserSerializer
-from rest_framework.views import APIView
-from .models import CustomUser
+from rest_framework import generics, status
+from rest_framework.exceptions import Throttled, ValidationError
+from .serializers import (
+    RegisterUserSerializer,
+    UserFilterSerializer,
+    UserSerializer,
+)
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from .export import CONTENT_TYPES, EXPORTERS
+from .models import CustomUser, Follow
+from .pagination import UserPagination
+from posts.timeline import backfill_timeline, remove_from_timeline
+from core.throttling import ThrottleFirstMixin
+from core.conditional import add_validators, conditional_response, make_etag
+from core.fastpath import FastListMixin
+from core.fieldsets import SparseFieldsetViewMixin, requested_fields
+from core.views import AsyncAPIView, delegate_to_sync
+from .login import (
+    LoginOverloaded,
+    check_credentials,
+    login_retry_after,
+    record_login_failure,
+    record_login_success,
+)
+
+
+def profile_etag(user, fieldset):
+    # Changes with every profile update, which moves updated_at
+    return make_etag(user.pk, user.updated_at.isoformat(), fieldset)
 
 
 class UserProfileView(APIView):
@@ -18,8 +43,13 @@ class UserProfileView(APIView):
 
     def get(self, request):
         # Retrieve the user profile (viewing own profile)
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        fieldset = requested_fields(request, UserSerializer)
+        etag = profile_etag(request.user, fieldset)
+        response = conditional_response(request, etag, request.user.updated_at)
+        if response is not None:
+            return response
+        serializer = UserSerializer(request.user, context={"fields": fieldset})
+        return add_validators(Response(serializer.data), etag, request.user.updated_at)
 
     def put(self, request):
         # Update the user profile (bio, phone number, etc.)
@@ -30,11 +60,39 @@ class UserProfileView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class RegisterUserView(APIView):
+class AsyncUserProfileView(AsyncAPIView):
+    """
+    Async variant of UserProfileView; updates go through UserProfileView.
+    """
+
+    permission_classes = [IsAuthenticated]
+    sync_view = UserProfileView
+
+    async def get(self, request):
+        # The user was loaded by the async authenticator; no further queries
+        fieldset = requested_fields(request, UserSerializer)
+        etag = profile_etag(request.user, fieldset)
+        response = conditional_response(request, etag, request.user.updated_at)
+        if response is not None:
+            return response
+        return add_validators(
+            self.respond(
+                UserSerializer(request.user, context={"fields": fieldset}).data
+            ),
+            etag,
+            request.user.updated_at,
+        )
+
+    put = delegate_to_sync
+
+
+class RegisterUserView(ThrottleFirstMixin, APIView):
     """
     Handle user registration.
     """
 
+    throttle_scope = "register"
+
     def post(self, request):
         serializer = RegisterUserSerializer(data=request.data)
         if serializer.is_valid():
@@ -52,9 +110,19 @@ class LoginView(APIView):
     def post(self, request):
         username = request.data.get("username")
         password = request.data.get("password")
-        user = authenticate(username=username, password=password)
+        ip = request.META.get("REMOTE_ADDR")
+
+        # Rejected before any hashing
+        retry_after = login_retry_after(username, ip)
+        if retry_after:
+            raise Throttled(wait=retry_after, detail="Too many failed login attempts.")
+        try:
+            user = check_credentials(username, password)
+        except LoginOverloaded:
+            raise Throttled(wait=1, detail="Too many logins in progress.")
 
         if user:
+            record_login_success(username)
             refresh = RefreshToken.for_user(user)
             return Response(
                 {
@@ -62,22 +130,67 @@ class LoginView(APIView):
                     "access": str(refresh.access_token),
                 }
             )
+        record_login_failure(username, ip)
         return Response(
             {"detail": "Invalid credentials"}, status=status.HTTP_400_BAD_REQUEST
         )
 
 
-class UserListView(APIView):
+def filtered_users(request, queryset):
+    filters = UserFilterSerializer(data=request.query_params.dict())
+    filters.is_valid(raise_exception=True)
+    return filters.filter_queryset(queryset)
+
+
+class UserListView(FastListMixin, SparseFieldsetViewMixin, generics.ListAPIView):
+    """
+    List users, newest first (admin only).
+
+    Cursor paginated off the (date_joined, id) index and filtered with
+    ``?username=`` (prefix), ``?is_staff=``, ``?is_active=``,
+    ``?joined_after=`` and ``?joined_before=``. Only the serialized
+    columns are loaded, or those of the ``?fields=`` asked for.
+    """
+
+    serializer_class = UserSerializer
+    pagination_class = UserPagination
+    permission_classes = [IsAdminUser]
+    fieldset_required = ("date_joined",)  # The pagination ordering
+    columns = [
+        "id",
+        "username",
+        "email",
+        "first_name",
+        "last_name",
+        "bio",
+        "profile_picture",
+        "phone_number",
+        "gender",
+        "date_joined",
+    ]
+
+    def get_queryset(self):
+        return filtered_users(self.request, CustomUser.objects.only(*self.columns))
+
+
+class UserExportView(APIView):
     """
-    List all users (admin only).
+    Stream every user matching UserListView's filters as JSON or CSV
+    (``?output=json|csv``), admin only. See users.export.
     """
 
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        users = CustomUser.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        output = request.query_params.get("output", "json")
+        if output not in EXPORTERS:
+            raise ValidationError({"output": f"Must be one of {list(EXPORTERS)}."})
+        users = filtered_users(request, CustomUser.objects.all())
+        response = StreamingHttpResponse(
+            EXPORTERS[output](users), content_type=CONTENT_TYPES[output]
+        )
+        response["Content-Disposition"] = f'attachment; filename="users.{output}"'
+        return response
 
 
 class UserUpdateView(APIView):
@@ -94,3 +207,42 @@ class UserUpdateView(APIView):
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FollowUserView(APIView):
+    """
+    Follow or unfollow a user.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, user_id):
+        """
+        Toggles following the given user. Following copies their recent posts
+        into the home timeline; unfollowing removes them.
+        """
+        try:
+            followee = CustomUser.objects.get(id=user_id)
+        except CustomUser.DoesNotExist:
+            return Response(
+                {"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        follower = request.user
+        if follower.pk == followee.pk:
+            return Response(
+                {"detail": "Cannot follow yourself."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                follower=follower, followee=followee
+            )
+            if not created:
+                follow.delete()
+                remove_from_timeline(follower, followee)
+                return Response({"status": "unfollowed"}, status=status.HTTP_200_OK)
+
+            backfill_timeline(follower, followee)
+        return Response({"status": "followed"}, status=status.HTTP_200_OK)